@@ -0,0 +1,127 @@
+"""
+Throughput and peak memory of the streamed month bundle (/download-mis-bundle).
+
+Generates a month of synthetic uploads, optionally pads every stored workbook
+by --pad-mib so the archive is large, then downloads the bundle through an
+unbuffered test-client response and checks it:
+    python benchmarks/bench_bundle.py --departments 40 --pad-mib 5
+    python benchmarks/bench_bundle.py --json bundle.json
+
+The peak is the Python heap high-water mark under tracemalloc while the
+archive is consumed chunk by chunk; it should track ZIP_STREAM_CHUNK_SIZE,
+not the archive size. Each member is then compared with the stored SHA-256.
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# --json path is relative to where the script was started
+INVOKED_FROM = os.getcwd()
+_tmp_dir = tempfile.mkdtemp(prefix='mis_bundle_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp_dir, 'bundle.db')}"
+os.chdir(_tmp_dir)
+
+from app import create_app, init_db  # noqa: E402
+from extensions import db  # noqa: E402
+from models import MISUpload  # noqa: E402
+from synthetic_data import generate, DEFAULT_PASSWORD  # noqa: E402
+
+app = create_app()
+
+
+def login(emp_id, password):
+    client = app.test_client()
+    response = client.post('/login', data={'emp_id': emp_id, 'password': password})
+    if response.status_code != 302:
+        raise RuntimeError(f"Login failed for {emp_id}")
+    return client
+
+
+def pad_files(uploads, pad_mib):
+    """Append random bytes to each stored file and refresh its hash, so members are large"""
+    # Identical workbooks share one content-addressed blob; pad each blob once
+    for path in {upload.FilePath for upload in uploads}:
+        with open(path, 'ab') as f:
+            f.write(os.urandom(pad_mib * 1024 * 1024))
+    for upload in uploads:
+        with open(upload.FilePath, 'rb') as f:
+            upload.ContentHash = hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--departments', type=int, default=20)
+    parser.add_argument('--pad-mib', type=int, default=0, help='MiB of incompressible padding added to each workbook')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+    args.json = os.path.join(INVOKED_FROM, args.json) if args.json else None
+
+    init_db(app)
+    summary = generate(app, departments=args.departments, years=1, rows=50, workbooks=2)
+    with app.app_context():
+        first = MISUpload.query.order_by(MISUpload.UploadID).first()
+        fy_id, month_id = first.FYID, first.MonthID
+        uploads = MISUpload.query.filter_by(FYID=fy_id, MonthID=month_id, IsCancelled=False).all()
+        if args.pad_mib:
+            pad_files(uploads, args.pad_mib)
+            db.session.commit()
+        hashes = {upload.UploadCode: upload.ContentHash for upload in uploads}
+        source_bytes = sum(os.path.getsize(upload.FilePath) for upload in uploads)
+
+    client = login(summary['users']['Management'][0], DEFAULT_PASSWORD)
+    url = f'/download-mis-bundle?fy_id={fy_id}&month_id={month_id}&include_consolidated=1'
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(url, buffered=False)
+    chunks = iter(response.response)
+    first_chunk = next(chunks)
+    first_byte = time.perf_counter() - start
+    size = len(first_chunk) + sum(len(chunk) for chunk in chunks)
+    total = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    response.close()
+
+    # Integrity is checked on a second, buffered download so it does not count towards the peak
+    archive = zipfile.ZipFile(io.BytesIO(client.get(url).data))
+    mismatched = [info.filename for info in archive.infolist()
+                  if info.filename.split('_')[0] in hashes
+                  and hashlib.sha256(archive.read(info)).hexdigest() != hashes[info.filename.split('_')[0]]]
+
+    result = {
+        'members': len(archive.infolist()),
+        'source_mib': source_bytes / (1024 * 1024),
+        'archive_mib': size / (1024 * 1024),
+        'ttfb_ms': first_byte * 1000,
+        'total_ms': total * 1000,
+        'mib_per_s': size / (1024 * 1024) / total if total else 0,
+        'peak_mib': peak / (1024 * 1024),
+        'testzip': archive.testzip(),
+        'hash_mismatches': mismatched,
+    }
+    print(f"\n{result['members']} members, {result['source_mib']:.1f} MiB stored -> {result['archive_mib']:.1f} MiB archive")
+    print(f"first byte {result['ttfb_ms']:.1f}ms, total {result['total_ms']:.0f}ms ({result['mib_per_s']:.0f} MiB/s), "
+          f"peak heap {result['peak_mib']:.1f} MiB")
+    print(f"integrity: {'ok' if result['testzip'] is None and not mismatched else 'FAILED'}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'result': result}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+    sys.exit(0 if result['testzip'] is None and not mismatched else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+Cold-start cost of a worker: building the app and serving its first requests.
+
+Every gunicorn worker imports wsgi.py, which builds the app with
+create_app(), and then pays one-off costs (template compilation, lazy
+imports) on its first requests. Each sample runs in a fresh
+interpreter against a throwaway SQLite database:
+    python benchmarks/bench_cold_start.py --runs 10 --json before.json
+    python benchmarks/bench_cold_start.py --runs 10 --compare before.json
+
+Reports the import time (wsgi.py, so create_app() included), the first GET /login, the first login +
+dashboard, and the first PDF and Excel download (openpyxl/ReportLab load
+here when imported lazily), plus which heavy libraries are already loaded
+right after import. It also imports wsgi once in an empty directory and
+reports any files that import created there and anything it logged (e.g.
+reading email_config.py), since importing should do no I/O. Figures are the minimum over the runs (with the median
+alongside), since start-up timings on a shared machine are noisy.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['openpyxl', 'reportlab', 'apscheduler', 'smtplib', 'xlrd', 'brotli']
+
+# Runs in a fresh interpreter; prints one JSON line
+SAMPLE = r"""
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, ROOT)
+import wsgi
+imported = time.perf_counter()
+loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+
+client = wsgi.app.test_client()
+timings = {'import': imported - started}
+
+def timed(name, call):
+    start = time.perf_counter()
+    response = call()
+    response.get_data()
+    timings[name] = time.perf_counter() - start
+    assert response.status_code in (200, 302), (name, response.status_code)
+
+timed('first_login_page', lambda: client.get('/login'))
+timed('first_login_dashboard', lambda: client.post('/login', data={'emp_id': 'EMP001', 'password': 'admin123'}, follow_redirects=True))
+timed('first_pdf', lambda: client.get(f'/download-upload-pdf/{UPLOAD_ID}'))
+timed('first_excel', lambda: client.get('/download-reports-excel'))
+print(json.dumps({'timings': timings, 'loaded_after_import': loaded}))
+"""
+
+# Runs in a fresh interpreter in an empty directory; prints the files import left behind
+IMPORT_SIDE_EFFECTS = r"""
+import json, os, sys
+sys.path.insert(0, ROOT)
+import wsgi
+print(json.dumps(sorted(os.listdir('.'))))
+"""
+
+# Builds the database and one upload for the PDF route; runs once
+SETUP = r"""
+import sys
+sys.path.insert(0, ROOT)
+from app import create_app, init_db
+from extensions import db, content_store
+from models import MISUpload, Department, FinancialYear, User
+import openpyxl
+app = create_app()
+init_db(app)
+with app.app_context():
+    path = content_store.incoming_path('.xlsx')
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(['Line Item', 'Budget', 'Actual'])
+    for i in range(200):
+        sheet.append([f'Item {i}', i * 10, i * 9])
+    workbook.save(path)
+    staged = content_store.stage_path(path, '.xlsx')
+    upload = MISUpload(UploadCode='MISBENCH000001', DepartmentID=Department.query.first().DeptID, MonthID=4,  # type: ignore
+                       FYID=FinancialYear.query.first().FYID, UploadedBy=User.query.first().UserID,
+                       FilePath=staged.commit(), ContentHash=staged.sha256, FileCheck='Validated', DataRowCount=200)
+    db.session.add(upload)
+    db.session.commit()
+    print(upload.UploadID)
+"""
+
+
+def run_python(code, work_dir, env):
+    result = subprocess.run([sys.executable, '-c', code], cwd=work_dir, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    return result.stdout.strip().splitlines()[-1]
+
+
+def import_side_effects(prelude, env):
+    """(files created, lines logged) by importing wsgi in an empty directory"""
+    empty_dir = tempfile.mkdtemp(prefix='mis_import_')
+    result = subprocess.run([sys.executable, '-c', prelude + IMPORT_SIDE_EFFECTS], cwd=empty_dir, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr.strip().splitlines()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--compare', help='results file from an earlier run to diff against')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='mis_cold_start_')
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(work_dir, 'cold.db')}")
+    prelude = f"ROOT = {ROOT!r}\nHEAVY_MODULES = {HEAVY_MODULES!r}\n"
+    upload_id = run_python(prelude + SETUP, work_dir, env)
+
+    samples = []
+    for _ in range(args.runs):
+        samples.append(json.loads(run_python(prelude + f"UPLOAD_ID = {upload_id}\n" + SAMPLE, work_dir, env)))
+
+    # Fresh interpreters are noisy; the minimum is the steadiest estimate of the fixed cost
+    names = list(samples[0]['timings'])
+    totals = [sum(sample['timings'].values()) for sample in samples]
+    results = {name: min(sample['timings'][name] for sample in samples) * 1000 for name in names}
+    results['cold_start_total'] = min(totals) * 1000
+    medians = {name: statistics.median(sample['timings'][name] for sample in samples) * 1000 for name in names}
+    medians['cold_start_total'] = statistics.median(totals) * 1000
+    loaded = samples[0]['loaded_after_import']
+    created, logged = import_side_effects(prelude, env)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+
+    print(f"\n{args.runs} fresh interpreters:{'min':>17} {'median':>10}")
+    for name, value in results.items():
+        line = f"  {name:<24} {value:>8.1f}ms {medians[name]:>8.1f}ms"
+        if name in baseline:
+            line += f"   ({value - baseline[name]:+.1f}ms)"
+        print(line)
+    print(f"\nHeavy modules loaded by 'import wsgi': {', '.join(loaded) or 'none'}")
+    print(f"Files created by 'import wsgi': {', '.join(created) or 'none'}")
+    print(f"Lines logged by 'import wsgi': {len(logged) or 'none'}")
+    for line in logged:
+        print(f"  {line}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'runs': args.runs, 'results': results, 'medians': medians, 'loaded_after_import': loaded,
+                       'created_by_import': created, 'logged_by_import': logged}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
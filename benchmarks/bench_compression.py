@@ -0,0 +1,163 @@
+"""
+Bytes on the wire and CPU cost of response compression per route.
+
+Fills a throwaway SQLite database with synthetic history (see
+synthetic_data.py) and requests the large HTML listings and the JSON/text
+endpoints through the Flask test client, once per Accept-Encoding:
+    python benchmarks/bench_compression.py --departments 30 --years 3
+    python benchmarks/bench_compression.py --link-kbps 512 --json after.json
+
+For every route it reports the uncompressed size, what the compression hook
+actually sent for gzip and br, the estimated transfer time over a WAN link
+of --link-kbps, and the CPU time the compressor spends on that body at each
+gzip level / brotli quality (measured on the body itself, repeated
+--iterations times, so request noise does not hide it). Routes that come
+back uncompressed were below COMPRESSION_MIN_SIZE or not a text type.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# --json path is relative to where the script was started
+INVOKED_FROM = os.getcwd()
+_tmp_dir = tempfile.mkdtemp(prefix='mis_compression_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp_dir, 'compression.db')}"
+os.chdir(_tmp_dir)
+
+from app import create_app, init_db, load_brotli  # noqa: E402
+from extensions import db  # noqa: E402
+from models import MISUpload  # noqa: E402
+from synthetic_data import generate, DEFAULT_PASSWORD  # noqa: E402
+
+app = create_app()
+
+# The app imports brotli only once a client accepts br; the benchmark measures it up front
+brotli = load_brotli()
+
+GZIP_LEVELS = [1, 6, 9]
+BROTLI_QUALITIES = [1, 4, 11]
+
+
+def scenarios(latest_upload_id):
+    """(name, role, url) for every measured request"""
+    return [
+        ('reports', 'Admin', '/reports'),
+        ('management-history', 'Management', '/management-history'),
+        ('supervisor-history', 'Supervisor', '/supervisor-history'),
+        ('admin-consolidated-management', 'Admin', '/admin-consolidated-management'),
+        ('admin-mis-tracking', 'Admin', '/admin-mis-tracking'),
+        ('dashboard-admin', 'Admin', '/dashboard'),
+        ('upload-status-json', 'Admin', f'/upload-mis/{latest_upload_id}/status'),
+        ('metrics', 'Admin', '/metrics'),
+    ]
+
+
+def login(emp_id, password):
+    client = app.test_client()
+    response = client.post('/login', data={'emp_id': emp_id, 'password': password})
+    if response.status_code != 302:
+        raise RuntimeError(f"Login failed for {emp_id}")
+    return client
+
+
+def cpu_ms(compress, body, iterations):
+    """Median CPU time of one compression of body, in milliseconds"""
+    samples = []
+    for _ in range(iterations):
+        start = time.process_time()
+        compress(body)
+        samples.append(time.process_time() - start)
+    return statistics.median(samples) * 1000
+
+
+def compressors():
+    """(label, function) for every setting measured"""
+    settings = [(f'gzip-{level}', lambda body, level=level: gzip.compress(body, compresslevel=level, mtime=0))
+                for level in GZIP_LEVELS]
+    if brotli is not None:
+        settings += [(f'br-{quality}', lambda body, quality=quality: brotli.compress(body, quality=quality))
+                     for quality in BROTLI_QUALITIES]
+    return settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--departments', type=int, default=20)
+    parser.add_argument('--years', type=int, default=2)
+    parser.add_argument('--rows', type=int, default=50, help='data rows per synthetic workbook')
+    parser.add_argument('--iterations', type=int, default=20, help='compressions timed per setting')
+    parser.add_argument('--link-kbps', type=int, default=1024, help='WAN bandwidth for the transfer-time estimate')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+    args.json = os.path.join(INVOKED_FROM, args.json) if args.json else None
+
+    init_db(app)
+    print("\nGenerating synthetic data...")
+    summary = generate(app, departments=args.departments, years=args.years, rows=args.rows)
+    print(f"  departments={summary['departments']} uploads={summary['uploads']} consolidated={summary['consolidated']}")
+    if brotli is None:
+        print("  brotli is not installed - only gzip is measured")
+
+    with app.app_context():
+        latest_upload_id = db.session.query(db.func.max(MISUpload.UploadID)).scalar()
+
+    logins = {
+        'Admin': ('EMP001', 'admin123'),
+        'Management': (summary['users']['Management'][0], DEFAULT_PASSWORD),
+        'Supervisor': (summary['users']['Supervisor'][0], DEFAULT_PASSWORD),
+    }
+    clients = {role: login(*credentials) for role, credentials in logins.items()}
+    settings = compressors()
+
+    def transfer_ms(size):
+        return size * 8 / (args.link_kbps * 1000) * 1000
+
+    results = {}
+    print(f"\n{'route':<30} {'identity':>10} {'gzip':>10} {'br':>10} {'saved':>7} {'wire @' + str(args.link_kbps) + 'kbps':>16}")
+    for name, role, url in scenarios(latest_upload_id):
+        client = clients[role]
+        identity = client.get(url, headers={'Accept-Encoding': 'identity'})
+        body = identity.get_data()
+        sent = {}
+        for encoding in ('gzip', 'br'):
+            response = client.get(url, headers={'Accept-Encoding': encoding})
+            sent[encoding] = {'bytes': len(response.get_data()), 'encoding': response.headers.get('Content-Encoding')}
+        best = min(sent['gzip']['bytes'], sent['br']['bytes'])
+        results[name] = {
+            'status': identity.status_code,
+            'identity_bytes': len(body),
+            'sent': sent,
+            'cpu_ms': {label: cpu_ms(compress, body, args.iterations) for label, compress in settings},
+            'ratio': {label: len(compress(body)) / len(body) for label, compress in settings} if body else {},
+        }
+
+        def shown(encoding):
+            return f"{sent[encoding]['bytes']:>10}" if sent[encoding]['encoding'] == encoding else f"{'-':>10}"
+        saved = 1 - best / len(body) if body else 0
+        print(f"{name:<30} {len(body):>10} {shown('gzip')} {shown('br')} {saved:>6.0%} "
+              f"{transfer_ms(len(body)):>7.0f}->{transfer_ms(best):<6.0f}ms")
+
+    labels = [label for label, _ in settings]
+    print("\nCompressor CPU per response (ms) and size ratio")
+    print(f"{'route':<30}" + ''.join(f"{label:>16}" for label in labels))
+    for name, result in results.items():
+        cells = ''.join(f"{result['cpu_ms'][label]:>7.2f} ({result['ratio'].get(label, 1):>4.0%})   " for label in labels)
+        print(f"{name:<30}{cells}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
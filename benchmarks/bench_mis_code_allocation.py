@@ -0,0 +1,184 @@
+"""
+Concurrent-upload stress test for MIS code allocation.
+
+Runs against a throwaway SQLite database (never the instance database):
+    python benchmarks/bench_mis_code_allocation.py --threads 16 --uploads 50
+    python benchmarks/bench_mis_code_allocation.py --processes 8 --history 0 10000
+
+Set BENCH_DATABASE_URL to run it against a server database instead (e.g. a
+scratch PostgreSQL database - it is seeded and written to):
+    BENCH_DATABASE_URL=postgresql://localhost/mis_bench python benchmarks/bench_mis_code_allocation.py
+
+Allocates codes from threads in one process and from several worker
+processes at once. Threads share one SQLite connection pool, so only the
+multi-process run (and a server database) really races the UPDATE ...
+RETURNING on the sequence row. Fails if any code is duplicated or missing,
+or if the median allocation time at the largest history size is more than
+--max-growth times the median at the smallest.
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Worker processes re-import this module, so the database chosen here is
+# passed on to them through the environment
+if not os.environ.get('BENCH_DATABASE_URL'):
+    _tmp_dir = tempfile.mkdtemp(prefix='mis_bench_')
+    os.environ['BENCH_DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+    os.environ['BENCH_WORK_DIR'] = _tmp_dir
+os.environ.setdefault('BENCH_WORK_DIR', tempfile.mkdtemp(prefix='mis_bench_'))
+os.environ['DATABASE_URL'] = os.environ['BENCH_DATABASE_URL']
+os.chdir(os.environ['BENCH_WORK_DIR'])
+
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from app import create_app, init_db  # noqa: E402
+from extensions import db  # noqa: E402
+from models import MISUpload, Department, FinancialYear, User  # noqa: E402
+from services import generate_mis_code  # noqa: E402
+
+app = create_app()
+
+
+def insert_upload(dept_id, fy_id, user_id, month_id=1):
+    """Allocate a code and insert the upload in one transaction, like upload_mis"""
+    for _ in range(20):
+        try:
+            start = time.perf_counter()
+            code = generate_mis_code(dept_id)
+            elapsed = time.perf_counter() - start
+            db.session.add(MISUpload(UploadCode=code, DepartmentID=dept_id, MonthID=month_id, FYID=fy_id,  # type: ignore
+                                     UploadedBy=user_id, FilePath='bench.xlsx', FileCheck='Validated', Status='In Review'))
+            db.session.commit()
+            return code, elapsed
+        except OperationalError:
+            # SQLite busy timeout under heavy contention - retry like a client would
+            db.session.rollback()
+    raise RuntimeError('Could not allocate MIS code after 20 attempts')
+
+
+def prefill_history(dept_id, fy_id, user_id, count):
+    """Insert historical uploads so allocation cost can be compared across history sizes"""
+    with app.app_context():
+        for _ in range(count):
+            insert_upload(dept_id, fy_id, user_id)
+
+
+def run_concurrent(dept_id, fy_id, user_id, threads, per_thread):
+    codes = []
+    timings = []
+    lock = threading.Lock()
+
+    def worker():
+        with app.app_context():
+            for _ in range(per_thread):
+                code, elapsed = insert_upload(dept_id, fy_id, user_id)
+                with lock:
+                    codes.append(code)
+                    timings.append(elapsed)
+            db.session.remove()
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return codes, timings
+
+
+def process_worker(job):
+    """Allocate codes in a separate process with its own engine and connections"""
+    dept_id, fy_id, user_id, count, start_at = job
+    # Line the processes up so their allocations overlap
+    time.sleep(max(0.0, start_at - time.time()))
+    with app.app_context():
+        results = [insert_upload(dept_id, fy_id, user_id) for _ in range(count)]
+        db.session.remove()
+    return results
+
+
+def run_processes(dept_id, fy_id, user_id, processes, per_process):
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(processes) as pool:
+        # Spawned workers import app first - give them time before the start gun
+        start_at = time.time() + 5
+        jobs = [(dept_id, fy_id, user_id, per_process, start_at)] * processes
+        results = [item for chunk in pool.map(process_worker, jobs) for item in chunk]
+    return [code for code, _ in results], [elapsed for _, elapsed in results]
+
+
+def report_run(label, codes, timings, expected):
+    duplicates = len(codes) - len(set(codes))
+    print(f"\n{label}")
+    print(f"  allocated={len(codes)} expected={expected} duplicates={duplicates}")
+    print(f"  median={statistics.median(timings) * 1000:.3f}ms max={max(timings) * 1000:.3f}ms")
+    return not duplicates and len(codes) == expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--processes', type=int, default=4, help='worker processes for the multi-process run (0 skips it)')
+    parser.add_argument('--uploads', type=int, default=25, help='uploads per thread / process')
+    parser.add_argument('--history', type=int, nargs='+', default=[0, 1000, 5000],
+                        help='history sizes to measure single-allocation latency at')
+    parser.add_argument('--samples', type=int, default=100, help='allocations timed at each history size')
+    parser.add_argument('--max-growth', type=float, default=2.0,
+                        help='fail if the median at the largest history exceeds the smallest by this factor')
+    args = parser.parse_args()
+
+    init_db(app)
+    with app.app_context():
+        dept = Department.query.filter_by(DeptName='Finance').first()
+        fy = FinancialYear.query.first()
+        user = User.query.first()
+        dept_id, fy_id, user_id = dept.DeptID, fy.FYID, user.UserID
+
+    failures = []
+    codes, timings = run_concurrent(dept_id, fy_id, user_id, args.threads, args.uploads)
+    if not report_run(f"Concurrent allocation: {args.threads} threads x {args.uploads} uploads",
+                      codes, timings, args.threads * args.uploads):
+        failures.append('duplicate or missing MIS codes across threads')
+
+    if args.processes:
+        codes, timings = run_processes(dept_id, fy_id, user_id, args.processes, args.uploads)
+        if not report_run(f"Concurrent allocation: {args.processes} processes x {args.uploads} uploads",
+                          codes, timings, args.processes * args.uploads):
+            failures.append('duplicate or missing MIS codes across processes')
+
+    print("\nSingle allocation latency by department history size:")
+    with app.app_context():
+        history = MISUpload.query.filter_by(DepartmentID=dept_id).count()
+    medians = []
+    for target in sorted(args.history):
+        if target > history:
+            prefill_history(dept_id, fy_id, user_id, target - history)
+            history = target
+        with app.app_context():
+            samples = [insert_upload(dept_id, fy_id, user_id)[1] for _ in range(args.samples)]
+            history += args.samples
+        medians.append(statistics.median(samples))
+        print(f"  history={history:>6}  median={medians[-1] * 1000:.3f}ms")
+
+    growth = medians[-1] / medians[0]
+    print(f"  growth={growth:.2f}x (limit {args.max_growth:.2f}x)")
+    if growth > args.max_growth:
+        failures.append(f"allocation time grew {growth:.2f}x with history")
+
+    if failures:
+        for failure in failures:
+            print(f"\nFAIL: {failure}")
+        sys.exit(1)
+    print("\nOK: no MIS code collisions and allocation time stays flat")
+
+
+if __name__ == '__main__':
+    main()
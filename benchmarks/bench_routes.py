@@ -0,0 +1,191 @@
+"""
+Latency, query count and peak memory for the hot routes.
+
+Fills a throwaway SQLite database with synthetic history (see
+synthetic_data.py), logs in as each role through the Flask test client and
+times the dashboards (and the panels they load afterwards), reports, MIS
+tracking pages, consolidation screen, Excel exports and PDF reports:
+    python benchmarks/bench_routes.py --departments 30 --years 3 --rows 500
+    python benchmarks/bench_routes.py --only pdf --iterations 3 --json before.json
+
+Each scenario is requested once to warm up, then --iterations times for
+latency and query count, then once more under tracemalloc for the Python
+heap peak (tracemalloc slows everything down, so that run is not timed).
+Pass --json to save the results, and --compare to diff against an earlier
+run.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# --json/--compare paths are relative to where the script was started
+INVOKED_FROM = os.getcwd()
+_tmp_dir = tempfile.mkdtemp(prefix='mis_bench_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+os.chdir(_tmp_dir)
+
+from sqlalchemy import event  # noqa: E402
+from app import create_app, init_db  # noqa: E402
+from extensions import db  # noqa: E402
+from models import ConsolidatedMIS, MISUpload  # noqa: E402
+from synthetic_data import generate, DEFAULT_PASSWORD  # noqa: E402
+
+app = create_app()
+
+ADMIN_LOGIN = ('EMP001', 'admin123')
+
+
+def scenarios(latest_upload_id, latest_consolidated_id):
+    """(name, role, url) for every benchmarked request"""
+    return [
+        ('dashboard-admin', 'Admin', '/dashboard'),
+        ('dashboard-management', 'Management', '/dashboard'),
+        ('dashboard-supervisor', 'Supervisor', '/dashboard'),
+        ('dashboard-hod', 'HOD', '/dashboard'),
+        ('panel-insights', 'Admin', '/dashboard/panels/insights'),
+        ('panel-pending-supervisor', 'Supervisor', '/dashboard/panels/pending'),
+        ('panel-pending-management', 'Management', '/dashboard/panels/pending'),
+        ('panel-upload-window', 'HOD', '/dashboard/panels/upload-window'),
+        ('reports-admin', 'Admin', '/reports'),
+        ('reports-hod', 'HOD', '/reports'),
+        ('supervisor-mis-tracking', 'Supervisor', '/supervisor-mis-tracking'),
+        ('admin-mis-tracking', 'Admin', '/admin-mis-tracking'),
+        ('management-mis-tracking', 'Management', '/management-mis-tracking'),
+        ('prepare-consolidated-mis', 'Supervisor', '/prepare-consolidated-mis'),
+        ('excel-consolidated-dashboard', 'Management', '/download-consolidated-dashboard-excel'),
+        ('excel-individual-dashboard', 'Management', '/download-individual-dashboard-excel'),
+        ('excel-reports', 'Admin', '/download-reports-excel'),
+        ('excel-my-uploads', 'HOD', '/download-my-uploads-excel'),
+        ('excel-approved-mis', 'Admin', '/download-approved-mis-excel'),
+        ('excel-supervisor-uploads', 'Supervisor', '/download-supervisor-uploads-excel'),
+        ('pdf-consolidated', 'Management', f'/download-consolidated-pdf/{latest_consolidated_id}'),
+        ('pdf-upload', 'Admin', f'/download-upload-pdf/{latest_upload_id}'),
+    ]
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+
+    def _before_cursor_execute(self, *args):
+        self.count += 1
+
+
+def login(emp_id, password):
+    client = app.test_client()
+    response = client.post('/login', data={'emp_id': emp_id, 'password': password})
+    if response.status_code != 302:
+        raise RuntimeError(f"Login failed for {emp_id}")
+    return client
+
+
+def run_scenario(client, url, counter, iterations):
+    response = client.get(url)
+    response.close()
+    status = response.status_code
+
+    timings = []
+    queries = []
+    for _ in range(iterations):
+        counter.count = 0
+        start = time.perf_counter()
+        response = client.get(url)
+        response.get_data()
+        timings.append(time.perf_counter() - start)
+        queries.append(counter.count)
+        response.close()
+
+    tracemalloc.start()
+    response = client.get(url)
+    response.get_data()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    response.close()
+
+    timings.sort()
+    return {
+        'status': status,
+        'median_ms': statistics.median(timings) * 1000,
+        'p95_ms': timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000,
+        'queries': max(queries),
+        'peak_mib': peak / (1024 * 1024),
+        'bytes': len(response.get_data())
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--departments', type=int, default=10)
+    parser.add_argument('--years', type=int, default=2)
+    parser.add_argument('--rows', type=int, default=200, help='data rows per synthetic workbook')
+    parser.add_argument('--columns', type=int, default=8)
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--only', nargs='+', default=[], help='run scenarios whose name contains any of these')
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--compare', help='results file from an earlier run to diff against')
+    args = parser.parse_args()
+    args.json = os.path.join(INVOKED_FROM, args.json) if args.json else None
+    args.compare = os.path.join(INVOKED_FROM, args.compare) if args.compare else None
+
+    init_db(app)
+    print("\nGenerating synthetic data...")
+    summary = generate(app, departments=args.departments, years=args.years, rows=args.rows, columns=args.columns)
+    print(f"  departments={summary['departments']} uploads={summary['uploads']} consolidated={summary['consolidated']}")
+
+    with app.app_context():
+        latest_upload_id = db.session.query(db.func.max(MISUpload.UploadID)).scalar()
+        latest_consolidated_id = db.session.query(db.func.max(ConsolidatedMIS.ConsolidatedMISID)).scalar()
+        counter = QueryCounter(db.engine)
+
+    logins = {
+        'Admin': ADMIN_LOGIN,
+        'Management': (summary['users']['Management'][0], DEFAULT_PASSWORD),
+        'Supervisor': (summary['users']['Supervisor'][0], DEFAULT_PASSWORD),
+        'HOD': (summary['users']['HOD'][0], DEFAULT_PASSWORD),
+    }
+    clients = {role: login(*credentials) for role, credentials in logins.items()}
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+
+    results = {}
+    print(f"\n{'scenario':<30} {'status':>6} {'median':>10} {'p95':>10} {'queries':>8} {'peak MiB':>9}")
+    for name, role, url in scenarios(latest_upload_id, latest_consolidated_id):
+        if args.only and not any(part in name for part in args.only):
+            continue
+        result = run_scenario(clients[role], url, counter, args.iterations)
+        results[name] = result
+        line = (f"{name:<30} {result['status']:>6} {result['median_ms']:>8.1f}ms {result['p95_ms']:>8.1f}ms "
+                f"{result['queries']:>8} {result['peak_mib']:>9.1f}")
+        if name in baseline:
+            before = baseline[name]
+            line += (f"   (median {result['median_ms'] - before['median_ms']:+.1f}ms, "
+                     f"queries {result['queries'] - before['queries']:+d})")
+        print(line)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'summary': {k: v for k, v in summary.items() if k != 'users'},
+                       'results': results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+    failed = [name for name, result in results.items() if result['status'] != 200]
+    if failed:
+        print(f"\nFAIL: non-200 responses from {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Latency of the upload search index as it grows.
+
+Fills a throwaway SQLite database with synthetic history, waits for the
+workbook text to be indexed, then pads the index with extra rows (copies of
+the real ones under new row ids, so term statistics stay realistic) and
+times typical type-ahead queries at each size:
+    python benchmarks/bench_search.py --sizes 1000 10000 50000
+    python benchmarks/bench_search.py --json search.json
+
+Each query is run --iterations times and the median and worst are reported,
+for the index lookup alone and for the /search/uploads suggestion endpoint.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# --json path is relative to where the script was started
+INVOKED_FROM = os.getcwd()
+_tmp_dir = tempfile.mkdtemp(prefix='mis_search_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp_dir, 'search.db')}"
+os.chdir(_tmp_dir)
+
+from app import create_app, init_db  # noqa: E402
+from extensions import db  # noqa: E402
+from config import SEARCH_RESULT_LIMIT  # noqa: E402
+from search_index import search_index  # noqa: E402
+from synthetic_data import generate  # noqa: E402
+
+app = create_app()
+
+QUERIES = ['mi', 'misa', 'misaab0', 'aab div', 'hod aa', 'revenue', 'delayed item', 'variance rem']
+
+
+def wait_for_text(timeout=120):
+    """Block until the background indexer has extracted text for every upload"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with app.app_context():
+            missing = db.session.execute(db.text("SELECT COUNT(*) FROM upload_search WHERE content = ''")).scalar()
+        if not missing:
+            return
+        time.sleep(0.2)
+    raise RuntimeError("Workbook text was not indexed in time")
+
+
+def pad_index(size):
+    """Copy existing index rows under new row ids until the index holds size rows"""
+    with app.app_context():
+        connection = db.session.connection()
+        while True:
+            count, top = connection.execute(db.text("SELECT COUNT(*), MAX(rowid) FROM upload_search")).one()
+            if count >= size:
+                break
+            connection.execute(db.text(
+                "INSERT INTO upload_search (rowid, code, department, uploader, content) "
+                "SELECT rowid + :offset, code, department, uploader, content FROM upload_search LIMIT :needed"),
+                {'offset': top, 'needed': size - count})
+        db.session.commit()
+
+
+def timed(function, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000], help='index rows at each step')
+    parser.add_argument('--departments', type=int, default=20)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+    args.json = os.path.join(INVOKED_FROM, args.json) if args.json else None
+
+    init_db(app)
+    generate(app, departments=args.departments, years=2, rows=50)
+    wait_for_text()
+
+    client = app.test_client()
+    client.post('/login', data={'emp_id': 'EMP001', 'password': 'admin123'})
+
+    results = []
+    print(f"\n{'rows':>8} {'query':<16} {'hits':>6} {'index p50':>10} {'max':>8} {'suggest p50':>12} {'max':>8}")
+    for size in args.sizes:
+        pad_index(size)
+        for query in QUERIES:
+            with app.app_context():
+                connection = db.session.connection()
+                hits = len(search_index.search(connection, query, SEARCH_RESULT_LIMIT))
+                index_p50, index_max = timed(lambda: search_index.search(connection, query, SEARCH_RESULT_LIMIT), args.iterations)
+            suggest_p50, suggest_max = timed(lambda: client.get('/search/uploads', query_string={'q': query}), args.iterations)
+            results.append({'rows': size, 'query': query, 'hits': hits, 'index_p50_ms': index_p50, 'index_max_ms': index_max,
+                            'suggest_p50_ms': suggest_p50, 'suggest_max_ms': suggest_max})
+            print(f"{size:>8} {query:<16} {hits:>6} {index_p50:>8.2f}ms {index_max:>6.2f}ms {suggest_p50:>10.2f}ms {suggest_max:>6.2f}ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Time to first byte, total time and peak memory of the streamed history pages.
+
+/reports, /management-history and /supervisor-history are rendered while they
+are sent, with rows pulled from a server-side cursor. This grows the
+synthetic history step by step and checks that the first byte arrives just
+as quickly on a large history as on a small one, and that the Python heap
+peak stays flat:
+    python benchmarks/bench_streaming.py --steps 5 10 20 40
+    python benchmarks/bench_streaming.py --json streaming.json
+
+Each step rebuilds the database with that many departments. The first
+byte is timed with an unbuffered test-client response; the peak is measured
+on a separate run under tracemalloc.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# --json path is relative to where the script was started
+INVOKED_FROM = os.getcwd()
+_tmp_dir = tempfile.mkdtemp(prefix='mis_streaming_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp_dir, 'streaming.db')}"
+os.chdir(_tmp_dir)
+
+from app import create_app, init_db  # noqa: E402
+from extensions import db  # noqa: E402
+from models import MISUpload  # noqa: E402
+from services import invalidate_reference_data  # noqa: E402
+from synthetic_data import generate, DEFAULT_PASSWORD  # noqa: E402
+
+app = create_app()
+
+PAGES = [
+    ('reports', 'Admin', '/reports'),
+    ('management-history', 'Management', '/management-history'),
+    ('supervisor-history', 'Supervisor', '/supervisor-history'),
+]
+
+
+def login(emp_id, password):
+    client = app.test_client()
+    response = client.post('/login', data={'emp_id': emp_id, 'password': password})
+    if response.status_code != 302:
+        raise RuntimeError(f"Login failed for {emp_id}")
+    return client
+
+
+def measure(client, url):
+    start = time.perf_counter()
+    response = client.get(url, buffered=False)
+    chunks = iter(response.response)
+    size = len(next(chunks))
+    first_byte = time.perf_counter() - start
+    size += sum(len(chunk) for chunk in chunks)
+    total = time.perf_counter() - start
+    response.close()
+
+    # Chunks are dropped as they arrive, as a server writing to a socket would
+    tracemalloc.start()
+    response = client.get(url, buffered=False)
+    for _ in response.response:
+        pass
+    response.close()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'ttfb_ms': first_byte * 1000, 'total_ms': total * 1000, 'bytes': size, 'peak_mib': peak / (1024 * 1024)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--steps', type=int, nargs='+', default=[5, 10, 20, 40], help='departments in the history at each step')
+    parser.add_argument('--years', type=int, default=2)
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+    args.json = os.path.join(INVOKED_FROM, args.json) if args.json else None
+
+    results = []
+    for departments in args.steps:
+        with app.app_context():
+            db.drop_all()
+        init_db(app)
+        invalidate_reference_data()
+        summary = generate(app, departments=departments, years=args.years, rows=10, workbooks=2)
+        clients = {
+            'Admin': login('EMP001', 'admin123'),
+            'Management': login(summary['users']['Management'][0], DEFAULT_PASSWORD),
+            'Supervisor': login(summary['users']['Supervisor'][0], DEFAULT_PASSWORD),
+        }
+        with app.app_context():
+            uploads = db.session.query(db.func.count(MISUpload.UploadID)).scalar()
+        for name, role, url in PAGES:
+            clients[role].get(url).close()
+            result = dict(measure(clients[role], url), page=name, uploads=uploads)
+            results.append(result)
+
+    print(f"\n{'uploads':>8} {'page':<20} {'ttfb':>10} {'total':>10} {'KiB':>8} {'peak MiB':>9}")
+    for result in results:
+        print(f"{result['uploads']:>8} {result['page']:<20} {result['ttfb_ms']:>8.1f}ms {result['total_ms']:>8.1f}ms "
+              f"{result['bytes'] / 1024:>8.0f} {result['peak_mib']:>9.1f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
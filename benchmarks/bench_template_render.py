@@ -0,0 +1,140 @@
+"""
+First-render latency of the heaviest pages, cold versus warm templates.
+
+Each sample is a fresh interpreter (a newly started worker) that logs in and
+requests the dashboard, reports and the three MIS tracking pages once, in
+four set-ups:
+
+    cold            empty Jinja bytecode cache, no warm-up - every page compiles
+    bytecode-cache  cache already filled by another worker - pages load compiled code
+    warmup          empty cache, TEMPLATE_WARMUP=1 - templates compile in create_app()
+    warmup+cache    filled cache and TEMPLATE_WARMUP=1 - the production set-up
+
+    python benchmarks/bench_template_render.py --runs 7
+
+The import column shows what warm-up moves into worker start; the page
+columns show what the first visitor to each page waits. The dataset is kept
+small so template compilation, not query and workbook work, dominates.
+Figures are the minimum over the runs.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PAGES = [
+    ('dashboard', 'Admin', '/dashboard'),
+    ('reports', 'Admin', '/reports'),
+    ('admin_mis_tracking', 'Admin', '/admin-mis-tracking'),
+    ('supervisor_mis_tracking', 'Supervisor', '/supervisor-mis-tracking'),
+    ('management_mis_tracking', 'Management', '/management-mis-tracking'),
+]
+
+MODES = [
+    ('cold', False, False),
+    ('bytecode-cache', True, False),
+    ('warmup', False, True),
+    ('warmup+cache', True, True),
+]
+
+# Runs in a fresh interpreter; prints one JSON line
+SAMPLE = r"""
+import json, sys, time
+sys.path.insert(0, ROOT)
+started = time.perf_counter()
+import wsgi
+timings = {'import': time.perf_counter() - started}
+
+clients = {}
+for role, (emp_id, password) in LOGINS.items():
+    clients[role] = wsgi.app.test_client()
+    response = clients[role].post('/login', data={'emp_id': emp_id, 'password': password})
+    assert response.status_code == 302, role
+
+for name, role, url in PAGES:
+    start = time.perf_counter()
+    response = clients[role].get(url)
+    response.get_data()
+    timings[name] = time.perf_counter() - start
+    assert response.status_code == 200, (name, response.status_code)
+print(json.dumps(timings))
+"""
+
+SETUP = r"""
+import json, sys
+sys.path.insert(0, ROOT)
+sys.path.insert(0, ROOT + '/benchmarks')
+from app import create_app, init_db
+from synthetic_data import generate
+app = create_app()
+init_db(app)
+summary = generate(app, departments=3, years=1, rows=20, workbooks=3)
+print(json.dumps(summary['users']))
+"""
+
+
+def run_python(code, work_dir, env):
+    result = subprocess.run([sys.executable, '-c', code], cwd=work_dir, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    return result.stdout.strip().splitlines()[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    from synthetic_data import DEFAULT_PASSWORD
+
+    work_dir = tempfile.mkdtemp(prefix='mis_templates_')
+    base_env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(work_dir, 'templates.db')}")
+    base_env.pop('TEMPLATE_WARMUP', None)
+    prelude = f"ROOT = {ROOT!r}\n"
+    users = json.loads(run_python(prelude + SETUP, work_dir, dict(base_env, JINJA_CACHE_DIR=os.path.join(work_dir, 'setup_cache'))))
+    logins = {'Admin': ('EMP001', 'admin123'), 'Supervisor': (users['Supervisor'][0], DEFAULT_PASSWORD),
+              'Management': (users['Management'][0], DEFAULT_PASSWORD)}
+    sample_code = prelude + f"LOGINS = {logins!r}\nPAGES = {PAGES!r}\n" + SAMPLE
+
+    filled_cache = os.path.join(work_dir, 'filled_cache')
+    run_python(prelude + "import sys\nsys.path.insert(0, ROOT)\nimport app\napp.warm_templates(app.create_app())\nprint('ok')",
+               work_dir, dict(base_env, JINJA_CACHE_DIR=filled_cache))
+
+    results = {}
+    for mode, use_filled_cache, warmup in MODES:
+        samples = []
+        for run in range(args.runs):
+            if use_filled_cache:
+                cache_dir = filled_cache
+            else:
+                cache_dir = os.path.join(work_dir, f'empty_cache_{mode}_{run}')
+            env = dict(base_env, JINJA_CACHE_DIR=cache_dir)
+            if warmup:
+                env['TEMPLATE_WARMUP'] = '1'
+            samples.append(json.loads(run_python(sample_code, work_dir, env)))
+            if not use_filled_cache:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+        results[mode] = {name: min(sample[name] for sample in samples) * 1000 for name in samples[0]}
+        results[mode]['pages_total'] = sum(results[mode][name] for name, _, _ in PAGES)
+
+    columns = ['import'] + [name for name, _, _ in PAGES] + ['pages_total']
+    print(f"\n{'':<16}" + ''.join(f"{name.replace('_mis_tracking', '_tracking'):>22}" for name in columns))
+    for mode, row in results.items():
+        print(f"{mode:<16}" + ''.join(f"{row[name]:>20.1f}ms" for name in columns))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'runs': args.runs, 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,484 @@
+"""
+Deadline-rush load test: the last day of the upload window.
+
+Builds a synthetic dataset in a temp directory (see synthetic_data.py),
+starts gunicorn on it together with a local SMTP sink, then runs concurrent
+simulated users over real HTTP:
+
+    HOD         log in, open MIS Upload, download the department template,
+                post a workbook to /upload-mis, check My Uploads
+    Supervisor  poll Supervisor Uploads, approve validated uploads via
+                approve_hod_upload, refresh Supervisor MIS Tracking
+    Management  keep refreshing Management MIS Tracking and the dashboard
+
+    python benchmarks/loadtest.py --departments 40 --workers 4 --json release-1.4.json
+    python benchmarks/loadtest.py --departments 40 --workers 4 --compare release-1.4.json
+
+The app runs with today pinned to UPLOAD_WINDOW_END_DAY of the current
+month (loadtest_wsgi.py), so HOD uploads pass the window and current-month
+checks whatever the real date is. Every email the app sends goes to the sink;
+--smtp-delay adds a per-message delay to mimic a real SMTP relay, since
+sends happen inside the request. The run ends when every HOD has uploaded
+and supervisors find nothing left to approve, or after --duration seconds.
+
+Reports throughput and latency percentiles per action plus upload and
+approval outcomes; --json saves them and --compare diffs against a saved
+run.
+"""
+
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import socket
+import socketserver
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from datetime import date
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+from config import UPLOAD_WINDOW_END_DAY  # noqa: E402
+from synthetic_data import DEFAULT_PASSWORD, generate, write_workbook  # noqa: E402
+
+APPROVE_LINK = re.compile(r'/approve-hod-upload/(\d+)')
+
+
+class SMTPSink:
+    """
+    Local SMTP server that accepts and counts mail
+
+    Speaks just enough SMTP for smtplib: EHLO, STARTTLS (with a throwaway
+    self-signed certificate), AUTH PLAIN, MAIL/RCPT/DATA and QUIT.
+    """
+
+    def __init__(self, work_dir, delay=0.0):
+        self.delay = delay
+        self.messages = 0
+        self._lock = threading.Lock()
+        self.tls = self._tls_context(work_dir)
+        sink = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                sink._session(self.request)
+
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+
+    @staticmethod
+    def _tls_context(work_dir):
+        cert_path = os.path.join(work_dir, 'smtp-cert.pem')
+        key_path = os.path.join(work_dir, 'smtp-key.pem')
+        try:
+            subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                            '-subj', '/CN=localhost', '-keyout', key_path, '-out', cert_path],
+                           check=True, capture_output=True)
+        except (OSError, subprocess.CalledProcessError):
+            print("  openssl not available - SMTP sink will not offer STARTTLS, so app sends will fail fast")
+            return None
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert_path, key_path)
+        return context
+
+    def _session(self, sock):
+        stream = sock.makefile('rwb')
+
+        def reply(line):
+            stream.write(line.encode() + b'\r\n')
+            stream.flush()
+
+        secured = False
+        reply('220 localhost loadtest SMTP sink')
+        while True:
+            line = stream.readline()
+            if not line:
+                return
+            verb = line.decode(errors='replace').strip().split(' ', 1)[0].upper()
+            if verb in ('EHLO', 'HELO'):
+                if self.tls is not None and not secured:
+                    reply('250-localhost')
+                    reply('250-STARTTLS')
+                else:
+                    reply('250-localhost')
+                reply('250 AUTH PLAIN')
+            elif verb == 'STARTTLS' and self.tls is not None:
+                reply('220 Ready to start TLS')
+                stream.close()
+                sock = self.tls.wrap_socket(sock, server_side=True)
+                stream = sock.makefile('rwb')
+                secured = True
+            elif verb == 'AUTH':
+                reply('235 Authentication successful')
+            elif verb in ('MAIL', 'RCPT', 'RSET', 'NOOP'):
+                reply('250 OK')
+            elif verb == 'DATA':
+                reply('354 End data with <CR><LF>.<CR><LF>')
+                while stream.readline() not in (b'.\r\n', b''):
+                    pass
+                if self.delay:
+                    time.sleep(self.delay)
+                with self._lock:
+                    self.messages += 1
+                reply('250 Queued')
+            elif verb == 'QUIT':
+                reply('221 Bye')
+                return
+            else:
+                reply('502 Command not implemented')
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+        self.outcomes = {}
+
+    def record(self, action, elapsed, ok):
+        with self._lock:
+            self.samples.setdefault(action, []).append(elapsed)
+            if not ok:
+                self.errors[action] = self.errors.get(action, 0) + 1
+
+    def outcome(self, name):
+        with self._lock:
+            self.outcomes[name] = self.outcomes.get(name, 0) + 1
+
+    def summary(self, wall_seconds):
+        actions = {}
+        for action, samples in self.samples.items():
+            samples = sorted(samples)
+
+            def percentile(p):
+                return samples[min(len(samples) - 1, int(len(samples) * p))] * 1000
+
+            actions[action] = {
+                'count': len(samples),
+                'errors': self.errors.get(action, 0),
+                'rps': len(samples) / wall_seconds,
+                'p50_ms': percentile(0.50),
+                'p90_ms': percentile(0.90),
+                'p95_ms': percentile(0.95),
+                'p99_ms': percentile(0.99),
+                'max_ms': samples[-1] * 1000
+            }
+        total = sum(len(samples) for samples in self.samples.values())
+        return {
+            'wall_seconds': wall_seconds,
+            'requests': total,
+            'errors': sum(self.errors.values()),
+            'rps': total / wall_seconds,
+            'actions': actions,
+            'outcomes': dict(self.outcomes)
+        }
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class SimulatedUser:
+    """One browser session; redirects are followed by hand so each hop is timed as its own action"""
+
+    def __init__(self, base_url, stats):
+        self.base_url = base_url
+        self.stats = stats
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def request(self, action, path, data=None, headers=None):
+        """Returns (status, body, redirect location)"""
+        url = path if path.startswith('http') else self.base_url + path
+        req = urllib.request.Request(url, data=data, headers=headers or {})
+        start = time.perf_counter()
+        try:
+            response = self.opener.open(req, timeout=120)
+        except urllib.error.HTTPError as e:
+            response = e
+        except OSError:
+            self.stats.record(action, time.perf_counter() - start, False)
+            return None, b'', None
+        with response:
+            body = response.read()
+        self.stats.record(action, time.perf_counter() - start, response.status < 400)
+        return response.status, body, response.headers.get('Location')
+
+    def get(self, action, path):
+        return self.request(action, path)
+
+    def post_form(self, action, path, fields):
+        return self.request(action, path, data=urllib.parse.urlencode(fields).encode(),
+                            headers={'Content-Type': 'application/x-www-form-urlencoded'})
+
+    def post_multipart(self, action, path, fields, file_field, filename, content):
+        boundary = uuid.uuid4().hex
+        parts = []
+        for name, value in fields.items():
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+                     f'Content-Type: application/vnd.openxmlformats-officedocument.spreadsheetml.sheet\r\n\r\n'.encode())
+        parts.append(content)
+        parts.append(f'\r\n--{boundary}--\r\n'.encode())
+        return self.request(action, path, data=b''.join(parts),
+                            headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+
+    def login(self, emp_id, password):
+        status, _, location = self.post_form('login', '/login', {'emp_id': emp_id, 'password': password})
+        if status != 302:
+            return False
+        self.get('dashboard', location)
+        return True
+
+
+def think(low, high):
+    time.sleep(random.uniform(low, high))
+
+
+def run_hod(base_url, stats, emp_id, password, dept_id, month_id, fy_id, workbook, ramp, think_time):
+    time.sleep(random.uniform(0, ramp))
+    user = SimulatedUser(base_url, stats)
+    if not user.login(emp_id, password):
+        stats.outcome('hod_login_failed')
+        return
+    think(*think_time)
+    user.get('mis_upload_page', '/mis-upload')
+    user.get('download_template', f'/download-template/{dept_id}')
+    think(*think_time)
+    status, _, location = user.post_multipart('upload_mis', '/upload-mis',
+                                              {'department_id': dept_id, 'month_id': month_id, 'fy_id': fy_id},
+                                              'file', f'MIS_{emp_id}.xlsx', workbook)
+    if status == 302 and location:
+        _, body, _ = user.get('mis_upload_page', location)
+        if b'uploaded successfully' in body:
+            stats.outcome('upload_accepted')
+        elif b'server is busy' in body:
+            stats.outcome('upload_busy')
+        else:
+            stats.outcome('upload_refused')
+    else:
+        stats.outcome('upload_error')
+    think(*think_time)
+    user.get('my_uploads', '/my-uploads')
+
+
+def run_supervisor(base_url, stats, emp_id, password, hods_done, stop, think_time, batch):
+    user = SimulatedUser(base_url, stats)
+    if not user.login(emp_id, password):
+        stats.outcome('supervisor_login_failed')
+        return
+    _, body, _ = user.get('supervisor_uploads', '/supervisor-uploads')
+    while not stop.is_set():
+        pending = sorted(set(APPROVE_LINK.findall(body.decode(errors='replace'))))
+        random.shuffle(pending)
+        for upload_id in pending[:batch]:
+            status, _, location = user.post_form('approve_hod_upload', f'/approve-hod-upload/{upload_id}', {})
+            if status != 302 or not location:
+                stats.outcome('approve_error')
+                continue
+            _, body, _ = user.get('supervisor_uploads', location)
+            if b'approved successfully' in body:
+                stats.outcome('approved')
+            elif b'cannot be approved' in body:
+                stats.outcome('approve_not_validated')
+            else:
+                stats.outcome('approve_other')
+        if not pending and hods_done.is_set():
+            return
+        user.get('supervisor_mis_tracking', '/supervisor-mis-tracking')
+        think(*think_time)
+        _, body, _ = user.get('supervisor_uploads', '/supervisor-uploads')
+
+
+def run_management(base_url, stats, emp_id, password, stop, think_time):
+    user = SimulatedUser(base_url, stats)
+    if not user.login(emp_id, password):
+        stats.outcome('management_login_failed')
+        return
+    while not stop.is_set():
+        user.get('management_mis_tracking', '/management-mis-tracking')
+        think(*think_time)
+        user.get('dashboard', '/dashboard')
+        think(*think_time)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(work_dir, port, env, workers, threads):
+    command = [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--threads', str(threads),
+               '--bind', f'127.0.0.1:{port}', '--chdir', work_dir, '--pythonpath', f'{ROOT},{BENCH_DIR}',
+               '--timeout', '120', '--log-level', 'warning', 'loadtest_wsgi:app']
+    log = open(os.path.join(work_dir, 'gunicorn.log'), 'w')
+    process = subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited early - see {log.name}")
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/login', timeout=2):
+                return process
+        except OSError:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"gunicorn did not start within 60s - see {log.name}")
+
+
+def print_report(summary, baseline):
+    print(f"\n{'action':<26} {'count':>6} {'err':>5} {'rps':>7} {'p50':>9} {'p90':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for action, row in sorted(summary['actions'].items()):
+        line = (f"{action:<26} {row['count']:>6} {row['errors']:>5} {row['rps']:>7.2f} {row['p50_ms']:>7.0f}ms "
+                f"{row['p90_ms']:>7.0f}ms {row['p95_ms']:>7.0f}ms {row['p99_ms']:>7.0f}ms {row['max_ms']:>7.0f}ms")
+        before = baseline.get('actions', {}).get(action)
+        if before:
+            line += f"   (p95 {row['p95_ms'] - before['p95_ms']:+.0f}ms, rps {row['rps'] - before['rps']:+.2f})"
+        print(line)
+    print(f"\n  total requests={summary['requests']} errors={summary['errors']} "
+          f"throughput={summary['rps']:.2f} req/s over {summary['wall_seconds']:.1f}s")
+    if baseline:
+        print(f"  baseline throughput={baseline['rps']:.2f} req/s, errors={baseline['errors']}")
+    print(f"  outcomes: {', '.join(f'{k}={v}' for k, v in sorted(summary['outcomes'].items()))}")
+    print(f"  emails delivered to SMTP sink: {summary['emails']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--departments', type=int, default=20, help='departments, one uploading HOD each')
+    parser.add_argument('--years', type=int, default=2, help='financial years of synthetic history')
+    parser.add_argument('--rows', type=int, default=500, help='data rows per uploaded workbook')
+    parser.add_argument('--supervisors', type=int, default=2)
+    parser.add_argument('--management', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=1, help='gunicorn threads per worker')
+    parser.add_argument('--database-url', help='database for the run (default: SQLite in the temp directory)')
+    parser.add_argument('--ramp', type=float, default=10.0, help='seconds over which HODs start')
+    parser.add_argument('--think', type=float, nargs=2, default=[0.2, 1.0], metavar=('MIN', 'MAX'),
+                        help='think time between a user\'s actions, seconds')
+    parser.add_argument('--approve-batch', type=int, default=5, help='approvals per supervisor pass')
+    parser.add_argument('--smtp-delay', type=float, default=0.0, help='seconds the SMTP sink takes per message')
+    parser.add_argument('--duration', type=float, default=300.0, help='hard stop, seconds')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--compare', help='results file from an earlier run to diff against')
+    args = parser.parse_args()
+    random.seed(args.seed)
+    args.json = os.path.abspath(args.json) if args.json else None
+    args.compare = os.path.abspath(args.compare) if args.compare else None
+
+    work_dir = tempfile.mkdtemp(prefix='mis_loadtest_')
+    database_url = args.database_url or f"sqlite:///{os.path.join(work_dir, 'loadtest.db')}"
+    os.environ['DATABASE_URL'] = database_url
+    os.chdir(work_dir)
+
+    today = date.today()
+    simulated_today = today.replace(day=UPLOAD_WINDOW_END_DAY)
+    print(f"Work directory: {work_dir}")
+    print(f"Simulating {simulated_today.isoformat()} (last day of the upload window)")
+
+    from app import create_app, init_db
+    from models import User, FinancialYear
+    app = create_app()
+    init_db(app)
+    print("\nGenerating synthetic data...")
+    summary = generate(app, departments=args.departments, years=args.years, supervisors=args.supervisors,
+                       management=args.management, rows=args.rows, seed=args.seed, current_month=False)
+    with app.app_context():
+        hod_departments = {user.EmpID: user.DepartmentID for user in User.query.filter(User.EmpID.in_(summary['users']['HOD']))}
+        fy_id = FinancialYear.query.filter_by(ActiveFlag=True).first().FYID
+
+    # Every HOD uploads distinct content so each one is really validated
+    rng = random.Random(args.seed)
+    workbooks = {}
+    for emp_id in summary['users']['HOD']:
+        path = os.path.join(work_dir, f"{emp_id}.xlsx")
+        write_workbook(path, args.rows, 8, rng)
+        with open(path, 'rb') as f:
+            workbooks[emp_id] = f.read()
+        os.remove(path)
+
+    sink = SMTPSink(work_dir, args.smtp_delay)
+    sink.start()
+    port = free_port()
+    env = dict(os.environ, LOADTEST_DATE=simulated_today.isoformat(), LOADTEST_SMTP_PORT=str(sink.port))
+    print(f"Starting gunicorn ({args.workers} workers x {args.threads} threads) on port {port}...")
+    server = start_gunicorn(work_dir, port, env, args.workers, args.threads)
+    base_url = f'http://127.0.0.1:{port}'
+
+    stats = Stats()
+    stop = threading.Event()
+    hods_done = threading.Event()
+    think_time = tuple(args.think)
+    hod_threads = [threading.Thread(target=run_hod, args=(base_url, stats, emp_id, DEFAULT_PASSWORD, dept_id,
+                                                          simulated_today.month, fy_id, workbooks[emp_id],
+                                                          args.ramp, think_time))
+                   for emp_id, dept_id in hod_departments.items()]
+    supervisor_threads = [threading.Thread(target=run_supervisor, args=(base_url, stats, emp_id, DEFAULT_PASSWORD,
+                                                                        hods_done, stop, think_time, args.approve_batch))
+                          for emp_id in summary['users']['Supervisor']]
+    management_threads = [threading.Thread(target=run_management, args=(base_url, stats, emp_id, DEFAULT_PASSWORD,
+                                                                        stop, think_time))
+                          for emp_id in summary['users']['Management']]
+
+    print(f"Running {len(hod_threads)} HODs, {len(supervisor_threads)} supervisors, "
+          f"{len(management_threads)} management users...")
+    started = time.perf_counter()
+    deadline = started + args.duration
+    try:
+        for thread in hod_threads + supervisor_threads + management_threads:
+            thread.daemon = True
+            thread.start()
+        for thread in hod_threads:
+            thread.join(max(0, deadline - time.perf_counter()))
+        hods_done.set()
+        for thread in supervisor_threads:
+            thread.join(max(0, deadline - time.perf_counter()))
+        stop.set()
+        for thread in management_threads:
+            thread.join(30)
+        wall_seconds = time.perf_counter() - started
+    finally:
+        stop.set()
+        server.terminate()
+        server.wait(30)
+        sink.stop()
+
+    results = stats.summary(wall_seconds)
+    results['emails'] = sink.messages
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+    print_report(results, baseline)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
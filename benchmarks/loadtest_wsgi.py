@@ -0,0 +1,41 @@
+"""
+gunicorn entry point used by loadtest.py.
+
+Serves the normal app, with two adjustments read from the environment so a
+load test can run on any day without touching real mail:
+
+    LOADTEST_DATE       ISO date the app treats as today (upload window and
+                        current-month checks), e.g. the window's last day
+    LOADTEST_SMTP_PORT  port of the local SMTP sink on 127.0.0.1; replaces
+                        the configured SMTP server and credentials
+"""
+
+import os
+from datetime import date
+
+import app as mis_app
+import services
+from email_service import email_service
+from routes import admin, exports, hod, main, management, pdf, supervisor
+
+if os.environ.get('LOADTEST_DATE'):
+    _simulated_today = date.fromisoformat(os.environ['LOADTEST_DATE'])
+
+    class SimulatedDate(date):
+        @classmethod
+        def today(cls):
+            return _simulated_today
+
+    # Every module that imported date checks the window against its own reference
+    for module in (mis_app, services, admin, exports, hod, main, management, pdf, supervisor):
+        if getattr(module, 'date', None) is date:
+            module.date = SimulatedDate
+
+if os.environ.get('LOADTEST_SMTP_PORT'):
+    email_service.smtp_host = '127.0.0.1'
+    email_service.smtp_port = int(os.environ['LOADTEST_SMTP_PORT'])
+    email_service.smtp_username = 'loadtest'
+    email_service.smtp_password = 'loadtest'
+    email_service.from_email = 'mis@loadtest.invalid'
+
+app = mis_app.create_app()
@@ -0,0 +1,173 @@
+"""
+Stand-in reverse proxy for checking download offload (X-Accel-Redirect / X-Sendfile).
+
+With DOWNLOAD_OFFLOAD set, the download routes only check permissions and
+answer with an internal-redirect header; the proxy streams the file. This
+script wraps the app in a small WSGI middleware that does what nginx does
+with such a response - map the internal location onto the uploads folder,
+refuse anything outside it, and serve the file with range support - then
+checks every stored-file download route against the normal streamed
+response:
+
+    python benchmarks/offload_proxy.py                      # nginx mode
+    python benchmarks/offload_proxy.py --mode x-sendfile    # Apache/lighttpd mode
+    python benchmarks/offload_proxy.py --serve 8080         # browse through the stand-in
+
+The matching nginx set-up (the location must be 'internal' so it can only be
+reached through the header, never requested directly):
+
+    location /_protected/uploads/ {
+        internal;
+        alias /srv/mis/uploads/;
+    }
+    location / {
+        proxy_pass http://127.0.0.1:8000;
+    }
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+from urllib.parse import unquote
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmp_dir = tempfile.mkdtemp(prefix='mis_offload_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp_dir, 'offload.db')}"
+os.chdir(_tmp_dir)
+
+
+class OffloadProxy:
+    """WSGI middleware standing in for nginx/Apache in front of the app"""
+
+    def __init__(self, app, upload_root, location):
+        self.app = app
+        self.upload_root = os.path.abspath(upload_root)
+        self.location = location.rstrip('/') + '/'
+        self.offloaded = []
+
+    def resolve(self, headers):
+        """Disk path the proxy would serve for these upstream headers, or None if none were sent"""
+        if 'X-Accel-Redirect' in headers:
+            uri = headers['X-Accel-Redirect']
+            if not uri.startswith(self.location):
+                raise AssertionError(f"X-Accel-Redirect {uri} is outside {self.location}")
+            path = os.path.abspath(os.path.join(self.upload_root, unquote(uri[len(self.location):])))
+        elif 'X-Sendfile' in headers:
+            path = os.path.abspath(headers['X-Sendfile'])
+        else:
+            return None
+        if not path.startswith(self.upload_root + os.sep):
+            raise AssertionError(f"Offloaded path {path} escapes the uploads folder")
+        return path
+
+    def __call__(self, environ, start_response):
+        from werkzeug.test import run_wsgi_app
+        from werkzeug.utils import send_file
+        from werkzeug.wrappers import Response
+
+        body, status, headers = run_wsgi_app(self.app, environ)
+        path = self.resolve(headers)
+        if path is None:
+            return Response(body, status, headers)(environ, start_response)
+
+        body_bytes = b''.join(body)
+        if body_bytes:
+            raise AssertionError(f"Offloaded response still carried {len(body_bytes)} body bytes")
+        self.offloaded.append(path)
+        # Like nginx: upstream's disposition and caching headers are kept, the file comes from disk
+        response = send_file(path, environ, mimetype=headers.get('Content-Type'), conditional=True)
+        for name in ('Content-Disposition', 'Cache-Control', 'ETag', 'Vary'):
+            if name in headers:
+                response.headers[name] = headers[name]
+        return response(environ, start_response)
+
+
+def login(app, emp_id, password):
+    client = app.test_client()
+    response = client.post('/login', data={'emp_id': emp_id, 'password': password})
+    if response.status_code != 302:
+        raise RuntimeError(f"Login failed for {emp_id}")
+    return client
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=['x-accel-redirect', 'x-sendfile'], default='x-accel-redirect')
+    parser.add_argument('--serve', type=int, metavar='PORT', help='serve the app behind the stand-in proxy on this port')
+    args = parser.parse_args()
+
+    import services
+    from app import create_app, init_db
+    from config import DOWNLOAD_OFFLOAD_LOCATION
+    from extensions import db
+    from models import ConsolidatedMIS, MISUpload, Template
+    from synthetic_data import generate
+
+    app = create_app()
+    init_db(app)
+    generate(app, departments=3, years=1, rows=50, workbooks=3)
+    proxy = OffloadProxy(app.wsgi_app, app.config['UPLOAD_FOLDER'], DOWNLOAD_OFFLOAD_LOCATION)
+
+    if args.serve:
+        from werkzeug.serving import run_simple
+        services.download_offload_mode = args.mode
+        app.wsgi_app = proxy
+        print(f"Serving through the stand-in proxy ({args.mode}) in {_tmp_dir}")
+        run_simple('127.0.0.1', args.serve, app)
+        return
+
+    with app.app_context():
+        upload = db.session.get(MISUpload, db.session.query(db.func.max(MISUpload.UploadID)).scalar())
+        consolidated = db.session.get(ConsolidatedMIS, db.session.query(db.func.max(ConsolidatedMIS.ConsolidatedMISID)).scalar())
+        template = Template.query.first()
+        routes = [
+            ('download_upload', f'/download-upload/{upload.UploadID}', upload.ContentHash),
+            ('download_consolidated_mis', f'/download-consolidated-mis/{consolidated.ConsolidatedMISID}', consolidated.ContentHash),
+            ('download_template', f'/download-template/{template.DepartmentID}', template.ContentHash),
+        ]
+
+    streamed_client = login(app, 'EMP001', 'admin123')
+    streamed = {name: streamed_client.get(url) for name, url, _ in routes}
+
+    services.download_offload_mode = args.mode
+    app.wsgi_app = proxy
+    client = login(app, 'EMP001', 'admin123')
+    failures = []
+
+    def check(label, condition):
+        print(f"  {'ok  ' if condition else 'FAIL'} {label}")
+        if not condition:
+            failures.append(label)
+
+    for name, url, content_hash in routes:
+        print(f"\n{name} ({url})")
+        response = client.get(url)
+        check('proxy served the file from disk', len(proxy.offloaded) == 1)
+        offloaded_path = proxy.offloaded.pop() if proxy.offloaded else None
+        check('bytes match the streamed download', response.data == streamed[name].data)
+        check('bytes match the stored SHA-256', hashlib.sha256(response.data).hexdigest() == content_hash)
+        check('Content-Disposition kept', response.headers.get('Content-Disposition') == streamed[name].headers.get('Content-Disposition'))
+        check('Cache-Control kept', response.headers.get('Cache-Control') == streamed[name].headers.get('Cache-Control'))
+        check('offloaded file is inside the uploads folder',
+              offloaded_path is not None and offloaded_path.startswith(proxy.upload_root + os.sep))
+
+        response = client.get(url, headers={'If-None-Match': f'"{content_hash}"'})
+        check('unchanged repeat answered 304 by the app', response.status_code == 304 and not proxy.offloaded)
+
+        response = client.get(url, headers={'Range': 'bytes=10-19'})
+        proxy.offloaded.clear()
+        check('range request served by the proxy', response.status_code == 206 and response.data == streamed[name].data[10:20])
+
+        response = app.test_client().get(url)
+        check('anonymous request gets no internal redirect', response.status_code == 302 and not proxy.offloaded)
+
+    print(f"\n{'All offload checks passed' if not failures else f'{len(failures)} offload checks failed'} ({args.mode})")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+"""
+Synthetic data generator for benchmarks and manual load testing.
+
+Fills the models with departments and their HODs, supervisors, management
+users, several financial years of MISUpload/ConsolidatedMIS history, and
+the .xlsx workbooks those rows point at. Workbooks go through the content
+store like real uploads, so the blob layout, hashes and row counts match
+production data:
+    python benchmarks/synthetic_data.py --departments 20 --years 3 --rows 500
+
+By default it writes to a throwaway SQLite database in a temp directory
+(printed at the end); pass --database-url to fill another database. Every
+generated user's password is the one given by --password (default
+bench123); EmpIDs are SYN-HOD-0001, SYN-SUP-01, SYN-MGT-01 and so on.
+
+Other scripts import generate() after pointing DATABASE_URL and the working
+directory at their own scratch space, since app reads both on import.
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_PASSWORD = 'bench123'
+MONTH_HEADERS = ['Line Item', 'Category', 'Budget', 'Actual', 'Variance', 'Remarks']
+
+
+def department_name(index):
+    """Names with distinct three-letter prefixes, since MIS codes use the first three letters"""
+    letters = string.ascii_uppercase
+    prefix = letters[index // 676 % 26] + letters[index // 26 % 26] + letters[index % 26]
+    return f"{prefix} Division"
+
+
+def write_workbook(path, rows, columns, rng):
+    """Write a synthetic MIS workbook with a header row and rows x columns of data"""
+    import openpyxl
+
+    headers = (MONTH_HEADERS + [f"Metric {i}" for i in range(len(MONTH_HEADERS), columns)])[:columns]
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(title='MIS')
+    sheet.append(headers)
+    for row_index in range(rows):
+        row = [f"Item {row_index + 1}", rng.choice(['Revenue', 'Expense', 'Capex', 'Headcount'])]
+        row += [round(rng.uniform(1000, 100000), 2) for _ in range(columns - 3)]
+        row.append(rng.choice(['', 'On track', 'Delayed', 'Revised estimate']))
+        sheet.append(row[:columns])
+    workbook.save(path)
+
+
+def build_workbook_pool(count, rows, columns, rng):
+    """
+    Stage count distinct workbooks into the content store
+
+    Returns:
+        list: (blob_path, sha256) for each workbook
+    """
+    from extensions import content_store
+
+    pool = []
+    for _ in range(count):
+        path = content_store.incoming_path('.xlsx')
+        write_workbook(path, rows, columns, rng)
+        staged = content_store.stage_path(path, '.xlsx')
+        pool.append((staged.commit(), staged.sha256))
+    return pool
+
+
+def financial_years(count, today):
+    """
+    The FY containing today plus count - 1 preceding years, oldest first
+
+    Missing years are created, and the FY containing today becomes the only
+    active one.
+    """
+    from extensions import db
+    from models import FinancialYear
+
+    last_start = today.year if today.month >= 4 else today.year - 1
+    years = []
+    for start_year in range(last_start - count + 1, last_start + 1):
+        name = f"{start_year}-{start_year + 1}"
+        fy = FinancialYear.query.filter_by(FYName=name).first()
+        if fy is None:
+            fy = FinancialYear(FYName=name, StartDate=date(start_year, 4, 1), EndDate=date(start_year + 1, 3, 31))  # type: ignore
+            db.session.add(fy)
+        years.append(fy)
+    for fy in FinancialYear.query.all():
+        fy.ActiveFlag = False
+    years[-1].ActiveFlag = True
+    db.session.commit()
+    return years
+
+
+def make_user(emp_id, name, dept_id, role_id, password_hash):
+    from models import User, IST
+
+    now = datetime.now(IST)
+    return User(  # type: ignore
+        EmpID=emp_id,
+        Username=name,
+        Email=f"{emp_id.lower()}@synthetic.example",
+        PasswordHash=password_hash,
+        DepartmentID=dept_id,
+        RoleID=role_id,
+        IsActive=True,
+        FailedLoginAttempts=0,
+        PasswordLastChanged=now,
+        PasswordExpiryDate=now + timedelta(days=365)
+    )
+
+
+def generate(app, departments=10, years=2, supervisors=2, management=2, rows=200, columns=8, workbooks=12,
+             password=DEFAULT_PASSWORD, seed=1, current_month=True):
+    """
+    Fill app's database with synthetic users and MIS history
+
+    Must be called after init_db(), on a database that has not been filled
+    before (EmpIDs are fixed). One upload is created per department per
+    month of every year; statuses are spread across the approval workflow,
+    and each month's supervisor-approved uploads are rolled into a
+    ConsolidatedMIS. Every department also gets a template. Pass
+    current_month=False to stop at last month, leaving this month's uploads
+    to be made through the app (loadtest.py does).
+
+    Returns:
+        dict: counts of what was created and the generated EmpIDs by role
+    """
+    from auth import hash_password
+    from extensions import db
+    from models import IST, Role, Department, MISCodeSequence, MISUpload, ConsolidatedMIS, Template
+    from services import invalidate_reference_data
+
+    rng = random.Random(seed)
+    with app.app_context():
+        roles = {role.RoleName: role.RoleID for role in Role.query.all()}
+        # bcrypt is deliberately slow; every synthetic user shares one hash
+        password_hash = hash_password(password)
+
+        depts = []
+        for index in range(departments):
+            name = department_name(index)
+            dept = Department.query.filter_by(DeptName=name).first()
+            if dept is None:
+                dept = Department(DeptName=name, ActiveFlag=True)  # type: ignore
+                db.session.add(dept)
+            depts.append(dept)
+        db.session.flush()
+        sequenced_ids = {seq.DepartmentID for seq in MISCodeSequence.query.all()}
+        db.session.add_all([MISCodeSequence(DepartmentID=dept.DeptID, LastValue=0)  # type: ignore
+                            for dept in depts if dept.DeptID not in sequenced_ids])
+
+        first_dept_id = depts[0].DeptID if depts else Department.query.first().DeptID
+        users = {'HOD': [], 'Supervisor': [], 'Management': []}
+        specs = [(f"SYN-HOD-{i + 1:04d}", f"HOD {dept.DeptName}", dept.DeptID, 'HOD') for i, dept in enumerate(depts)]
+        specs += [(f"SYN-SUP-{i + 1:02d}", f"Supervisor {i + 1}", first_dept_id, 'Supervisor') for i in range(supervisors)]
+        specs += [(f"SYN-MGT-{i + 1:02d}", f"Management {i + 1}", first_dept_id, 'Management') for i in range(management)]
+        created = {'HOD': [], 'Supervisor': [], 'Management': []}
+        for emp_id, name, dept_id, role_name in specs:
+            user = make_user(emp_id, name, dept_id, roles[role_name], password_hash)
+            db.session.add(user)
+            users[role_name].append(emp_id)
+            created[role_name].append(user)
+        db.session.commit()
+
+        hods = {user.DepartmentID: user.UserID for user in created['HOD']}
+        supervisor_ids = [user.UserID for user in created['Supervisor']]
+        management_ids = [user.UserID for user in created['Management']]
+
+        pool = build_workbook_pool(workbooks, rows, columns, rng)
+        now = datetime.now(IST)
+        fys = financial_years(years, now.date())
+        invalidate_reference_data()
+        this_month = datetime(now.year, now.month, 1, tzinfo=IST)
+
+        for dept in depts:
+            file_path, sha256 = rng.choice(pool)
+            db.session.add(Template(DepartmentID=dept.DeptID, FilePath=file_path, ContentHash=sha256,  # type: ignore
+                                    FileName=f"{dept.DeptName} template.xlsx"))
+        db.session.commit()
+
+        upload_count = 0
+        consolidated_count = 0
+        for fy in fys:
+            for month_id in range(1, 13):
+                # FY months run April-March
+                month_year = fy.StartDate.year if month_id >= 4 else fy.EndDate.year
+                month_start = datetime(month_year, month_id, 1, tzinfo=IST)
+                if month_start > now or (month_start == this_month and not current_month):
+                    continue
+
+                uploads = []
+                for dept in depts:
+                    file_path, sha256 = rng.choice(pool)
+                    status = rng.choices(['Approved', 'In Review', 'Rejected'], weights=[70, 20, 10])[0]
+                    supervisor_approved = status == 'Approved' or rng.random() < 0.5
+                    seq = db.session.get(MISCodeSequence, dept.DeptID)
+                    seq.LastValue += 1
+                    upload_date = month_start + timedelta(days=rng.randint(0, 9), hours=rng.randint(9, 18))
+                    uploads.append(MISUpload(  # type: ignore
+                        UploadCode=f"MIS{dept.DeptName[:3].upper()}{seq.LastValue:06d}",
+                        DepartmentID=dept.DeptID,
+                        MonthID=month_id,
+                        FYID=fy.FYID,
+                        UploadedBy=hods[dept.DeptID],
+                        UploadDate=upload_date,
+                        FilePath=file_path,
+                        FileName=f"{dept.DeptName} {month_id:02d}-{month_year}.xlsx",
+                        ContentHash=sha256,
+                        FileCheck='Validated',
+                        DataRowCount=rows,
+                        Status=status,
+                        IsCancelled=rng.random() < 0.02,
+                        SupervisorApproved=supervisor_approved,
+                        SupervisorApprovedBy=rng.choice(supervisor_ids) if supervisor_approved and supervisor_ids else None,
+                        SupervisorApprovedDate=upload_date + timedelta(days=rng.randint(1, 5)) if supervisor_approved else None
+                    ))
+                db.session.add_all(uploads)
+                db.session.flush()
+                upload_count += len(uploads)
+
+                included = [upload.UploadID for upload in uploads if upload.SupervisorApproved and not upload.IsCancelled]
+                if included and supervisor_ids:
+                    file_path, sha256 = rng.choice(pool)
+                    status = rng.choices(['Approved', 'Pending Review', 'Rejected'], weights=[75, 15, 10])[0]
+                    created = month_start + timedelta(days=rng.randint(12, 20))
+                    db.session.add(ConsolidatedMIS(  # type: ignore
+                        SupervisorID=rng.choice(supervisor_ids),
+                        FYID=fy.FYID,
+                        MonthID=month_id,
+                        UploadedHODMISIDs=','.join(str(upload_id) for upload_id in included),
+                        ConsolidatedFilePath=file_path,
+                        FileName=f"Consolidated {month_id:02d}-{month_year}.xlsx",
+                        ContentHash=sha256,
+                        Status=status,
+                        CreatedDate=created,
+                        ApprovedDate=created + timedelta(days=2) if status == 'Approved' else None,
+                        ApprovedBy=rng.choice(management_ids) if status == 'Approved' and management_ids else None
+                    ))
+                    consolidated_count += 1
+            db.session.commit()
+
+    return {
+        'departments': len(depts),
+        'financial_years': len(fys),
+        'uploads': upload_count,
+        'consolidated': consolidated_count,
+        'workbooks': len(pool),
+        'users': users
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='database to fill (default: a new temp SQLite database)')
+    parser.add_argument('--departments', type=int, default=10)
+    parser.add_argument('--years', type=int, default=2, help='financial years of history, ending at the current one')
+    parser.add_argument('--supervisors', type=int, default=2)
+    parser.add_argument('--management', type=int, default=2)
+    parser.add_argument('--rows', type=int, default=200, help='data rows per workbook')
+    parser.add_argument('--columns', type=int, default=8, help='columns per workbook')
+    parser.add_argument('--workbooks', type=int, default=12, help='distinct workbooks shared by the uploads')
+    parser.add_argument('--password', default=DEFAULT_PASSWORD)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        work_dir = tempfile.mkdtemp(prefix='mis_synthetic_')
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(work_dir, 'synthetic.db')}"
+        os.chdir(work_dir)
+
+    from app import create_app, init_db
+    app = create_app()
+    init_db(app)
+    summary = generate(app, departments=args.departments, years=args.years, supervisors=args.supervisors,
+                       management=args.management, rows=args.rows, columns=args.columns,
+                       workbooks=args.workbooks, password=args.password, seed=args.seed)
+
+    print(f"\nDatabase: {os.environ['DATABASE_URL']}")
+    print(f"Uploads folder: {os.path.abspath('uploads')}")
+    print(f"  departments={summary['departments']} financial_years={summary['financial_years']} "
+          f"uploads={summary['uploads']} consolidated={summary['consolidated']} workbooks={summary['workbooks']}")
+    for role_name, emp_ids in summary['users'].items():
+        if emp_ids:
+            print(f"  {role_name}: {emp_ids[0]} .. {emp_ids[-1]} ({len(emp_ids)})  password={args.password}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Builds the fingerprinted front-end bundle in static/dist/.
+
+Pages used to pull Tailwind's in-browser compiler, Font Awesome and Chart.js
+from public CDNs on every load. This script vendors pinned copies through npm
+(which checks their integrity), compiles Tailwind ahead of time against the
+class names used in templates/, and writes:
+
+    static/dist/app.<hash>.css        styles.css + Font Awesome + purged Tailwind, minified
+    static/dist/webfonts/<name>.<hash>.woff2
+    static/dist/chart.<hash>.js
+    static/dist/manifest.json         logical name -> fingerprinted file
+
+Run it on a machine with npm access after changing templates or styles.css,
+and deploy static/dist/ with the code:
+
+    python build_assets.py
+
+Templates look assets up through asset_url(); until a manifest exists they
+fall back to the CDN tags, so a checkout that was never built still works
+on a connected network.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(ROOT, 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST = os.path.join(DIST_DIR, 'manifest.json')
+
+# Pinned to the versions the CDN tags load, so the bundle renders the same
+PACKAGES = ['tailwindcss@3.4.17', '@fortawesome/fontawesome-free@6.4.0', 'chart.js@3.9.1']
+
+FONT_URL = re.compile(r'url\(\s*["\']?\.\./webfonts/([^"\')?#]+)([^"\')]*)["\']?\s*\)')
+
+
+def fingerprint(content):
+    return hashlib.sha256(content).hexdigest()[:12]
+
+
+def write_fingerprinted(directory, stem, suffix, content):
+    """Write content as <stem>.<hash><suffix> under directory; returns the file name"""
+    name = f"{stem}.{fingerprint(content)}{suffix}"
+    with open(os.path.join(directory, name), 'wb') as f:
+        f.write(content)
+    return name
+
+
+def install_packages(build_dir):
+    subprocess.run(['npm', 'install', '--no-save', '--no-audit', '--no-fund', '--prefix', build_dir] + PACKAGES,
+                   check=True)
+    return os.path.join(build_dir, 'node_modules')
+
+
+def compile_tailwind(node_modules, build_dir):
+    """Purged, minified Tailwind for the classes that appear in templates/"""
+    output = os.path.join(build_dir, 'tailwind.css')
+    subprocess.run([os.path.join(node_modules, '.bin', 'tailwindcss'),
+                    '--config', os.path.join(STATIC_DIR, 'src', 'tailwind.config.js'),
+                    '--input', os.path.join(STATIC_DIR, 'src', 'tailwind.css'),
+                    '--output', output, '--minify'], cwd=ROOT, check=True)
+    with open(output, 'rb') as f:
+        return f.read()
+
+
+def vendor_font_awesome(node_modules, dist_dir):
+    """Font Awesome CSS with its webfont URLs pointing at fingerprinted copies"""
+    package = os.path.join(node_modules, '@fortawesome', 'fontawesome-free')
+    fonts_dir = os.path.join(dist_dir, 'webfonts')
+    os.makedirs(fonts_dir, exist_ok=True)
+    renamed = {}
+
+    def replace(match):
+        font, query = match.group(1), match.group(2)
+        if font not in renamed:
+            with open(os.path.join(package, 'webfonts', font), 'rb') as f:
+                stem, suffix = os.path.splitext(font)
+                renamed[font] = write_fingerprinted(fonts_dir, stem, suffix, f.read())
+        # The bundle lives in dist/, the fonts in dist/webfonts/
+        return f'url(webfonts/{renamed[font]}{query})'
+
+    with open(os.path.join(package, 'css', 'all.min.css'), encoding='utf-8') as f:
+        css = FONT_URL.sub(replace, f.read())
+    return css.encode('utf-8'), ['webfonts/' + name for name in renamed.values()]
+
+
+def prune(dist_dir, keep):
+    """Remove bundles from earlier builds; anything still referenced is in keep"""
+    for directory, _, files in os.walk(dist_dir):
+        for name in files:
+            path = os.path.relpath(os.path.join(directory, name), dist_dir).replace(os.sep, '/')
+            if path != 'manifest.json' and path not in keep:
+                os.remove(os.path.join(directory, name))
+
+
+def build(keep_build_dir=False):
+    build_dir = tempfile.mkdtemp(prefix='mis_assets_')
+    try:
+        node_modules = install_packages(build_dir)
+        os.makedirs(DIST_DIR, exist_ok=True)
+
+        with open(os.path.join(STATIC_DIR, 'css', 'styles.css'), 'rb') as f:
+            custom_css = f.read()
+        font_awesome_css, fonts = vendor_font_awesome(node_modules, DIST_DIR)
+        tailwind_css = compile_tailwind(node_modules, build_dir)
+        # Same cascade as the CDN set-up: the runtime Tailwind styles were injected last
+        bundle = b'\n'.join([custom_css, font_awesome_css, tailwind_css])
+
+        with open(os.path.join(node_modules, 'chart.js', 'dist', 'chart.min.js'), 'rb') as f:
+            chart_js = f.read()
+
+        manifest = {
+            'app.css': write_fingerprinted(DIST_DIR, 'app', '.css', bundle),
+            'chart.js': write_fingerprinted(DIST_DIR, 'chart', '.js', chart_js),
+        }
+        prune(DIST_DIR, set(manifest.values()) | set(fonts))
+        with open(MANIFEST, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        return manifest, fonts
+    finally:
+        if keep_build_dir:
+            print(f"Build directory kept at {build_dir}")
+        else:
+            shutil.rmtree(build_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--keep-build-dir', action='store_true', help='keep node_modules for inspection')
+    args = parser.parse_args()
+
+    if shutil.which('npm') is None:
+        sys.exit("npm is required to build the assets")
+    manifest, fonts = build(args.keep_build_dir)
+    for logical, name in sorted(manifest.items()):
+        size = os.path.getsize(os.path.join(DIST_DIR, name))
+        print(f"  {logical:<10} -> dist/{name} ({size / 1024:.1f} KiB)")
+    print(f"  {len(fonts)} webfonts in dist/webfonts/")
+
+
+if __name__ == '__main__':
+    main()
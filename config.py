@@ -23,3 +23,96 @@ UPLOAD_WINDOW_LOCK_HOUR = 0
 UPLOAD_WINDOW_LOCK_MINUTE = 0
 SUPERVISOR_APPROVAL_HOUR = 10
 SUPERVISOR_APPROVAL_MINUTE = 0
+
+# Chunked Upload Configuration
+
+CHUNKED_UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024    # Bytes per chunk (must stay below MAX_CONTENT_LENGTH)
+CHUNKED_UPLOAD_MAX_SIZE = 200 * 1024 * 1024    # Largest workbook accepted through chunked upload
+CHUNKED_UPLOAD_EXPIRY_HOURS = 48               # Unfinished chunked uploads are purged after this
+BLOB_DELETE_GRACE_SECONDS = 3600               # Stored files written or reused more recently are left for the blob sweep
+
+# Upload Validation Pipeline Configuration
+
+VALIDATION_WORKERS = 2           # Workbooks parsed concurrently per node
+VALIDATION_MAX_PENDING = 20      # Uploads queued or parsing per node before new ones are turned away
+VALIDATION_STALE_MINUTES = 15    # Uploads still 'Validating' this long after queueing are re-queued (worker died mid-parse)
+VALIDATION_STALE_CHECK_SECONDS = 60  # How often each worker looks for stale validations
+
+# Metrics Configuration
+
+METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')   # Addresses (or networks, e.g. '10.0.0.0/24') that may scrape /metrics directly; add the Prometheus server
+METRICS_BEARER_TOKEN = None                  # If set, scrapers may instead send "Authorization: Bearer <token>"; env METRICS_TOKEN overrides
+
+# SQL Profiling Configuration
+
+SQL_PROFILING_ENABLED = False    # Time every statement per request (Admin > SQL Profile); no overhead when False
+SLOW_QUERY_THRESHOLD_MS = 100    # Statements slower than this go to the slow-query log
+SQL_PROFILE_BUFFER_SIZE = 500    # Requests and slow statements kept in memory per worker
+SQL_REPEAT_THRESHOLD = 5         # Same statement this many times in one request is flagged as an N+1 suspect
+SLOW_QUERY_LOG_FILE = 'slow_queries.log'
+
+# Template Compilation Configuration
+
+JINJA_BYTECODE_CACHE_ENABLED = True   # Compiled templates are cached in instance/jinja_cache and shared by all workers
+TEMPLATE_WARMUP_ON_START = False      # Compile every template when a worker starts instead of on each page's first hit
+
+# Static Asset Configuration
+
+STATIC_DIST_MAX_AGE = 31536000   # Fingerprinted bundles in static/dist/ (built by build_assets.py) never change, so browsers keep them a year
+
+# File Download Caching Configuration
+
+DOWNLOAD_CACHE_MAX_AGE = 0         # Seconds a browser may reuse a downloaded workbook without asking; 0 = revalidate every time (a 304 when unchanged)
+DOWNLOAD_CACHE_PRIVATE = True      # Downloads sit behind a login - only the user's own browser may cache them, never a shared proxy
+
+# File Download Offload Configuration
+
+DOWNLOAD_OFFLOAD_MODE = None                      # None (worker streams the file), 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache/lighttpd); env DOWNLOAD_OFFLOAD overrides
+DOWNLOAD_OFFLOAD_LOCATION = '/_protected/uploads/'  # nginx 'internal' location that aliases the uploads folder (x-accel-redirect only)
+
+# Response Compression Configuration
+
+COMPRESSION_ENABLED = True        # gzip/brotli for HTML, JSON, CSS and JS responses when the browser accepts it
+COMPRESSION_MIN_SIZE = 1024       # Bytes; smaller responses are sent as-is (the headers would cost more than the saving)
+COMPRESSION_GZIP_LEVEL = 6        # 1 (fastest) - 9 (smallest)
+COMPRESSION_BROTLI_QUALITY = 4    # 0 (fastest) - 11 (smallest); brotli is used only when the package is installed
+COMPRESSIBLE_MIMETYPES = ('text/html', 'text/plain', 'text/css', 'text/csv', 'application/json', 'application/javascript', 'text/javascript')
+
+# Streamed Page Configuration
+
+STREAM_BATCH_SIZE = 200       # Rows fetched per round trip from the server-side cursor while a history/report page renders
+STREAM_CHUNK_SIZE = 16384     # Bytes of HTML collected before each write to the browser
+
+# Dashboard Panel Configuration
+
+DASHBOARD_INSIGHTS_CACHE_SECONDS = 600   # Data analytics panel; rebuilt sooner whenever the set of approved uploads or one of their files changes
+DASHBOARD_PENDING_CACHE_SECONDS = 60     # Pending-approval widgets; rebuilt sooner whenever the pending count or the newest pending items change
+DASHBOARD_BANNER_CACHE_SECONDS = 300     # Upload-window banner; the window only moves at day boundaries
+WORKBOOK_ANALYSIS_CACHE_SIZE = 2048      # Per-worker memo of workbook analyses, keyed by content hash
+
+# Bulk Review Configuration
+
+BULK_REVIEW_MAX_UPLOADS = 200    # Uploads one bulk approve/reject request may change
+EMAIL_QUEUE_WORKERS = 2          # Background SMTP sends per worker process (bulk review digests)
+EMAIL_BATCH_SIZE = 50            # Emails sent per SMTP login by batched sends (upload window reminders)
+
+# Bundle Download Configuration
+
+ZIP_STREAM_CHUNK_SIZE = 1024 * 1024    # Bytes read from each stored file per write while a ZIP bundle streams
+ZIP_STORED_EXTENSIONS = ('.xlsx', '.xlsm', '.pdf', '.zip', '.png', '.jpg', '.jpeg')    # Already compressed; added without deflating again
+
+# Upload Search Configuration
+
+SEARCH_RESULT_LIMIT = 500        # Best matches a report search can return
+SEARCH_SUGGEST_LIMIT = 10        # Suggestions shown while typing in a search box
+SEARCH_MAX_TERMS = 8             # Words of a query that are used; the rest are ignored
+SEARCH_TEXT_MAX_CHARS = 20000    # Workbook text kept in the index per upload (distinct text cells, in sheet order)
+
+# Year Heatmap Configuration
+
+YEAR_HEATMAP_CACHE_SECONDS = 3600    # Per-FY department x month matrix; rebuilt sooner whenever an upload in the FY is recounted
+
+# Turnaround SLA Configuration
+
+SLA_PERCENTILES = (50, 90, 95)    # Percentiles reported for each review stage
+SLA_CACHE_SECONDS = 900           # Per-FY turnaround report; rebuilt sooner whenever an upload or consolidated report in the FY is recounted
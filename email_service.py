@@ -1,10 +1,11 @@
 import os
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from datetime import datetime, timezone, timedelta
 import logging
-from config import UPLOAD_WINDOW_START_DAY, UPLOAD_WINDOW_END_DAY
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import UPLOAD_WINDOW_START_DAY, UPLOAD_WINDOW_END_DAY, EMAIL_QUEUE_WORKERS, EMAIL_BATCH_SIZE
+from metrics import EMAIL_SEND_SECONDS, EMAIL_FAILURES
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -13,26 +14,47 @@ logger = logging.getLogger(__name__)
 IST = timezone(timedelta(hours=5, minutes=30))
 
 class EmailService:
+    # Read from email_config.py or the environment on first use, so importing the module does no I/O
+    SETTINGS = ('smtp_host', 'smtp_port', 'smtp_username', 'smtp_password', 'from_email', 'from_name')
+
     def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        # Only reached while a setting has not been loaded yet
+        if name not in self.SETTINGS:
+            raise AttributeError(name)
+        self._load_settings()
+        return self.__dict__[name]
+
+    def _load_settings(self):
         # Try to import from email_config.py first, fallback to environment variables
         try:
             from email_config import SMTP_CONFIG
-            self.smtp_host = SMTP_CONFIG.get('SMTP_HOST', '')
-            self.smtp_port = int(SMTP_CONFIG.get('SMTP_PORT', 587))
-            self.smtp_username = SMTP_CONFIG.get('SMTP_USERNAME', '')
-            self.smtp_password = SMTP_CONFIG.get('SMTP_PASSWORD', '')
-            self.from_email = SMTP_CONFIG.get('SMTP_FROM_EMAIL', self.smtp_username)
-            self.from_name = SMTP_CONFIG.get('SMTP_FROM_NAME', 'MIS System')
+            settings = {
+                'smtp_host': SMTP_CONFIG.get('SMTP_HOST', ''),
+                'smtp_port': int(SMTP_CONFIG.get('SMTP_PORT', 587)),
+                'smtp_username': SMTP_CONFIG.get('SMTP_USERNAME', ''),
+                'smtp_password': SMTP_CONFIG.get('SMTP_PASSWORD', ''),
+                'from_email': SMTP_CONFIG.get('SMTP_FROM_EMAIL', SMTP_CONFIG.get('SMTP_USERNAME', '')),
+                'from_name': SMTP_CONFIG.get('SMTP_FROM_NAME', 'MIS System'),
+            }
             logger.info("Email configuration loaded from email_config.py")
         except (ImportError, Exception) as e:
             # Fallback to environment variables if email_config.py doesn't exist or has errors
             logger.warning(f"Could not load email_config.py ({str(e)}), using environment variables")
-            self.smtp_host = os.environ.get('SMTP_HOST', '')
-            self.smtp_port = int(os.environ.get('SMTP_PORT', '587'))
-            self.smtp_username = os.environ.get('SMTP_USERNAME', '')
-            self.smtp_password = os.environ.get('SMTP_PASSWORD', '')
-            self.from_email = os.environ.get('SMTP_FROM_EMAIL', self.smtp_username)
-            self.from_name = os.environ.get('SMTP_FROM_NAME', 'MIS System')
+            settings = {
+                'smtp_host': os.environ.get('SMTP_HOST', ''),
+                'smtp_port': int(os.environ.get('SMTP_PORT', '587')),
+                'smtp_username': os.environ.get('SMTP_USERNAME', ''),
+                'smtp_password': os.environ.get('SMTP_PASSWORD', ''),
+                'from_email': os.environ.get('SMTP_FROM_EMAIL', os.environ.get('SMTP_USERNAME', '')),
+                'from_name': os.environ.get('SMTP_FROM_NAME', 'MIS System'),
+            }
+        # Settings assigned directly before the first use are kept
+        for name, value in settings.items():
+            self.__dict__.setdefault(name, value)
 
     def is_configured(self):
         """Check if email service is properly configured"""
@@ -59,51 +81,143 @@ class EmailService:
         """
         if not self.is_configured():
             logger.warning("Email service not configured. Skipping email send.")
+            EMAIL_FAILURES.labels(reason='not_configured').inc()
             return False, "Email service not configured. Please set SMTP environment variables."
 
+        started = time.perf_counter()
         try:
-            # Create message
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = subject
-            msg['From'] = f"{self.from_name} <{self.from_email}>"
-
-            # Handle multiple recipients
-            if isinstance(to_email, list):
-                msg['To'] = ', '.join(to_email)
-                recipients = to_email
-            else:
-                msg['To'] = to_email
-                recipients = [to_email]
-
-            # Add text and HTML parts
-            if text_content:
-                text_part = MIMEText(text_content, 'plain')
-                msg.attach(text_part)
-
-            html_part = MIMEText(html_content, 'html')
-            msg.attach(html_part)
-
-            # Send email
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.smtp_username, self.smtp_password)
+            msg, recipients = self._build_message(to_email, subject, html_content, text_content)
+            with self._connect() as server:
                 server.send_message(msg)
 
             logger.info(f"Email sent successfully to {recipients}")
+            self._record_send(started)
             return True, f"Email sent successfully to {len(recipients)} recipient(s)"
 
-        except smtplib.SMTPAuthenticationError:
-            error_msg = "SMTP Authentication failed. Please check your username and password."
-            logger.error(error_msg)
-            return False, error_msg
-        except smtplib.SMTPException as e:
-            error_msg = f"SMTP error occurred: {str(e)}"
-            logger.error(error_msg)
-            return False, error_msg
         except Exception as e:
-            error_msg = f"Failed to send email: {str(e)}"
-            logger.error(error_msg)
-            return False, error_msg
+            return self._send_failed(started, e)
+
+    def send_batch(self, emails):
+        """
+        Send several emails, EMAIL_BATCH_SIZE at a time over one SMTP login
+
+        Args:
+            emails: list of (to_email, subject, html_content, text_content) tuples,
+                    the same arguments as send_email()
+
+        Returns:
+            list: send_email()'s (success, message) tuple for each email, in order
+        """
+        if not self.is_configured():
+            logger.warning("Email service not configured. Skipping email send.")
+            EMAIL_FAILURES.labels(reason='not_configured').inc(len(emails))
+            return [(False, "Email service not configured. Please set SMTP environment variables.")] * len(emails)
+
+        import smtplib
+
+        results = []
+        for offset in range(0, len(emails), EMAIL_BATCH_SIZE):
+            batch = emails[offset:offset + EMAIL_BATCH_SIZE]
+            started = time.perf_counter()
+            try:
+                with self._connect() as server:
+                    for email in batch:
+                        started = time.perf_counter()
+                        msg, recipients = self._build_message(*email)
+                        try:
+                            server.send_message(msg)
+                        except smtplib.SMTPRecipientsRefused as e:
+                            # A refused address does not end the session for the rest of the batch
+                            results.append(self._send_failed(started, e))
+                            continue
+                        self._record_send(started)
+                        results.append((True, f"Email sent successfully to {len(recipients)} recipient(s)"))
+            except Exception as e:
+                # The connection failed: everything in the batch not yet sent fails with it
+                unsent = offset + len(batch) - len(results)
+                results += [self._send_failed(started, e, count=unsent)] * unsent
+        logger.info(f"Batch email: {sum(1 for success, _ in results if success)}/{len(emails)} sent")
+        return results
+
+    def _build_message(self, to_email, subject, html_content, text_content=None):
+        """MIME message for send_email()'s arguments, and its list of recipients"""
+        from email.mime.text import MIMEText
+        from email.mime.multipart import MIMEMultipart
+
+        # Create message
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = subject
+        msg['From'] = f"{self.from_name} <{self.from_email}>"
+
+        # Handle multiple recipients
+        if isinstance(to_email, list):
+            msg['To'] = ', '.join(to_email)
+            recipients = to_email
+        else:
+            msg['To'] = to_email
+            recipients = [to_email]
+
+        # Add text and HTML parts
+        if text_content:
+            text_part = MIMEText(text_content, 'plain')
+            msg.attach(text_part)
+
+        html_part = MIMEText(html_content, 'html')
+        msg.attach(html_part)
+        return msg, recipients
+
+    def _connect(self):
+        """Logged-in SMTP connection; use it as a context manager so it is closed"""
+        # Imported on first send so workers that never send mail don't load it
+        import smtplib
+
+        server = smtplib.SMTP(self.smtp_host, self.smtp_port)
+        try:
+            server.starttls()
+            server.login(self.smtp_username, self.smtp_password)
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    def _send_failed(self, started, error, count=1):
+        """Log and record count failed sends; returns send_email()'s failure tuple"""
+        import smtplib
+
+        if isinstance(error, smtplib.SMTPAuthenticationError):
+            error_msg = "SMTP Authentication failed. Please check your username and password."
+            reason = 'auth'
+        elif isinstance(error, smtplib.SMTPException):
+            error_msg = f"SMTP error occurred: {str(error)}"
+            reason = 'smtp'
+        else:
+            error_msg = f"Failed to send email: {str(error)}"
+            reason = 'other'
+        logger.error(error_msg)
+        self._record_send(started, failure_reason=reason, count=count)
+        return False, error_msg
+
+    def queue_email(self, to_email, subject, html_content, text_content=None):
+        """
+        Send an email on a background thread so the request does not wait on SMTP
+
+        Takes the same arguments as send_email(). The message is built from the
+        strings passed in, so callers must not hand over ORM objects.
+
+        Returns:
+            Future resolving to send_email()'s (success, message) tuple
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=EMAIL_QUEUE_WORKERS,
+                                                    thread_name_prefix='mis-email')
+        return self._executor.submit(self.send_email, to_email, subject, html_content, text_content)
+
+    def _record_send(self, started, failure_reason=None, count=1):
+        """Record send latency, and the failure reason for each of count sends if they failed"""
+        EMAIL_SEND_SECONDS.labels(result='failure' if failure_reason else 'success').observe(time.perf_counter() - started)
+        if failure_reason:
+            EMAIL_FAILURES.labels(reason=failure_reason).inc(count)
 
     def send_upload_window_notification(self, hod_users, app_url=None):
         """
@@ -119,9 +233,19 @@ class EmailService:
         if not self.is_configured():
             return 0, 0, ["Email service not configured"]
 
-        success_count = 0
-        messages = []
+        results = self.send_batch([self.upload_window_email(user, app_url) for user in hod_users])
+        messages = [f"{user.Username} ({user.Email}): {message}" for user, (success, message) in zip(hod_users, results)]
+        success_count = sum(1 for success, _ in results if success)
+
+        return success_count, len(hod_users), messages
+
+    def upload_window_email(self, user, app_url=None):
+        """
+        MIS upload window notification for one HOD user
 
+        Returns:
+            tuple: (to_email, subject, html_content, text_content) for send_email() or send_batch()
+        """
         if not app_url:
             app_url = "your MIS system"
 
@@ -129,8 +253,7 @@ class EmailService:
 
         subject = f"MIS Upload Window Now Open - {current_month}"
 
-        for user in hod_users:
-            html_content = f"""
+        html_content = f"""
             <!DOCTYPE html>
             <html>
             <head>
@@ -190,9 +313,9 @@ class EmailService:
                 </div>
             </body>
             </html>
-            """
+        """
 
-            text_content = f"""
+        text_content = f"""
 MIS Upload Window Now Open - {current_month}
 
 Dear {user.Username},
@@ -224,15 +347,9 @@ MIS System Team
 ---
 This is an automated notification from the MIS Upload System.
 Please do not reply to this email.
-            """
-
-            success, message = self.send_email(user.Email, subject, html_content, text_content)
-            messages.append(f"{user.Username} ({user.Email}): {message}")
-
-            if success:
-                success_count += 1
+        """
 
-        return success_count, len(hod_users), messages
+        return user.Email, subject, html_content, text_content
 
 
 # Global email service instance
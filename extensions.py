@@ -0,0 +1,40 @@
+"""
+Objects shared by the app factory, the models and the blueprints.
+
+They are created here without an app so that models.py, services.py and
+the route modules can import them; create_app() binds db to the app and
+installs the SQL profiler. The rest only need paths, which are fixed per
+checkout: the instance folder next to this file (where Flask puts it) and
+the upload folder under the working directory.
+"""
+
+import os
+
+from flask_sqlalchemy import SQLAlchemy
+
+from config import SLOW_QUERY_THRESHOLD_MS, SQL_PROFILE_BUFFER_SIZE, SQL_REPEAT_THRESHOLD, SLOW_QUERY_LOG_FILE
+from panel_cache import PanelCache
+from reference_cache import ReferenceCache
+from sql_profiler import SQLProfiler
+from upload_storage import ContentStore
+from validation_pipeline import ValidationPipeline
+
+INSTANCE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
+UPLOAD_FOLDER = 'uploads'
+
+db = SQLAlchemy()
+content_store = ContentStore(UPLOAD_FOLDER)
+# Shared stamp file - any worker that changes reference data bumps it so all workers reload
+reference_cache = ReferenceCache(os.path.join(INSTANCE_PATH, 'reference_data.stamp'))
+# Parse and backlog slots are lock files shared by every worker on this node
+validation_pipeline = ValidationPipeline(os.path.join(INSTANCE_PATH, 'validation_slots'))
+# Dashboard panels fetched by the page after it loads, each cached on its own
+dashboard_panels = PanelCache()
+# Department x month matrix of each financial year for the year view
+year_heatmaps = PanelCache()
+# Turnaround percentiles of each financial year
+sla_reports = PanelCache()
+
+# SQL profiling - hooks are only installed when enabled, so a disabled profiler costs nothing
+sql_profiler = SQLProfiler(slow_query_ms=SLOW_QUERY_THRESHOLD_MS, buffer_size=SQL_PROFILE_BUFFER_SIZE,
+                           repeat_threshold=SQL_REPEAT_THRESHOLD, log_file=SLOW_QUERY_LOG_FILE)
@@ -0,0 +1,93 @@
+"""
+Runtime metrics in Prometheus text exposition format, served at /metrics.
+
+Under gunicorn every worker has its own copy of these metrics. Set
+PROMETHEUS_MULTIPROC_DIR to an empty directory shared by all workers (wipe it
+on each server start) and each worker writes its samples there; /metrics then
+aggregates the whole directory, so a scrape sees every worker no matter which
+one answers it. Add this to the gunicorn config so live gauges drop workers
+that exit:
+
+    def child_exit(server, worker):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+
+Without the variable the metrics are per process, which is right for the
+single-process development server.
+
+/metrics answers only clients in METRICS_ALLOWED_IPS (connecting directly) or
+ones sending METRICS_TOKEN as a bearer token. Requests forwarded by a reverse
+proxy always need the token, since they all arrive from the proxy's address;
+a proxy that does not set X-Forwarded-For should deny /metrics itself.
+"""
+
+import functools
+import os
+import time
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge,
+                               Histogram, generate_latest, multiprocess)
+
+# Workbook parses and PDF renders take seconds, not milliseconds
+SLOW_OPERATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+REQUEST_LATENCY = Histogram(
+    'mis_http_request_duration_seconds', 'Request latency by endpoint',
+    ['endpoint', 'method'])
+REQUESTS = Counter(
+    'mis_http_requests_total', 'Requests by endpoint and response status',
+    ['endpoint', 'method', 'status'])
+REQUESTS_IN_FLIGHT = Gauge(
+    'mis_http_requests_in_flight', 'Requests currently being handled',
+    multiprocess_mode='livesum')
+
+WORKBOOK_PARSE_SECONDS = Histogram(
+    'mis_workbook_parse_seconds', 'openpyxl parse time per uploaded workbook',
+    ['result'], buckets=SLOW_OPERATION_BUCKETS)
+PDF_RENDER_SECONDS = Histogram(
+    'mis_pdf_render_seconds', 'PDF report generation time',
+    ['report'], buckets=SLOW_OPERATION_BUCKETS)
+EXPORT_ROWS = Counter(
+    'mis_export_rows_total', 'Data rows written to Excel exports',
+    ['export'])
+
+EMAIL_SEND_SECONDS = Histogram(
+    'mis_email_send_seconds', 'SMTP send latency per EmailService.send_email call',
+    ['result'], buckets=SLOW_OPERATION_BUCKETS)
+EMAIL_FAILURES = Counter(
+    'mis_email_failures_total', 'Failed EmailService.send_email calls',
+    ['reason'])
+
+SCHEDULER_JOB_SECONDS = Histogram(
+    'mis_scheduler_job_seconds', 'Scheduled job run time',
+    ['job', 'result'], buckets=SLOW_OPERATION_BUCKETS)
+
+
+def timed_job(job_name, job):
+    """Wrap a scheduler job so each run's duration and outcome are recorded"""
+    @functools.wraps(job)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        result = 'error'
+        try:
+            value = job(*args, **kwargs)
+            result = 'success'
+            return value
+        finally:
+            SCHEDULER_JOB_SECONDS.labels(job=job_name, result=result).observe(time.perf_counter() - started)
+    return wrapper
+
+
+def render_latest():
+    """
+    Current metrics in text exposition format
+
+    Returns:
+        tuple: (body: bytes, content_type: str)
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
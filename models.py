@@ -0,0 +1,374 @@
+"""
+Database models and the status rollups kept alongside them.
+
+MISStatusRollup and ConsolidatedStatusRollup hold per-period status counts
+for the dashboards and tracking pages. Session hooks here keep them in step
+with mis_uploads and consolidated_mis in the same transaction, and bump a
+per-FY version after commit so cached views built from them refresh.
+"""
+
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+import logging
+import pytz
+from extensions import db
+
+# Set IST timezone
+IST = pytz.timezone('Asia/Kolkata')
+
+class Role(db.Model):
+    __tablename__ = 'roles'
+    RoleID = db.Column(db.Integer, primary_key=True)
+    RoleName = db.Column(db.String(50), unique=True, nullable=False)
+    users = db.relationship('User', backref='role', lazy=True)
+
+class Company(db.Model):
+    __tablename__ = 'companies'
+    CompanyID = db.Column(db.Integer, primary_key=True)
+    CompanyName = db.Column(db.String(100), unique=True, nullable=False)
+    ActiveFlag = db.Column(db.Boolean, default=True)
+
+class Department(db.Model):
+    __tablename__ = 'departments'
+    DeptID = db.Column(db.Integer, primary_key=True)
+    DeptName = db.Column(db.String(100), unique=True, nullable=False)
+    ActiveFlag = db.Column(db.Boolean, default=True)
+    users = db.relationship('User', backref='department', lazy=True)
+    uploads = db.relationship('MISUpload', backref='department', lazy=True)
+    templates = db.relationship('Template', backref='department', lazy=True)
+
+class FinancialYear(db.Model):
+    __tablename__ = 'financial_years'
+    FYID = db.Column(db.Integer, primary_key=True)
+    FYName = db.Column(db.String(50), unique=True, nullable=False)
+    StartDate = db.Column(db.Date, nullable=False)
+    EndDate = db.Column(db.Date, nullable=False)
+    ActiveFlag = db.Column(db.Boolean, default=False)
+    uploads = db.relationship('MISUpload', backref='financial_year', lazy=True)
+
+class User(db.Model):
+    __tablename__ = 'users'
+    UserID = db.Column(db.Integer, primary_key=True)
+    EmpID = db.Column(db.String(20), unique=True, nullable=False, index=True)
+    Username = db.Column(db.String(50), nullable=True)
+    PasswordHash = db.Column(db.String(255), nullable=False)
+    Email = db.Column(db.String(100), unique=True, nullable=False)
+    DepartmentID = db.Column(db.Integer, db.ForeignKey('departments.DeptID'), nullable=False)
+    RoleID = db.Column(db.Integer, db.ForeignKey('roles.RoleID'), nullable=False)
+    IsActive = db.Column(db.Boolean, default=True)
+    FailedLoginAttempts = db.Column(db.Integer, default=0)
+    LastFailedLogin = db.Column(db.DateTime, nullable=True)
+    AccountLockedUntil = db.Column(db.DateTime, nullable=True)
+    PasswordLastChanged = db.Column(db.DateTime, default=lambda: datetime.now(IST))
+    PasswordExpiryDate = db.Column(db.DateTime, default=lambda: datetime.now(IST) + timedelta(days=90))
+    CreatedAt = db.Column(db.DateTime, default=lambda: datetime.now(IST))
+    UpdatedAt = db.Column(db.DateTime, default=lambda: datetime.now(IST), onupdate=lambda: datetime.now(IST))
+    uploads = db.relationship('MISUpload', foreign_keys='MISUpload.UploadedBy', backref='uploader', lazy=True)
+
+class MISUpload(db.Model):
+    __tablename__ = 'mis_uploads'
+    UploadID = db.Column(db.Integer, primary_key=True)
+    UploadCode = db.Column(db.String(50), unique=True, nullable=True)
+    DepartmentID = db.Column(db.Integer, db.ForeignKey('departments.DeptID'), nullable=False)
+    MonthID = db.Column(db.Integer, nullable=False)
+    FYID = db.Column(db.Integer, db.ForeignKey('financial_years.FYID'), nullable=False)
+    UploadedBy = db.Column(db.Integer, db.ForeignKey('users.UserID'), nullable=False)
+    UploadDate = db.Column(db.DateTime, default=lambda: datetime.now(IST))
+    FilePath = db.Column(db.String(255), nullable=False)
+    FileName = db.Column(db.String(255), nullable=True)
+    ContentHash = db.Column(db.String(64), nullable=True, index=True)
+    OriginalFilePath = db.Column(db.String(255), nullable=True)
+    FileCheck = db.Column(db.String(50), default='Not Validated')
+    ValidationMessage = db.Column(db.String(500), nullable=True)
+    DataRowCount = db.Column(db.Integer, nullable=True)
+    # When the upload was last handed to the validation pipeline; stale 'Validating' rows are re-queued
+    ValidationQueuedDate = db.Column(db.DateTime, nullable=True)
+    Status = db.Column(db.String(50), default='In Review')
+    IsModified = db.Column(db.Boolean, default=False)
+    IsCancelled = db.Column(db.Boolean, default=False)
+    SupervisorApproved = db.Column(db.Boolean, default=False)
+    SupervisorApprovedBy = db.Column(db.Integer, db.ForeignKey('users.UserID'), nullable=True)
+    SupervisorApprovedDate = db.Column(db.DateTime, nullable=True)
+    # FY-scoped date range scans (turnaround analytics)
+    __table_args__ = (db.Index('ix_mis_uploads_fy_upload_date', 'FYID', 'UploadDate'),)
+
+class MISCodeSequence(db.Model):
+    __tablename__ = 'mis_code_sequences'
+    DepartmentID = db.Column(db.Integer, db.ForeignKey('departments.DeptID'), primary_key=True)
+    LastValue = db.Column(db.Integer, nullable=False, default=0)
+
+class ChunkedUpload(db.Model):
+    __tablename__ = 'chunked_uploads'
+    Token = db.Column(db.String(64), primary_key=True)
+    UserID = db.Column(db.Integer, db.ForeignKey('users.UserID'), nullable=False)
+    DepartmentID = db.Column(db.Integer, db.ForeignKey('departments.DeptID'), nullable=False)
+    MonthID = db.Column(db.Integer, nullable=False)
+    FYID = db.Column(db.Integer, db.ForeignKey('financial_years.FYID'), nullable=False)
+    FileName = db.Column(db.String(255), nullable=False)
+    TotalSize = db.Column(db.BigInteger, nullable=False)
+    ReceivedSize = db.Column(db.BigInteger, nullable=False, default=0)
+    # SHA-256 of the whole file if the client declared it at init; checked at finalize
+    ContentHash = db.Column(db.String(64))
+    CreatedDate = db.Column(db.DateTime, default=lambda: datetime.now(IST))
+
+class Template(db.Model):
+    __tablename__ = 'templates'
+    TemplateID = db.Column(db.Integer, primary_key=True)
+    DepartmentID = db.Column(db.Integer, db.ForeignKey('departments.DeptID'), nullable=False)
+    FilePath = db.Column(db.String(255), nullable=False)
+    FileName = db.Column(db.String(255), nullable=True)
+    ContentHash = db.Column(db.String(64), nullable=True, index=True)
+    UploadDate = db.Column(db.DateTime, default=lambda: datetime.now(IST))
+
+class ConsolidatedMIS(db.Model):
+    __tablename__ = 'consolidated_mis'
+    ConsolidatedMISID = db.Column(db.Integer, primary_key=True)
+    SupervisorID = db.Column(db.Integer, db.ForeignKey('users.UserID'), nullable=False)
+    FYID = db.Column(db.Integer, db.ForeignKey('financial_years.FYID'), nullable=False)
+    MonthID = db.Column(db.Integer, nullable=False)
+    UploadedHODMISIDs = db.Column(db.String(500), nullable=True)
+    ConsolidatedFilePath = db.Column(db.String(255), nullable=False)
+    FileName = db.Column(db.String(255), nullable=True)
+    ContentHash = db.Column(db.String(64), nullable=True, index=True)
+    OriginalFilePath = db.Column(db.String(255), nullable=True)
+    Status = db.Column(db.String(50), default='Pending Review')
+    CreatedDate = db.Column(db.DateTime, default=lambda: datetime.now(IST))
+    ApprovedDate = db.Column(db.DateTime, nullable=True)
+    ApprovedBy = db.Column(db.Integer, db.ForeignKey('users.UserID'), nullable=True)
+    supervisor = db.relationship('User', foreign_keys=[SupervisorID], backref='consolidated_uploads')
+    financial_year = db.relationship('FinancialYear', backref='consolidated_mis')
+    __table_args__ = (db.Index('ix_consolidated_mis_fy_created_date', 'FYID', 'CreatedDate'),)
+
+class Notification(db.Model):
+    __tablename__ = 'notifications'
+    NotificationID = db.Column(db.Integer, primary_key=True)
+    UserID = db.Column(db.Integer, db.ForeignKey('users.UserID'), nullable=False)
+    Title = db.Column(db.String(200), nullable=False)
+    Message = db.Column(db.Text, nullable=False)
+    NotificationType = db.Column(db.String(50), nullable=False)
+    RelatedUploadID = db.Column(db.Integer, db.ForeignKey('mis_uploads.UploadID'), nullable=True)
+    RelatedConsolidatedID = db.Column(db.Integer, db.ForeignKey('consolidated_mis.ConsolidatedMISID'), nullable=True)
+    IsRead = db.Column(db.Boolean, default=False)
+    CreatedDate = db.Column(db.DateTime, default=lambda: datetime.now(IST))
+    user = db.relationship('User', backref='notifications')
+
+# Upload window emails already sent to each HOD for a period; a rerun of the same job skips them
+class UploadReminder(db.Model):
+    __tablename__ = 'upload_reminders'
+    FYID = db.Column(db.Integer, primary_key=True)
+    MonthID = db.Column(db.Integer, primary_key=True)
+    Kind = db.Column(db.String(20), primary_key=True)
+    UserID = db.Column(db.Integer, db.ForeignKey('users.UserID'), primary_key=True)
+    DepartmentID = db.Column(db.Integer, nullable=False)
+    SentDate = db.Column(db.DateTime, default=lambda: datetime.now(IST))
+
+# Status counts per period, kept in step with mis_uploads and consolidated_mis
+# by update_status_rollups() below; cancelled uploads are counted under 'Cancelled'
+class MISStatusRollup(db.Model):
+    __tablename__ = 'mis_status_rollup'
+    FYID = db.Column(db.Integer, primary_key=True)
+    MonthID = db.Column(db.Integer, primary_key=True)
+    DepartmentID = db.Column(db.Integer, primary_key=True)
+    Status = db.Column(db.String(50), primary_key=True)
+    SupervisorApproved = db.Column(db.Boolean, primary_key=True)
+    UploadCount = db.Column(db.Integer, nullable=False, default=0)
+    LatestUploadDate = db.Column(db.DateTime, nullable=True)
+
+class ConsolidatedStatusRollup(db.Model):
+    __tablename__ = 'consolidated_status_rollup'
+    FYID = db.Column(db.Integer, primary_key=True)
+    MonthID = db.Column(db.Integer, primary_key=True)
+    Status = db.Column(db.String(50), primary_key=True)
+    ReportCount = db.Column(db.Integer, nullable=False, default=0)
+
+# Bumped after each commit that recounted rollup rows of the FY, so per-FY caches can tell they are stale
+class StatusRollupVersion(db.Model):
+    __tablename__ = 'status_rollup_versions'
+    FYID = db.Column(db.Integer, primary_key=True)
+    Version = db.Column(db.Integer, nullable=False, default=0)
+
+UPLOAD_ROLLUP_GROUP = ('FYID', 'MonthID', 'DepartmentID')
+UPLOAD_ROLLUP_FIELDS = UPLOAD_ROLLUP_GROUP + ('Status', 'IsCancelled', 'SupervisorApproved', 'UploadDate')
+CONSOLIDATED_ROLLUP_GROUP = ('FYID', 'MonthID')
+CONSOLIDATED_ROLLUP_FIELDS = CONSOLIDATED_ROLLUP_GROUP + ('Status',)
+UPLOAD_ROLLUP_COLUMNS = ['FYID', 'MonthID', 'DepartmentID', 'Status', 'SupervisorApproved', 'UploadCount', 'LatestUploadDate']
+CONSOLIDATED_ROLLUP_COLUMNS = ['FYID', 'MonthID', 'Status', 'ReportCount']
+
+def upload_rollup_query():
+    """mis_uploads grouped into MISStatusRollup rows"""
+    status = db.case((MISUpload.IsCancelled.is_(True), 'Cancelled'), else_=db.func.coalesce(MISUpload.Status, 'In Review'))
+    approved = db.func.coalesce(MISUpload.SupervisorApproved, False)
+    return (db.select(MISUpload.FYID, MISUpload.MonthID, MISUpload.DepartmentID, status, approved,
+                      db.func.count(), db.func.max(MISUpload.UploadDate))
+            .group_by(MISUpload.FYID, MISUpload.MonthID, MISUpload.DepartmentID, status, approved))
+
+def consolidated_rollup_query():
+    """consolidated_mis grouped into ConsolidatedStatusRollup rows"""
+    status = db.func.coalesce(ConsolidatedMIS.Status, 'Pending Review')
+    return (db.select(ConsolidatedMIS.FYID, ConsolidatedMIS.MonthID, status, db.func.count())
+            .group_by(ConsolidatedMIS.FYID, ConsolidatedMIS.MonthID, status))
+
+
+def refresh_status_rollups(session, upload_groups=(), consolidated_groups=()):
+    """
+    Recount the rollup rows of these groups from the base tables, in the session's transaction
+
+    The FYs' rollup versions are bumped once the session commits (see
+    bump_committed_rollup_versions), so no transaction holds a lock on an
+    FY-wide row while it is open.
+
+    Args:
+        upload_groups: (FYID, MonthID, DepartmentID) tuples whose uploads changed
+        consolidated_groups: (FYID, MonthID) tuples whose consolidated reports changed
+    """
+    connection = session.connection()
+    by_period = {}
+    for fy_id, month_id, department_id in upload_groups:
+        by_period.setdefault((fy_id, month_id), set()).add(department_id)
+    for (fy_id, month_id), department_ids in sorted(by_period.items()):
+        in_group = (MISUpload.FYID == fy_id, MISUpload.MonthID == month_id, MISUpload.DepartmentID.in_(department_ids))
+        # Lock the group's uploads so two transactions recount the same group one after the other
+        connection.execute(db.select(MISUpload.UploadID).where(*in_group).with_for_update())
+        connection.execute(db.delete(MISStatusRollup).where(
+            MISStatusRollup.FYID == fy_id, MISStatusRollup.MonthID == month_id, MISStatusRollup.DepartmentID.in_(department_ids)))
+        connection.execute(db.insert(MISStatusRollup).from_select(UPLOAD_ROLLUP_COLUMNS, upload_rollup_query().where(*in_group)))
+
+    for fy_id, month_id in sorted(set(consolidated_groups)):
+        in_group = (ConsolidatedMIS.FYID == fy_id, ConsolidatedMIS.MonthID == month_id)
+        connection.execute(db.select(ConsolidatedMIS.ConsolidatedMISID).where(*in_group).with_for_update())
+        connection.execute(db.delete(ConsolidatedStatusRollup).where(
+            ConsolidatedStatusRollup.FYID == fy_id, ConsolidatedStatusRollup.MonthID == month_id))
+        connection.execute(db.insert(ConsolidatedStatusRollup).from_select(CONSOLIDATED_ROLLUP_COLUMNS, consolidated_rollup_query().where(*in_group)))
+    
+    session.info.setdefault('rollup_versions_pending', set()).update(
+        {group[0] for group in upload_groups} | {group[0] for group in consolidated_groups})
+
+@event.listens_for(Session, 'after_commit')
+def bump_committed_rollup_versions(session):
+    fy_ids = session.info.pop('rollup_versions_pending', None)
+    if not fy_ids:
+        return
+    # A short transaction of its own; until it lands, per-FY caches serve the previous version
+    try:
+        with db.engine.begin() as connection:
+            bump_status_rollup_versions(connection, fy_ids)
+    except Exception as e:
+        logging.warning(f"Could not bump status rollup versions for FYs {sorted(fy_ids)}: {str(e)}")
+
+@event.listens_for(Session, 'after_rollback')
+def discard_rollup_versions(session):
+    session.info.pop('rollup_versions_pending', None)
+
+def bump_status_rollup_versions(connection, fy_ids):
+    for fy_id in sorted(fy_ids):
+        bumped = connection.execute(db.update(StatusRollupVersion).where(StatusRollupVersion.FYID == fy_id)
+                                    .values(Version=StatusRollupVersion.Version + 1)).rowcount
+        if not bumped:
+            connection.execute(db.insert(StatusRollupVersion).values(FYID=fy_id, Version=1))
+
+def status_rollup_version(fy_id):
+    """Current rollup version of an FY (0 if nothing in it has been counted yet)"""
+    return db.session.execute(db.select(StatusRollupVersion.Version).where(StatusRollupVersion.FYID == fy_id)).scalar() or 0
+
+def rebuild_status_rollups(connection):
+    """
+    Recount both rollup tables from scratch (drift repair)
+
+    Returns:
+        tuple: (upload rollup rows, consolidated rollup rows) written
+    """
+    connection.execute(db.delete(MISStatusRollup))
+    connection.execute(db.delete(ConsolidatedStatusRollup))
+    uploads = connection.execute(db.insert(MISStatusRollup).from_select(UPLOAD_ROLLUP_COLUMNS, upload_rollup_query())).rowcount
+    consolidated = connection.execute(db.insert(ConsolidatedStatusRollup).from_select(CONSOLIDATED_ROLLUP_COLUMNS, consolidated_rollup_query())).rowcount
+    counted = set(connection.execute(db.union(db.select(MISStatusRollup.FYID), db.select(ConsolidatedStatusRollup.FYID))).scalars())
+    versioned = set(connection.execute(db.select(StatusRollupVersion.FYID)).scalars())
+    bump_status_rollup_versions(connection, counted | versioned)
+    return uploads, consolidated
+
+def status_rollups_drifted(connection):
+    """Whether either rollup table disagrees with a fresh count of its base table"""
+    rollup_columns = [getattr(MISStatusRollup, name) for name in UPLOAD_ROLLUP_COLUMNS]
+    if set(connection.execute(upload_rollup_query())) != set(connection.execute(db.select(*rollup_columns))):
+        return True
+    consolidated_columns = [getattr(ConsolidatedStatusRollup, name) for name in CONSOLIDATED_ROLLUP_COLUMNS]
+    return set(connection.execute(consolidated_rollup_query())) != set(connection.execute(db.select(*consolidated_columns)))
+
+def rollup_groups(obj, fields, group, dirty=False):
+    """The rollup group obj belongs to and, if this flush moves it, the one it leaves; None if nothing counted changed"""
+    state = db.inspect(obj)
+    if dirty and not any(state.attrs[name].history.has_changes() for name in fields):
+        return None
+    current = tuple(getattr(obj, name) for name in group)
+    previous = tuple(state.attrs[name].history.deleted[0] if state.attrs[name].history.deleted else value
+                     for name, value in zip(group, current))
+    return {current, previous}
+
+@event.listens_for(Session, 'after_flush')
+def update_status_rollups(session, flush_context):
+    upload_groups, consolidated_groups = set(), set()
+    for objects, dirty in ((session.new, False), (session.dirty, True), (session.deleted, False)):
+        for obj in objects:
+            if isinstance(obj, MISUpload):
+                upload_groups.update(rollup_groups(obj, UPLOAD_ROLLUP_FIELDS, UPLOAD_ROLLUP_GROUP, dirty) or ())
+            elif isinstance(obj, ConsolidatedMIS):
+                consolidated_groups.update(rollup_groups(obj, CONSOLIDATED_ROLLUP_FIELDS, CONSOLIDATED_ROLLUP_GROUP, dirty) or ())
+    if upload_groups or consolidated_groups:
+        refresh_status_rollups(session, upload_groups, consolidated_groups)
+
+def upload_status_counts(*criteria, group_by=()):
+    """Summed upload counts from the rollup, as rows of (*group_by, Status, count)"""
+    return db.session.execute(db.select(*group_by, MISStatusRollup.Status, db.func.sum(MISStatusRollup.UploadCount))
+                              .where(*criteria).group_by(*group_by, MISStatusRollup.Status)).all()
+
+def consolidated_status_counts(*criteria, group_by=()):
+    """Summed consolidated report counts from the rollup, as rows of (*group_by, Status, count)"""
+    return db.session.execute(db.select(*group_by, ConsolidatedStatusRollup.Status, db.func.sum(ConsolidatedStatusRollup.ReportCount))
+                              .where(*criteria).group_by(*group_by, ConsolidatedStatusRollup.Status)).all()
+
+def rollup_chart_data(rows):
+    """
+    Split (FYID, MonthID, Status, count) rollup rows into what the chart pages draw
+
+    Returns:
+        tuple: (chart_data list of {MonthID, Status, Count}, {MonthID: count},
+        {FYID: {Status: count}})
+    """
+    by_month, month_counts, fy_counts = {}, {}, {}
+    for fy_id, month_id, status, count in rows:
+        by_month[(month_id, status)] = by_month.get((month_id, status), 0) + count
+        month_counts[month_id] = month_counts.get(month_id, 0) + count
+        fy_statuses = fy_counts.setdefault(fy_id, {})
+        fy_statuses[status] = fy_statuses.get(status, 0) + count
+    chart_data = [{'MonthID': month_id, 'Status': status, 'Count': count} for (month_id, status), count in sorted(by_month.items())]
+    return chart_data, month_counts, fy_counts
+
+def latest_upload_statuses(fy_id, month_id=None):
+    """
+    Most recent live upload of each department in each month of an FY, or of one month
+
+    Read from the rollup in one query, so it costs one row per department,
+    month and status, not one per upload.
+
+    Returns:
+        dict: {(DepartmentID, MonthID): (Status, SupervisorApproved, live upload count)}
+    """
+    criteria = [MISStatusRollup.FYID == fy_id, MISStatusRollup.Status != 'Cancelled']
+    if month_id is not None:
+        criteria.append(MISStatusRollup.MonthID == month_id)
+    rows = db.session.execute(
+        db.select(MISStatusRollup.DepartmentID, MISStatusRollup.MonthID, MISStatusRollup.Status,
+                  MISStatusRollup.SupervisorApproved, MISStatusRollup.UploadCount)
+        .where(*criteria).order_by(MISStatusRollup.LatestUploadDate.asc().nullsfirst()))
+    latest = {}
+    # Later rows overwrite earlier ones, so each cell ends on its latest group
+    for department_id, month, status, approved, count in rows:
+        uploads = latest[(department_id, month)][2] if (department_id, month) in latest else 0
+        latest[(department_id, month)] = (status, approved, uploads + count)
+    return latest
+
+def latest_department_statuses(fy_id, month_id):
+    """(Status, SupervisorApproved) of each department's most recent live upload for one month"""
+    return {department_id: (status, approved)
+            for (department_id, _), (status, approved, _) in latest_upload_statuses(fy_id, month_id).items()}
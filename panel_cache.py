@@ -0,0 +1,47 @@
+"""
+Per-process cache for the dashboard's asynchronously loaded panels.
+
+Each panel (data insights, pending-approval widgets, upload-window banner)
+is cached under its own key with its own lifetime, so one slow or busy panel
+never holds the others back. An entry is reused while it is younger than its
+TTL and its version matches; callers pass a cheap version (for example a
+count of the rows the panel is built from) so a change shows up straight away
+instead of when the TTL runs out.
+
+Entries live in the worker process only. Every gunicorn worker builds its own
+copy on first use, which for these panels costs no more than the page did
+before it was split up.
+"""
+
+import threading
+import time
+
+
+class PanelCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.loads = 0
+
+    def get(self, key, ttl, loader, version=None):
+        """
+        Return the cached value for key, calling loader() if it is missing, stale or outdated
+
+        Args:
+            key: Hashable cache key, e.g. ('pending', 'Supervisor')
+            ttl: Seconds an entry may be reused
+            loader: Zero-argument callable that builds a fresh value
+            version: Any comparable value; an entry built at a different version is rebuilt
+
+        Returns:
+            The cached or freshly loaded value
+        """
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version and now - entry[1] < ttl:
+            return entry[2]
+        value = loader()
+        with self._lock:
+            self._entries[key] = (version, now, value)
+            self.loads += 1
+        return value
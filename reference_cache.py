@@ -0,0 +1,69 @@
+"""
+Versioned in-process cache for rarely-changing reference data.
+
+Each process keeps its own copy of the cached value together with the
+version it was loaded at. The version lives in a small stamp file that every
+worker process can see; writers bump it with invalidate(), and each process
+notices the new stamp on its next lookup (a single stat() call) and reloads.
+This keeps all gunicorn workers in step without any cross-process messaging.
+"""
+
+import logging
+import os
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ReferenceCache:
+    def __init__(self, stamp_path):
+        self.stamp_path = stamp_path
+        self._lock = threading.Lock()
+        self._value = None
+        self._version = None
+        self.loads = 0
+
+    def _current_version(self):
+        try:
+            stat = os.stat(self.stamp_path)
+        except FileNotFoundError:
+            return None
+        # The stamp is replaced, never rewritten, so the inode changes even when mtime granularity is coarse
+        return (stat.st_ino, stat.st_mtime_ns)
+
+    def get(self, loader):
+        """
+        Return the cached value, calling loader() first if the stamp has moved
+
+        Args:
+            loader: Zero-argument callable that builds a fresh value
+
+        Returns:
+            The value returned by the most recent loader() call
+        """
+        version = self._current_version()
+        if version is None:
+            # First use on a fresh install - create the stamp so other workers share it
+            version = self.invalidate()
+        if self._value is not None and self._version == version:
+            return self._value
+        with self._lock:
+            if self._value is None or self._version != version:
+                self._value = loader()
+                self._version = version
+                self.loads += 1
+        return self._value
+
+    def invalidate(self):
+        """Bump the shared stamp so every process reloads on its next lookup"""
+        directory = os.path.dirname(self.stamp_path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.stamp-')
+        with os.fdopen(fd, 'w') as out:
+            out.write(f"{os.getpid()}\n")
+        os.replace(temp_path, self.stamp_path)
+        with self._lock:
+            self._value = None
+            self._version = None
+        return self._current_version()
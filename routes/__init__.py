@@ -0,0 +1,6 @@
+"""
+Blueprints for each area of the app; create_app() registers them all.
+
+None has a URL prefix, so every page keeps its URL. Endpoints are named
+after the blueprint, e.g. url_for('hod.my_uploads').
+"""
@@ -0,0 +1,872 @@
+"""
+Administration: companies, departments, financial years, users and
+templates, the approved MIS and tracking pages, consolidated MIS upkeep,
+test and reminder emails, and the SQL profile page.
+"""
+
+import os
+from datetime import datetime, date, timedelta
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash
+from werkzeug.utils import secure_filename
+from email_service import email_service
+from extensions import content_store, db, sql_profiler
+from models import (
+    Company, ConsolidatedMIS, Department, FinancialYear, IST, MISCodeSequence, MISUpload, Template, User,
+    latest_department_statuses
+)
+from auth import admin_required, hash_password
+from services import (
+    filename_for_extension, get_active_fy, get_companies, get_departments, get_financial_year,
+    get_financial_years, get_role, get_roles, invalidate_reference_data, remove_stored_file,
+    stage_validated_workbook
+)
+
+bp = Blueprint('admin', __name__)
+
+@bp.route('/approved-mis')
+@admin_required
+def approved_mis():
+    user = User.query.get(session['user_id'])
+    if not user or not user.IsActive:
+        session.clear()
+        flash('Your session has expired. Please log in again.', 'error')
+        return redirect(url_for('main.login'))
+    
+    # Admin role - get all approved MIS uploads from all departments
+    approved_uploads = MISUpload.query.filter_by(Status='Approved').order_by(MISUpload.UploadDate.desc()).all()
+    
+    return render_template('approved_mis.html', 
+                         current_user=user,
+                         uploads=approved_uploads)
+
+@bp.route('/admin-mis-tracking')
+@admin_required
+def admin_mis_tracking():
+    user = User.query.get(session['user_id'])
+    if not user or not user.IsActive:
+        session.clear()
+        flash('Your session has expired. Please log in again.', 'error')
+        return redirect(url_for('main.login'))
+    
+    # Get filter parameters
+    current_month = date.today().month
+    active_fy = get_active_fy()
+    
+    selected_month = request.args.get('month_id', str(current_month))
+    selected_fy = request.args.get('fy_id', str(active_fy.FYID) if active_fy else '1')
+    
+    # Get all active departments
+    all_departments = get_departments(active_only=True, by_name=True)
+    
+    # Build department status list
+    department_statuses = []
+    submitted_count = 0
+    pending_review_count = 0
+    not_submitted_count = 0
+    approved_count = 0
+    rejected_count = 0
+    
+    latest_statuses = latest_department_statuses(int(selected_fy), int(selected_month))
+    hod_role = get_role('HOD')
+    for dept in all_departments:
+        # Get HOD for this department
+        hod = User.query.filter_by(DepartmentID=dept.DeptID, RoleID=hod_role.RoleID, IsActive=True).first() if hod_role else None
+        
+        # Get MIS upload for this department, month, and FY (the rollup says whether there is one)
+        upload = MISUpload.query.filter_by(
+            DepartmentID=dept.DeptID,
+            MonthID=int(selected_month),
+            FYID=int(selected_fy),
+            IsCancelled=False
+        ).order_by(MISUpload.UploadDate.desc()).first() if dept.DeptID in latest_statuses else None
+        
+        # Count statuses from the rollup
+        if dept.DeptID in latest_statuses:
+            status, supervisor_approved = latest_statuses[dept.DeptID]
+            submitted_count += 1
+            if status == 'In Review':
+                pending_review_count += 1
+            elif status == 'Approved':
+                approved_count += 1
+            elif status == 'Rejected':
+                rejected_count += 1
+        else:
+            not_submitted_count += 1
+        
+        department_statuses.append({
+            'department_name': dept.DeptName,
+            'department_id': dept.DeptID,
+            'hod_name': hod.Username if hod else None,
+            'hod_emp_id': hod.EmpID if hod else None,
+            'upload': upload
+        })
+    
+    financial_years = get_financial_years()
+    selected_fy_obj = get_financial_year(selected_fy) if selected_fy else active_fy
+    
+    return render_template('admin_mis_tracking.html',
+                         current_user=user,
+                         department_statuses=department_statuses,
+                         total_departments=len(all_departments),
+                         submitted_count=submitted_count,
+                         pending_review_count=pending_review_count,
+                         not_submitted_count=not_submitted_count,
+                         approved_count=approved_count,
+                         rejected_count=rejected_count,
+                         financial_years=financial_years,
+                         selected_month=selected_month,
+                         selected_fy=selected_fy,
+                         selected_fy_name=selected_fy_obj.FYName if selected_fy_obj else '')
+
+@bp.route('/admin-consolidated-management')
+@admin_required
+def admin_consolidated_management():
+    user = User.query.get(session['user_id'])
+    
+    # Get filter parameters
+    fy_id = request.args.get('fy_id', '')
+    month_id = request.args.get('month_id', '')
+    status = request.args.get('status', '')
+    
+    # Admin can see ALL consolidated MIS records (no restrictions)
+    query = ConsolidatedMIS.query
+    
+    # Apply filters only if specified
+    if fy_id:
+        query = query.filter_by(FYID=int(fy_id))
+    if month_id:
+        query = query.filter_by(MonthID=int(month_id))
+    if status:
+        query = query.filter_by(Status=status)
+    
+    # Get all consolidated reports (including approved ones)
+    consolidated_reports = query.order_by(ConsolidatedMIS.CreatedDate.desc()).all()
+    financial_years = get_financial_years()
+    
+    return render_template('admin_consolidated_management.html',
+                         current_user=user,
+                         consolidated_reports=consolidated_reports,
+                         financial_years=financial_years,
+                         selected_fy=fy_id,
+                         selected_month=month_id,
+                         selected_status=status)
+
+@bp.route('/view-admin-consolidated-mis/<int:consolidated_id>')
+@admin_required
+def view_admin_consolidated_mis(consolidated_id):
+    user = User.query.get(session['user_id'])
+    consolidated = ConsolidatedMIS.query.get_or_404(consolidated_id)
+    
+    hod_uploads = MISUpload.query.filter(MISUpload.UploadID.in_([int(x) for x in consolidated.UploadedHODMISIDs.split(',')])).all() if consolidated.UploadedHODMISIDs else []
+    
+    # Get approver info
+    approver = User.query.get(consolidated.ApprovedBy) if consolidated.ApprovedBy else None
+    
+    return render_template('view_consolidated_mis.html',
+                         current_user=user,
+                         consolidated=consolidated,
+                         hod_uploads=hod_uploads,
+                         approver=approver)
+
+@bp.route('/edit-consolidated-mis/<int:consolidated_id>', methods=['GET', 'POST'])
+@admin_required
+def edit_consolidated_mis(consolidated_id):
+    user = User.query.get(session['user_id'])
+    consolidated = ConsolidatedMIS.query.get_or_404(consolidated_id)
+    
+    if request.method == 'GET':
+        # Get approver info if exists
+        approver = User.query.get(consolidated.ApprovedBy) if consolidated.ApprovedBy else None
+        
+        return render_template('edit_consolidated_mis.html',
+                             current_user=user,
+                             consolidated=consolidated,
+                             approver=approver)
+    
+    # POST request - handle file and status update
+    status = request.form.get('status')
+    old_file_paths = ()
+    
+    # Update status
+    if status and status in ['Pending Review', 'Approved', 'Rejected']:
+        old_status = consolidated.Status
+        consolidated.Status = status
+        
+        # If status changed to Approved, set approval details
+        if status == 'Approved' and old_status != 'Approved':
+            consolidated.ApprovedBy = user.UserID
+            consolidated.ApprovedDate = datetime.now(IST)
+            
+            # Update all included HOD uploads to Approved
+            if consolidated.UploadedHODMISIDs:
+                hod_upload_ids = [int(x) for x in consolidated.UploadedHODMISIDs.split(',')]
+                for upload_id in hod_upload_ids:
+                    upload = MISUpload.query.get(upload_id)
+                    if upload:
+                        upload.Status = 'Approved'
+    
+    # Handle file replacement
+    if 'file' in request.files:
+        file = request.files['file']
+        
+        if file and file.filename:
+            if not (file.filename.endswith('.xls') or file.filename.endswith('.xlsx')):
+                flash('Only .xls or .xlsx files are allowed.', 'error')
+                return redirect(url_for('admin.edit_consolidated_mis', consolidated_id=consolidated_id))
+            
+            # Validate Excel file
+            staged, is_valid, validation_message = stage_validated_workbook(file)
+            
+            if not is_valid:
+                flash(f'Validation Error: {validation_message}', 'error')
+                return redirect(url_for('admin.edit_consolidated_mis', consolidated_id=consolidated_id))
+            
+            fy = consolidated.financial_year
+            old_file_paths = (consolidated.ConsolidatedFilePath, consolidated.OriginalFilePath)
+            
+            # Update consolidated record
+            consolidated.ConsolidatedFilePath = staged.commit()
+            consolidated.FileName = filename_for_extension(secure_filename(f"ConsolidatedMIS_{consolidated.MonthID:02d}_{fy.FYName}_{file.filename}"), staged.extension)
+            consolidated.ContentHash = staged.sha256
+            consolidated.OriginalFilePath = staged.original_path
+            consolidated.CreatedDate = datetime.now(IST)
+    
+    db.session.commit()
+    
+    # Delete old files once nothing references them
+    if old_file_paths:
+        try:
+            remove_stored_file(*old_file_paths)
+        except Exception as e:
+            flash(f'Warning: Error deleting old file: {str(e)}', 'warning')
+    
+    flash('✓ Consolidated MIS updated successfully!', 'success')
+    return redirect(url_for('admin.admin_consolidated_management'))
+
+@bp.route('/delete-consolidated-mis/<int:consolidated_id>', methods=['POST'])
+@admin_required
+def delete_consolidated_mis(consolidated_id):
+    consolidated = ConsolidatedMIS.query.get_or_404(consolidated_id)
+    file_paths = (consolidated.ConsolidatedFilePath, consolidated.OriginalFilePath)
+    
+    db.session.delete(consolidated)
+    db.session.commit()
+    
+    # Delete file from storage
+    try:
+        remove_stored_file(*file_paths)
+    except Exception as e:
+        flash(f'Warning: Error deleting file: {str(e)}', 'warning')
+    
+    flash('Consolidated MIS deleted successfully!', 'success')
+    return redirect(url_for('admin.admin_consolidated_management'))
+
+@bp.route('/config-master')
+@admin_required
+def config_master():
+    user = User.query.get(session['user_id'])
+    companies = get_companies()
+    departments = get_departments()
+    financial_years = get_financial_years()
+    
+    return render_template('config_master.html', 
+                                 current_user=user,
+                                 companies=companies,
+                                 departments=departments,
+                                 financial_years=financial_years)
+
+@bp.route('/department-management')
+@admin_required
+def department_management():
+    user = User.query.get(session['user_id'])
+    departments = get_departments()
+    
+    return render_template('department_management.html',
+                                 current_user=user,
+                                 departments=departments)
+
+@bp.route('/sql-profile')
+@admin_required
+def sql_profile():
+    user = User.query.get(session['user_id'])
+    
+    return render_template('sql_profile.html',
+                                 current_user=user,
+                                 profiler=sql_profiler,
+                                 worst_routes=sql_profiler.worst_routes(),
+                                 worst_statements=sql_profiler.worst_statements(),
+                                 n_plus_one=sql_profiler.n_plus_one_suspects(),
+                                 slow_queries=sql_profiler.recent_slow_queries())
+
+@bp.route('/sql-profile/reset', methods=['POST'])
+@admin_required
+def reset_sql_profile():
+    sql_profiler.reset()
+    flash('SQL profile cleared.', 'success')
+    return redirect(url_for('admin.sql_profile'))
+
+@bp.route('/add-company', methods=['POST'])
+@admin_required
+def add_company():
+    company_name = request.form.get('company_name')
+    
+    if not company_name:
+        flash('Company name is required.', 'error')
+    elif Company.query.filter_by(CompanyName=company_name).first():
+        flash('Company already exists.', 'error')
+    else:
+        company = Company(CompanyName=company_name, ActiveFlag=True)  # type: ignore
+        db.session.add(company)
+        db.session.commit()
+        invalidate_reference_data()
+        flash('Company added successfully!', 'success')
+    
+    return redirect(url_for('admin.config_master'))
+
+@bp.route('/toggle-company/<int:company_id>', methods=['POST'])
+@admin_required
+def toggle_company(company_id):
+    company = Company.query.get_or_404(company_id)
+    company.ActiveFlag = not company.ActiveFlag
+    db.session.commit()
+    invalidate_reference_data()
+    flash(f'Company {company.CompanyName} {"activated" if company.ActiveFlag else "deactivated"}.', 'success')
+    return redirect(url_for('admin.config_master'))
+
+@bp.route('/edit-company/<int:company_id>', methods=['POST'])
+@admin_required
+def edit_company(company_id):
+    company = Company.query.get_or_404(company_id)
+    new_name = request.form.get('company_name')
+    
+    if not new_name:
+        flash('Company name is required.', 'error')
+    elif new_name != company.CompanyName and Company.query.filter_by(CompanyName=new_name).first():
+        flash('Company name already exists.', 'error')
+    else:
+        company.CompanyName = new_name
+        db.session.commit()
+        invalidate_reference_data()
+        flash(f'Company updated successfully!', 'success')
+    
+    return redirect(url_for('admin.config_master'))
+
+@bp.route('/delete-company/<int:company_id>', methods=['POST'])
+@admin_required
+def delete_company(company_id):
+    company = Company.query.get_or_404(company_id)
+    
+    db.session.delete(company)
+    db.session.commit()
+    invalidate_reference_data()
+    flash(f'Company {company.CompanyName} deleted successfully!', 'success')
+    
+    return redirect(url_for('admin.config_master'))
+
+@bp.route('/add-department', methods=['POST'])
+@admin_required
+def add_department():
+    dept_name = request.form.get('dept_name')
+    
+    if not dept_name:
+        flash('Department name is required.', 'error')
+    elif Department.query.filter_by(DeptName=dept_name).first():
+        flash('Department already exists.', 'error')
+    else:
+        department = Department(DeptName=dept_name, ActiveFlag=True)  # type: ignore
+        db.session.add(department)
+        db.session.flush()
+        db.session.add(MISCodeSequence(DepartmentID=department.DeptID, LastValue=0))  # type: ignore
+        db.session.commit()
+        invalidate_reference_data()
+        flash('Department added successfully!', 'success')
+    
+    return redirect(url_for('admin.config_master'))
+
+@bp.route('/toggle-department/<int:dept_id>', methods=['POST'])
+@admin_required
+def toggle_department(dept_id):
+    dept = Department.query.get_or_404(dept_id)
+    dept.ActiveFlag = not dept.ActiveFlag
+    db.session.commit()
+    invalidate_reference_data()
+    flash(f'Department {dept.DeptName} {"activated" if dept.ActiveFlag else "deactivated"}.', 'success')
+    return redirect(url_for('admin.config_master'))
+
+@bp.route('/edit-department/<int:dept_id>', methods=['POST'])
+@admin_required
+def edit_department(dept_id):
+    dept = Department.query.get_or_404(dept_id)
+    new_name = request.form.get('dept_name')
+    
+    if not new_name:
+        flash('Department name is required.', 'error')
+    elif new_name != dept.DeptName and Department.query.filter_by(DeptName=new_name).first():
+        flash('Department name already exists.', 'error')
+    else:
+        dept.DeptName = new_name
+        db.session.commit()
+        invalidate_reference_data()
+        flash(f'Department updated successfully!', 'success')
+    
+    return redirect(url_for('admin.config_master'))
+
+@bp.route('/delete-department/<int:dept_id>', methods=['POST'])
+@admin_required
+def delete_department(dept_id):
+    dept = Department.query.get_or_404(dept_id)
+    
+    # Check if department has associated users or uploads
+    if dept.users or dept.uploads or dept.templates:
+        flash('Cannot delete department with associated users, uploads, or templates. Deactivate it instead.', 'error')
+    else:
+        MISCodeSequence.query.filter_by(DepartmentID=dept.DeptID).delete()
+        db.session.delete(dept)
+        db.session.commit()
+        invalidate_reference_data()
+        flash(f'Department {dept.DeptName} deleted successfully!', 'success')
+    
+    return redirect(url_for('admin.config_master'))
+
+@bp.route('/add-fy', methods=['POST'])
+@admin_required
+def add_fy():
+    fy_name = request.form.get('fy_name')
+    start_date_str = request.form.get('start_date')
+    end_date_str = request.form.get('end_date')
+    
+    if not fy_name or not start_date_str or not end_date_str:
+        flash('All fields are required.', 'error')
+        return redirect(url_for('admin.config_master'))
+    
+    start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+    end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+    
+    if FinancialYear.query.filter_by(FYName=fy_name).first():
+        flash('Financial Year already exists.', 'error')
+    elif start_date >= end_date:
+        flash('Start date must be before end date.', 'error')
+    else:
+        fy = FinancialYear(FYName=fy_name, StartDate=start_date, EndDate=end_date, ActiveFlag=False)  # type: ignore
+        db.session.add(fy)
+        db.session.commit()
+        invalidate_reference_data()
+        flash('Financial Year added successfully!', 'success')
+    
+    return redirect(url_for('admin.config_master'))
+
+@bp.route('/toggle-fy/<int:fy_id>', methods=['POST'])
+@admin_required
+def toggle_fy(fy_id):
+    fy = FinancialYear.query.get_or_404(fy_id)
+    
+    if not fy.ActiveFlag:
+        FinancialYear.query.update({FinancialYear.ActiveFlag: False})
+        fy.ActiveFlag = True
+        db.session.commit()
+        invalidate_reference_data()
+        flash(f'Financial Year {fy.FYName} is now active.', 'success')
+    else:
+        flash('This Financial Year is already active.', 'error')
+    
+    return redirect(url_for('admin.config_master'))
+
+@bp.route('/edit-fy/<int:fy_id>', methods=['POST'])
+@admin_required
+def edit_fy(fy_id):
+    fy = FinancialYear.query.get_or_404(fy_id)
+    fy_name = request.form.get('fy_name')
+    start_date_str = request.form.get('start_date')
+    end_date_str = request.form.get('end_date')
+    
+    if not fy_name or not start_date_str or not end_date_str:
+        flash('All fields are required.', 'error')
+        return redirect(url_for('admin.config_master'))
+    
+    start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+    end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+    
+    if fy_name != fy.FYName and FinancialYear.query.filter_by(FYName=fy_name).first():
+        flash('Financial Year name already exists.', 'error')
+    elif start_date >= end_date:
+        flash('Start date must be before end date.', 'error')
+    else:
+        fy.FYName = fy_name
+        fy.StartDate = start_date
+        fy.EndDate = end_date
+        db.session.commit()
+        invalidate_reference_data()
+        flash('Financial Year updated successfully!', 'success')
+    
+    return redirect(url_for('admin.config_master'))
+
+@bp.route('/delete-fy/<int:fy_id>', methods=['POST'])
+@admin_required
+def delete_fy(fy_id):
+    fy = FinancialYear.query.get_or_404(fy_id)
+    
+    if fy.uploads:
+        flash('Cannot delete Financial Year with associated uploads. Deactivate it instead.', 'error')
+    else:
+        db.session.delete(fy)
+        db.session.commit()
+        invalidate_reference_data()
+        flash(f'Financial Year {fy.FYName} deleted successfully!', 'success')
+    
+    return redirect(url_for('admin.config_master'))
+
+@bp.route('/send-test-email', methods=['POST'])
+@admin_required
+def send_test_email():
+    """Send a test email to verify email configuration"""
+    user = User.query.get(session['user_id'])
+    
+    if not email_service.is_configured():
+        flash('Email service is not configured. Please set up SMTP credentials in email_config.py.', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    # Send test email to the admin user
+    subject = "Test Email - MIS System"
+    
+    html_content = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <style>
+            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+            .header {{ background-color: #4F46E5; color: white; padding: 20px; border-radius: 5px 5px 0 0; }}
+            .content {{ background-color: #f9fafb; padding: 30px; border: 1px solid #e5e7eb; }}
+            .footer {{ background-color: #f3f4f6; padding: 15px; text-align: center; border-radius: 0 0 5px 5px; font-size: 12px; color: #6b7280; }}
+            .success-box {{ background-color: #d1fae5; border-left: 4px solid #10b981; padding: 15px; margin: 20px 0; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h2 style="margin: 0;">✓ Email Test Successful</h2>
+            </div>
+            <div class="content">
+                <div class="success-box">
+                    <strong>Congratulations!</strong> Your email configuration is working correctly.
+                </div>
+                
+                <p>Dear {user.Username},</p>
+                
+                <p>This is a test email from the MIS Configuration System to verify that your SMTP settings are configured correctly.</p>
+                
+                <h3>Configuration Details:</h3>
+                <ul>
+                    <li><strong>SMTP Host:</strong> {email_service.smtp_host}</li>
+                    <li><strong>SMTP Port:</strong> {email_service.smtp_port}</li>
+                    <li><strong>From Email:</strong> {email_service.from_email}</li>
+                    <li><strong>Sent to:</strong> {user.Email}</li>
+                    <li><strong>Timestamp:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</li>
+                </ul>
+                
+                <p>If you received this email, your email notification system is ready to use!</p>
+                
+                <p>Best regards,<br>
+                <strong>MIS System</strong></p>
+            </div>
+            <div class="footer">
+                This is a test email from the MIS Upload System.
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    
+    text_content = f"""
+Test Email - MIS System
+
+✓ Email Configuration Test Successful
+
+Dear {user.Username},
+
+This is a test email from the MIS Configuration System to verify that your SMTP settings are configured correctly.
+
+Configuration Details:
+- SMTP Host: {email_service.smtp_host}
+- SMTP Port: {email_service.smtp_port}
+- From Email: {email_service.from_email}
+- Sent to: {user.Email}
+- Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+
+If you received this email, your email notification system is ready to use!
+
+Best regards,
+MIS System
+    """
+    
+    success, message = email_service.send_email(user.Email, subject, html_content, text_content)
+    
+    if success:
+        flash(f'✓ Test email sent successfully to {user.Email}! Check your inbox.', 'success')
+    else:
+        flash(f'✗ Failed to send test email: {message}', 'error')
+    
+    return redirect(url_for('main.dashboard'))
+
+@bp.route('/send-upload-notifications', methods=['POST'])
+@admin_required
+def send_upload_notifications():
+    """Send email notifications to all HOD users about MIS upload window"""
+    hod_role = get_role('HOD')
+    
+    if not hod_role:
+        flash('HOD role not found in the system.', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    hod_users = User.query.filter_by(RoleID=hod_role.RoleID, IsActive=True).all()
+    
+    if not hod_users:
+        flash('No active HOD users found to notify.', 'warning')
+        return redirect(url_for('main.dashboard'))
+    
+    if not email_service.is_configured():
+        flash('Email service is not configured. Please set up SMTP credentials in environment variables.', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    # Get application URL from environment or request
+    app_url = os.environ.get('REPLIT_DEV_DOMAIN')
+    if app_url:
+        app_url = f'https://{app_url}'
+    else:
+        app_url = request.host_url.rstrip('/')
+    
+    success_count, total_count, messages = email_service.send_upload_window_notification(hod_users, app_url)
+    
+    # Show detailed results
+    if success_count == total_count:
+        flash(f'✓ Successfully sent notifications to all {total_count} HOD users!', 'success')
+    elif success_count > 0:
+        flash(f'⚠ Partially successful: Sent {success_count} out of {total_count} notifications.', 'warning')
+    else:
+        flash(f'✗ Failed to send any notifications. Please check email configuration.', 'error')
+    
+    # Show individual failures
+    for msg in messages:
+        if 'Failed' in msg or 'error' in msg.lower() or 'Authentication' in msg:
+            flash(f'❌ {msg}', 'error')
+    
+    return redirect(url_for('main.dashboard'))
+
+@bp.route('/user-management')
+@admin_required
+def user_management():
+    user = User.query.get(session['user_id'])
+    users = User.query.all()
+    departments = get_departments()
+    roles = get_roles()
+    email_configured = email_service.is_configured()
+    
+    return render_template('user_management.html',
+                                 current_user=user,
+                                 users=users,
+                                 departments=departments,
+                                 roles=roles,
+                                 email_configured=email_configured)
+
+@bp.route('/add-user', methods=['POST'])
+@admin_required
+def add_user():
+    emp_id = request.form.get('emp_id')
+    username = request.form.get('username')
+    email = request.form.get('email')
+    password = request.form.get('password')
+    department_id = request.form.get('department_id')
+    role_id = request.form.get('role_id')
+    
+    if not emp_id or not email or not password or not department_id or not role_id:
+        flash('Employee ID, Email, Password, Department and Role are required fields.', 'error')
+    
+    elif User.query.filter_by(EmpID=emp_id).first():
+        flash('Employee ID already exists.', 'error')
+    elif User.query.filter_by(Email=email).first():
+        flash('Email already exists.', 'error')
+    else:
+        hashed_password = hash_password(password)
+        new_user = User(  # type: ignore
+            EmpID=emp_id,
+            Username=username if username else None,
+            Email=email,
+            PasswordHash=hashed_password,
+            DepartmentID=department_id,
+            RoleID=role_id,
+            IsActive=True,
+            FailedLoginAttempts=0,
+            PasswordLastChanged=datetime.now(IST),
+            PasswordExpiryDate=datetime.now(IST) + timedelta(days=90)
+        )
+        db.session.add(new_user)
+        db.session.commit()
+        flash('User created successfully!', 'success')
+    
+    return redirect(url_for('admin.user_management'))
+
+@bp.route('/edit-user/<int:user_id>', methods=['POST'])
+@admin_required
+def edit_user(user_id):
+    user = User.query.get_or_404(user_id)
+    emp_id = request.form.get('emp_id')
+    username = request.form.get('username')
+    email = request.form.get('email')
+    department_id = request.form.get('department_id')
+    role_id = request.form.get('role_id')
+    password = request.form.get('password')
+    
+    if not emp_id or not email or not department_id or not role_id:
+        flash('Employee ID, Email, Department and Role are required fields.', 'error')
+        return redirect(url_for('admin.user_management'))
+    
+    if not email.lower().endswith('@gmail.com'):
+        flash('Only Gmail addresses are allowed. Please use an email ending with @gmail.com', 'error')
+    elif emp_id != user.EmpID and User.query.filter_by(EmpID=emp_id).first():
+        flash('Employee ID already exists.', 'error')
+    elif email != user.Email and User.query.filter_by(Email=email).first():
+        flash('Email already exists.', 'error')
+    else:
+        user.EmpID = emp_id
+        user.Username = username if username else None
+        user.Email = email
+        user.DepartmentID = department_id
+        user.RoleID = role_id
+        if password:
+            user.PasswordHash = hash_password(password)
+            user.PasswordLastChanged = datetime.now(IST)
+            user.PasswordExpiryDate = datetime.now(IST) + timedelta(days=90)
+        db.session.commit()
+        flash('User updated successfully!', 'success')
+    
+    return redirect(url_for('admin.user_management'))
+
+@bp.route('/toggle-user/<int:user_id>', methods=['POST'])
+@admin_required
+def toggle_user(user_id):
+    user = User.query.get_or_404(user_id)
+    user.IsActive = not user.IsActive
+    db.session.commit()
+    flash(f'User {user.EmpID} {"activated" if user.IsActive else "deactivated"}.', 'success')
+    return redirect(url_for('admin.user_management'))
+
+@bp.route('/delete-user/<int:user_id>', methods=['POST'])
+@admin_required
+def delete_user(user_id):
+    user = User.query.get_or_404(user_id)
+    
+    if user.uploads:
+        flash('Cannot delete user with associated uploads. Deactivate instead.', 'error')
+    else:
+        db.session.delete(user)
+        db.session.commit()
+        flash(f'User {user.Username} deleted successfully!', 'success')
+    
+    return redirect(url_for('admin.user_management'))
+
+@bp.route('/template-management')
+@admin_required
+def template_management():
+    user = User.query.get(session['user_id'])
+    departments = get_departments()
+    templates = Template.query.all()
+    
+    return render_template('template_management.html',
+                                 current_user=user,
+                                 departments=departments,
+                                 templates=templates)
+
+@bp.route('/upload-template', methods=['POST'])
+@admin_required
+def upload_template():
+    if 'file' not in request.files:
+        flash('No file selected.', 'error')
+        return redirect(url_for('admin.template_management'))
+    
+    file = request.files['file']
+    
+    if not file or not file.filename:
+        flash('No file selected.', 'error')
+        return redirect(url_for('admin.template_management'))
+    
+    if not (file.filename.endswith('.xls') or file.filename.endswith('.xlsx')):
+        flash('Only .xls or .xlsx files are allowed.', 'error')
+        return redirect(url_for('admin.template_management'))
+    
+    department_id = request.form.get('department_id')
+    
+    if not department_id:
+        flash('Department is required.', 'error')
+        return redirect(url_for('admin.template_management'))
+    
+    filename = secure_filename(f"template_{department_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{file.filename}")
+    staged = content_store.stage(file)
+    
+    template = Template(  # type: ignore
+        DepartmentID=department_id,
+        FilePath=staged.commit(),
+        FileName=filename,
+        ContentHash=staged.sha256
+    )
+    db.session.add(template)
+    db.session.commit()
+    
+    flash('Template uploaded successfully!', 'success')
+    return redirect(url_for('admin.template_management'))
+
+@bp.route('/edit-template/<int:template_id>', methods=['GET', 'POST'])
+@admin_required
+def edit_template(template_id):
+    template = Template.query.get_or_404(template_id)
+    user = User.query.get(session['user_id'])
+    departments = get_departments()
+    
+    if request.method == 'POST':
+        file = request.files.get('file')
+        department_id = request.form.get('department_id')
+        
+        if not department_id:
+            flash('Department is required.', 'error')
+            return render_template('edit_template.html', template=template, departments=departments, current_user=user)
+        
+        # If new file provided, replace the old one
+        if file and file.filename:
+            if not (file.filename.endswith('.xls') or file.filename.endswith('.xlsx')):
+                flash('Only .xls or .xlsx files are allowed.', 'error')
+                return render_template('edit_template.html', template=template, departments=departments, current_user=user)
+            
+            # Save new file
+            staged = content_store.stage(file)
+            old_file_path = template.FilePath
+            template.FilePath = staged.commit()
+            template.FileName = secure_filename(f"template_{department_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{file.filename}")
+            template.ContentHash = staged.sha256
+            template.UploadDate = datetime.now(IST)
+        else:
+            old_file_path = None
+        
+        template.DepartmentID = department_id
+        db.session.commit()
+        
+        # Delete old file once nothing references it
+        if old_file_path and old_file_path != template.FilePath:
+            remove_stored_file(old_file_path)
+        flash('Template updated successfully!', 'success')
+        return redirect(url_for('admin.template_management'))
+    
+    return render_template('edit_template.html', template=template, departments=departments, current_user=user)
+
+@bp.route('/delete-template/<int:template_id>', methods=['POST'])
+@admin_required
+def delete_template(template_id):
+    template = Template.query.get_or_404(template_id)
+    file_path = template.FilePath
+    
+    db.session.delete(template)
+    db.session.commit()
+    
+    # Delete file from storage
+    remove_stored_file(file_path)
+    
+    flash('Template deleted successfully!', 'success')
+    return redirect(url_for('admin.template_management'))
@@ -0,0 +1,507 @@
+"""
+Excel, CSV and ZIP downloads of the report pages, stored workbooks and
+templates.
+"""
+
+import os
+from flask import Blueprint, request, redirect, url_for, session, flash, current_app
+from werkzeug.utils import secure_filename
+from sqlalchemy.orm import joinedload
+from zip_stream import stream_zip
+from xlsx_stream import stream_xlsx, MIMETYPE as XLSX_MIMETYPE
+import sla_analytics
+from metrics import EXPORT_ROWS
+from models import ConsolidatedMIS, FinancialYear, MISUpload, Template, User
+from auth import admin_required, login_required, management_required, supervisor_required
+from services import (
+    UPLOAD_STAGE_FILLS, get_departments, search_uploads, send_stored_file, turnaround_fy, turnaround_report,
+    year_heatmap, year_heatmap_fy
+)
+
+bp = Blueprint('exports', __name__)
+
+@bp.route('/download-mis-year-heatmap')
+@login_required
+def download_mis_year_heatmap():
+    """The year view as an Excel sheet, one coloured cell per department and month, streamed as it is written"""
+    fy = year_heatmap_fy()
+    if not fy:
+        return redirect(url_for('main.dashboard'))
+    
+    heatmap = year_heatmap(fy)
+    month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+    
+    def rows():
+        yield ['Department'] + [month_names[month] for month in heatmap['months']]
+        for row in heatmap['rows']:
+            yield [row['department_name']] + [(cell['stage'], cell['stage']) for cell in row['cells']]
+        yield ['Submitted'] + heatmap['submitted']
+    
+    EXPORT_ROWS.labels(export=request.endpoint).inc(len(heatmap['rows']))
+    response = current_app.response_class(stream_xlsx(f"MIS {fy.FYName}", rows(), fills=UPLOAD_STAGE_FILLS, widths=[28] + [20] * 12),
+                                  mimetype=XLSX_MIMETYPE)
+    response.headers.set('Content-Disposition', 'attachment', filename=secure_filename(f"MIS_Year_{fy.FYName}.xlsx"))
+    response.cache_control.private = True
+    response.cache_control.no_store = True
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@bp.route('/download-turnaround-sla-csv')
+@login_required
+def download_turnaround_sla_csv():
+    import csv
+    from io import StringIO
+    fy = turnaround_fy()
+    if not fy:
+        return redirect(url_for('main.dashboard'))
+    
+    output = StringIO()
+    writer = csv.writer(output)
+    department_names = {dept.DeptID: dept.DeptName for dept in get_departments()}
+    rows = list(sla_analytics.csv_rows(turnaround_report(fy), fy.StartDate, department_names))
+    writer.writerows(rows)
+    EXPORT_ROWS.labels(export=request.endpoint).inc(len(rows) - 1)
+    
+    response = current_app.response_class(output.getvalue(), mimetype='text/csv')
+    response.headers.set('Content-Disposition', 'attachment', filename=secure_filename(f"MIS_Turnaround_{fy.FYName}.csv"))
+    response.cache_control.private = True
+    response.cache_control.no_store = True
+    return response
+
+@bp.route('/download-consolidated-mis/<int:consolidated_id>')
+@login_required
+def download_consolidated_mis(consolidated_id):
+    user = User.query.get(session['user_id'])
+    
+    # Allow Admin, Management, and Supervisor to download
+    if user.role.RoleName not in ['Admin', 'Management', 'Supervisor']:
+        flash('Access denied.', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    consolidated = ConsolidatedMIS.query.get_or_404(consolidated_id)
+    
+    try:
+        filename = consolidated.FileName or consolidated.ConsolidatedFilePath.split('/')[-1]
+        return send_stored_file(consolidated.ConsolidatedFilePath, consolidated.ContentHash, filename)
+    except Exception as e:
+        flash(f'Error downloading file: {str(e)}', 'error')
+        return redirect(url_for('main.dashboard'))
+
+@bp.route('/download-mis-bundle')
+@login_required
+def download_mis_bundle():
+    """Every department's workbook for one FY/month as a ZIP, streamed as it is built"""
+    import csv
+    from io import StringIO
+    user = User.query.get(session['user_id'])
+    
+    # Same audience as the consolidated downloads
+    if user.role.RoleName not in ['Admin', 'Management', 'Supervisor']:
+        flash('Access denied.', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    fy_id = request.args.get('fy_id', type=int)
+    month_id = request.args.get('month_id', type=int)
+    status = request.args.get('status', '')
+    include_consolidated = request.args.get('include_consolidated') == '1'
+    if not fy_id or not month_id or not 1 <= month_id <= 12:
+        flash('Choose a financial year and month to download.', 'error')
+        return redirect(url_for('main.dashboard'))
+    financial_year = FinancialYear.query.get_or_404(fy_id)
+    
+    query = MISUpload.query.options(joinedload(MISUpload.uploader)).filter_by(FYID=fy_id, MonthID=month_id, IsCancelled=False)
+    if status:
+        query = query.filter_by(Status=status)
+    uploads = query.order_by(MISUpload.UploadCode).all()
+    consolidated_files = ConsolidatedMIS.query.filter_by(FYID=fy_id, MonthID=month_id).order_by(ConsolidatedMIS.ConsolidatedMISID).all() if include_consolidated else []
+    if not uploads and not consolidated_files:
+        flash('No MIS files were uploaded for the selected period.', 'warning')
+        return redirect(url_for('main.dashboard'))
+    
+    month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+    month_name = month_names[month_id]
+    
+    # Everything the archive needs is read here, so the generator never touches the session
+    members = []
+    manifest = StringIO()
+    writer = csv.writer(manifest)
+    writer.writerow(['File', 'MIS Code', 'Department', 'Month', 'Financial Year', 'Status', 'Uploaded By', 'Upload Date', 'SHA-256', 'Note'])
+    for upload in uploads:
+        filename = secure_filename(upload.FileName or os.path.basename(upload.FilePath)) or f'{upload.UploadCode}.xlsx'
+        arcname = f"{upload.UploadCode}_{filename}"
+        present = os.path.isfile(upload.FilePath)
+        if present:
+            members.append((arcname, upload.FilePath))
+        writer.writerow([arcname if present else '', upload.UploadCode, upload.department.DeptName, month_name, financial_year.FYName,
+                         upload.Status, upload.uploader.Username, upload.UploadDate.strftime('%d %b %Y %H:%M'),
+                         upload.ContentHash or '', '' if present else 'File missing from storage'])
+    for consolidated in consolidated_files:
+        filename = secure_filename(consolidated.FileName or os.path.basename(consolidated.ConsolidatedFilePath)) or 'consolidated.xlsx'
+        arcname = f"Consolidated/{consolidated.ConsolidatedMISID}_{filename}"
+        present = os.path.isfile(consolidated.ConsolidatedFilePath)
+        if present:
+            members.append((arcname, consolidated.ConsolidatedFilePath))
+        writer.writerow([arcname if present else '', '', 'Consolidated', month_name, financial_year.FYName,
+                         consolidated.Status, consolidated.supervisor.Username, consolidated.CreatedDate.strftime('%d %b %Y %H:%M'),
+                         consolidated.ContentHash or '', '' if present else 'File missing from storage'])
+    members.append(('manifest.csv', manifest.getvalue().encode('utf-8')))
+    
+    archive_name = secure_filename(f"MIS_{month_name}_{financial_year.FYName}{'_' + status if status else ''}.zip")
+    response = current_app.response_class(stream_zip(members), mimetype='application/zip')
+    response.headers.set('Content-Disposition', 'attachment', filename=archive_name)
+    response.cache_control.private = True
+    response.cache_control.no_store = True
+    # Let nginx pass the archive on as it is written rather than buffering it
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@bp.route('/download-consolidated-dashboard-excel')
+@management_required
+def download_consolidated_dashboard_excel():
+    user = User.query.get(session['user_id'])
+    
+    # Get filter parameters
+    fy_id = request.args.get('fy_id', '')
+    month_id = request.args.get('month_id', '')
+    status = request.args.get('status', '')
+    
+    # Base query
+    query = ConsolidatedMIS.query
+    
+    if fy_id:
+        query = query.filter_by(FYID=int(fy_id))
+    if month_id:
+        query = query.filter_by(MonthID=int(month_id))
+    if status:
+        query = query.filter_by(Status=status)
+    
+    consolidated_reports = query.order_by(ConsolidatedMIS.CreatedDate.desc()).all()
+    
+    try:
+        import openpyxl
+        from io import BytesIO
+        from flask import send_file
+        
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = "Consolidated MIS Dashboard"
+        
+        # Headers
+        headers = ['ID', 'Month', 'Financial Year', 'Supervisor', 'Department', 'Created Date', 'Status', 'Approved By', 'Approved Date']
+        ws.append(headers)
+        
+        # Data
+        month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+        for report in consolidated_reports:
+            approver = User.query.get(report.ApprovedBy) if report.ApprovedBy else None
+            ws.append([
+                f"#{report.ConsolidatedMISID}",
+                month_names[report.MonthID],
+                report.financial_year.FYName,
+                report.supervisor.Username or report.supervisor.EmpID,
+                report.supervisor.department.DeptName,
+                report.CreatedDate.strftime('%d %b %Y'),
+                report.Status,
+                approver.Username if approver else '',
+                report.ApprovedDate.strftime('%d %b %Y') if report.ApprovedDate else ''
+            ])
+        
+        # Save to BytesIO
+        EXPORT_ROWS.labels(export=request.endpoint).inc(ws.max_row - 1)
+        
+        output = BytesIO()
+        wb.save(output)
+        output.seek(0)
+        
+        return send_file(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', as_attachment=True, download_name='Consolidated_MIS_Dashboard.xlsx')
+    except Exception as e:
+        flash(f'Error generating Excel: {str(e)}', 'error')
+        return redirect(url_for('management.consolidated_mis_dashboard'))
+
+@bp.route('/download-individual-dashboard-excel')
+@management_required
+def download_individual_dashboard_excel():
+    user = User.query.get(session['user_id'])
+    
+    # Get filter parameters
+    fy_id = request.args.get('fy_id', '')
+    month_id = request.args.get('month_id', '')
+    status = request.args.get('status', '')
+    
+    # Base query
+    query = MISUpload.query.filter_by(IsCancelled=False)
+    
+    if fy_id:
+        query = query.filter_by(FYID=int(fy_id))
+    if month_id:
+        query = query.filter_by(MonthID=int(month_id))
+    if status:
+        query = query.filter_by(Status=status)
+    
+    individual_reports = query.order_by(MISUpload.UploadDate.desc()).all()
+    
+    try:
+        import openpyxl
+        from io import BytesIO
+        from flask import send_file
+        
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = "Individual MIS Dashboard"
+        
+        # Headers
+        headers = ['MIS Code', 'Department', 'Month', 'Financial Year', 'Uploaded By', 'Upload Date', 'Status', 'Supervisor Approved']
+        ws.append(headers)
+        
+        # Data
+        month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+        for upload in individual_reports:
+            ws.append([
+                upload.UploadCode,
+                upload.department.DeptName,
+                month_names[upload.MonthID],
+                upload.financial_year.FYName,
+                upload.uploader.Username or upload.uploader.EmpID,
+                upload.UploadDate.strftime('%d %b %Y'),
+                upload.Status,
+                'Yes' if upload.SupervisorApproved else 'No'
+            ])
+        
+        # Save to BytesIO
+        EXPORT_ROWS.labels(export=request.endpoint).inc(ws.max_row - 1)
+        
+        output = BytesIO()
+        wb.save(output)
+        output.seek(0)
+        
+        return send_file(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', as_attachment=True, download_name='Individual_MIS_Dashboard.xlsx')
+    except Exception as e:
+        flash(f'Error generating Excel: {str(e)}', 'error')
+        return redirect(url_for('management.management_consolidated_reports'))
+
+@bp.route('/download-reports-excel')
+@login_required
+def download_reports_excel():
+    user = User.query.get(session['user_id'])
+    
+    # Filter uploads based on role
+    if user.role.RoleName == 'Admin':
+        query = MISUpload.query
+    elif user.role.RoleName == 'Management':
+        query = MISUpload.query
+    elif user.role.RoleName == 'Supervisor':
+        query = MISUpload.query
+    else:
+        query = MISUpload.query.filter_by(DepartmentID=user.DepartmentID)
+    
+    query = query.filter_by(IsCancelled=False)
+    
+    # Apply filters
+    department_id = request.args.get('department', '')
+    fy_id = request.args.get('fy', '')
+    status = request.args.get('status', '')
+    search_code = request.args.get('search_code', '').strip()
+    
+    if search_code:
+        query = search_uploads(query, search_code)
+    else:
+        if department_id:
+            query = query.filter_by(DepartmentID=int(department_id))
+        if fy_id:
+            query = query.filter_by(FYID=int(fy_id))
+        if status:
+            query = query.filter_by(Status=status)
+    
+    uploads = query.order_by(MISUpload.UploadDate.desc()).all()
+    
+    try:
+        import openpyxl
+        from io import BytesIO
+        from flask import send_file
+        
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = "MIS Reports"
+        
+        # Headers
+        headers = ['MIS Code', 'Upload ID', 'Department', 'Month', 'Financial Year', 'Uploaded By', 'Upload Date', 'File Check', 'Status']
+        ws.append(headers)
+        
+        # Data
+        month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+        for upload in uploads:
+            ws.append([
+                upload.UploadCode,
+                f"#{upload.UploadID}",
+                upload.department.DeptName,
+                month_names[upload.MonthID],
+                upload.financial_year.FYName,
+                upload.uploader.Username or upload.uploader.EmpID,
+                upload.UploadDate.strftime('%d %b %Y %H:%M'),
+                upload.FileCheck,
+                upload.Status
+            ])
+        
+        # Save to BytesIO
+        EXPORT_ROWS.labels(export=request.endpoint).inc(ws.max_row - 1)
+        
+        output = BytesIO()
+        wb.save(output)
+        output.seek(0)
+        
+        return send_file(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', as_attachment=True, download_name='MIS_Reports.xlsx')
+    except Exception as e:
+        flash(f'Error generating Excel: {str(e)}', 'error')
+        return redirect(url_for('main.reports'))
+
+@bp.route('/download-my-uploads-excel')
+@login_required
+def download_my_uploads_excel():
+    user = User.query.get(session['user_id'])
+    uploads = MISUpload.query.filter_by(DepartmentID=user.DepartmentID).order_by(MISUpload.UploadDate.desc()).all()
+    
+    try:
+        import openpyxl
+        from io import BytesIO
+        from flask import send_file
+        
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = "My Uploads"
+        
+        # Headers
+        headers = ['MIS Code', 'Month', 'Financial Year', 'Uploaded By', 'Upload Date', 'File Check', 'Status']
+        ws.append(headers)
+        
+        # Data
+        month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+        for upload in uploads:
+            ws.append([
+                upload.UploadCode,
+                month_names[upload.MonthID],
+                upload.financial_year.FYName,
+                upload.uploader.Username or upload.uploader.EmpID,
+                upload.UploadDate.strftime('%d %b %Y %H:%M'),
+                upload.FileCheck,
+                'Cancelled' if upload.IsCancelled else upload.Status
+            ])
+        
+        # Save to BytesIO
+        EXPORT_ROWS.labels(export=request.endpoint).inc(ws.max_row - 1)
+        
+        output = BytesIO()
+        wb.save(output)
+        output.seek(0)
+        
+        return send_file(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', as_attachment=True, download_name=f'My_Uploads_{user.department.DeptName}.xlsx')
+    except Exception as e:
+        flash(f'Error generating Excel: {str(e)}', 'error')
+        return redirect(url_for('hod.my_uploads'))
+
+@bp.route('/download-approved-mis-excel')
+@admin_required
+def download_approved_mis_excel():
+    approved_uploads = MISUpload.query.filter_by(Status='Approved').order_by(MISUpload.UploadDate.desc()).all()
+    
+    try:
+        import openpyxl
+        from io import BytesIO
+        from flask import send_file
+        
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = "Approved MIS"
+        
+        # Headers
+        headers = ['MIS Code', 'Department', 'Month', 'Financial Year', 'Uploaded By', 'Upload Date', 'File Check', 'Status']
+        ws.append(headers)
+        
+        # Data
+        month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+        for upload in approved_uploads:
+            ws.append([
+                upload.UploadCode,
+                upload.department.DeptName,
+                month_names[upload.MonthID],
+                upload.financial_year.FYName,
+                upload.uploader.Username or upload.uploader.EmpID,
+                upload.UploadDate.strftime('%d %b %Y %H:%M'),
+                upload.FileCheck,
+                upload.Status
+            ])
+        
+        # Save to BytesIO
+        EXPORT_ROWS.labels(export=request.endpoint).inc(ws.max_row - 1)
+        
+        output = BytesIO()
+        wb.save(output)
+        output.seek(0)
+        
+        return send_file(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', as_attachment=True, download_name='Approved_MIS_Reports.xlsx')
+    except Exception as e:
+        flash(f'Error generating Excel: {str(e)}', 'error')
+        return redirect(url_for('admin.approved_mis'))
+
+@bp.route('/download-supervisor-uploads-excel')
+@supervisor_required
+def download_supervisor_uploads_excel():
+    pending_uploads = MISUpload.query.filter_by(SupervisorApproved=False, Status='In Review', IsCancelled=False).order_by(MISUpload.UploadDate.desc()).all()
+    
+    try:
+        import openpyxl
+        from io import BytesIO
+        from flask import send_file
+        
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = "Pending HOD Uploads"
+        
+        # Headers
+        headers = ['MIS Code', 'Department', 'Month', 'Financial Year', 'Uploaded By', 'Upload Date', 'Status']
+        ws.append(headers)
+        
+        # Data
+        month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+        for upload in pending_uploads:
+            ws.append([
+                upload.UploadCode,
+                upload.department.DeptName,
+                month_names[upload.MonthID],
+                upload.financial_year.FYName,
+                upload.uploader.Username or upload.uploader.EmpID,
+                upload.UploadDate.strftime('%d %b %Y %H:%M'),
+                upload.Status
+            ])
+        
+        # Save to BytesIO
+        EXPORT_ROWS.labels(export=request.endpoint).inc(ws.max_row - 1)
+        
+        output = BytesIO()
+        wb.save(output)
+        output.seek(0)
+        
+        return send_file(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', as_attachment=True, download_name='Pending_HOD_Uploads.xlsx')
+    except Exception as e:
+        flash(f'Error generating Excel: {str(e)}', 'error')
+        return redirect(url_for('supervisor.supervisor_uploads'))
+
+@bp.route('/download-template/<int:dept_id>')
+@login_required
+def download_template(dept_id):
+    user = User.query.get(session['user_id'])
+    if not user or not user.IsActive:
+        session.clear()
+        flash('Your session has expired. Please log in again.', 'error')
+        return redirect(url_for('main.login'))
+    
+    template = Template.query.filter_by(DepartmentID=dept_id).order_by(Template.UploadDate.desc()).first()
+    
+    if not template:
+        flash('No template found for this department.', 'error')
+        return redirect(url_for('hod.mis_upload'))
+    
+    try:
+        return send_stored_file(template.FilePath, template.ContentHash, f"MIS_Template_{dept_id}.xlsx")
+    except Exception as e:
+        flash(f'Error downloading template: {str(e)}', 'error')
+        return redirect(url_for('hod.mis_upload'))
@@ -0,0 +1,504 @@
+"""
+HOD uploads: the upload page, plain and chunked uploads, validation status,
+and editing or deleting an upload.
+"""
+
+import os
+import re
+import secrets
+from datetime import datetime, date
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify, abort
+from werkzeug.utils import secure_filename
+from config import UPLOAD_WINDOW_START_DAY, UPLOAD_WINDOW_END_DAY, CHUNKED_UPLOAD_CHUNK_SIZE, CHUNKED_UPLOAD_MAX_SIZE
+from extensions import content_store, db
+from models import ChunkedUpload, IST, MISUpload, User
+from auth import login_required
+from services import (
+    check_upload_window, create_mis_upload, filename_for_extension, get_active_fy, get_department,
+    get_departments, get_financial_year, get_financial_years, remove_stored_file, stage_validated_workbook
+)
+
+bp = Blueprint('hod', __name__)
+
+@bp.route('/my-uploads')
+@login_required
+def my_uploads():
+    user = User.query.get(session['user_id'])
+    if not user or not user.IsActive:
+        session.clear()
+        flash('Your session has expired. Please log in again.', 'error')
+        return redirect(url_for('main.login'))
+    
+    # HOD can only see their department's uploads
+    if user.role.RoleName == 'HOD':
+        uploads = MISUpload.query.filter_by(DepartmentID=user.DepartmentID).order_by(MISUpload.UploadDate.desc()).all()
+    else:
+        # If not HOD, redirect to reports page
+        return redirect(url_for('main.reports'))
+    
+    return render_template('my_uploads.html', 
+                         current_user=user,
+                         uploads=uploads)
+
+@bp.route('/delete-upload/<int:upload_id>', methods=['POST'])
+@login_required
+def delete_upload(upload_id):
+    user = User.query.get(session['user_id'])
+    if not user or not user.IsActive:
+        session.clear()
+        flash('Your session has expired. Please log in again.', 'error')
+        return redirect(url_for('main.login'))
+    
+    upload = MISUpload.query.get_or_404(upload_id)
+    
+    # Admin can delete any upload (In Review or Approved, any time)
+    if user.role.RoleName == 'Admin':
+        db.session.delete(upload)
+        db.session.commit()
+        
+        try:
+            remove_stored_file(upload.FilePath, upload.OriginalFilePath)
+        except Exception as e:
+            flash(f'Warning: File deletion error: {str(e)}', 'warning')
+        flash('Upload deleted successfully!', 'success')
+        return redirect(url_for('admin.approved_mis') if upload.Status == 'Approved' else url_for('main.reports'))
+    
+    # HOD can only delete "In Review" uploads from their department
+    if user.role.RoleName == 'HOD':
+        if upload.Status != 'In Review':
+            flash(f'Cannot delete uploads with status "{upload.Status}". Only "In Review" uploads can be deleted.', 'error')
+            return redirect(url_for('hod.my_uploads'))
+        
+        if upload.DepartmentID != user.DepartmentID:
+            flash('You can only delete uploads from your department.', 'error')
+            return redirect(url_for('hod.my_uploads'))
+        
+        # Mark as cancelled instead of deleting so Management can see it was cancelled
+        upload.IsCancelled = True
+        db.session.commit()
+        
+        try:
+            remove_stored_file(upload.FilePath, upload.OriginalFilePath)
+        except Exception as e:
+            flash(f'Warning: File deletion error: {str(e)}', 'warning')
+        flash('Upload marked as cancelled. Management will see this change.', 'success')
+        return redirect(url_for('hod.my_uploads'))
+    
+    # Other roles cannot delete
+    flash('You do not have permission to delete uploads.', 'error')
+    return redirect(url_for('main.reports'))
+
+@bp.route('/edit-upload/<int:upload_id>', methods=['GET', 'POST'])
+@login_required
+def edit_upload(upload_id):
+    user = User.query.get(session['user_id'])
+    if not user or not user.IsActive:
+        session.clear()
+        flash('Your session has expired. Please log in again.', 'error')
+        return redirect(url_for('main.login'))
+    
+    upload = MISUpload.query.get_or_404(upload_id)
+    
+    # Check permissions
+    # Admin can edit any upload anytime
+    # HOD can only edit "In Review" uploads from their department
+    if user.role.RoleName == 'Admin':
+        pass  # Admin can edit any upload
+    elif user.role.RoleName == 'HOD':
+        if upload.DepartmentID != user.DepartmentID:
+            flash('You can only edit uploads from your department.', 'error')
+            return redirect(url_for('hod.my_uploads'))
+        
+        if upload.Status != 'In Review':
+            flash(f'Cannot modify uploads with status "{upload.Status}". Only "In Review" uploads can be modified.', 'error')
+            return redirect(url_for('hod.my_uploads'))
+    else:
+        flash('You do not have permission to edit uploads.', 'error')
+        return redirect(url_for('main.reports'))
+    
+    # GET request - show edit form
+    if request.method == 'GET':
+        financial_years = get_financial_years()
+        departments = get_departments() if user.role.RoleName == 'Admin' else [dept for dept in get_departments() if dept.DeptID == user.DepartmentID]
+        
+        return render_template('edit_upload.html',
+                             current_user=user,
+                             upload=upload,
+                             departments=departments,
+                             financial_years=financial_years)
+    
+    # POST request - handle file update
+    if 'file' in request.files:
+        file = request.files['file']
+        
+        if file and file.filename:
+            if not (file.filename.endswith('.xls') or file.filename.endswith('.xlsx')):
+                flash('Only .xls or .xlsx files are allowed.', 'error')
+                return redirect(url_for('hod.edit_upload', upload_id=upload_id))
+            
+            # Validate Excel file
+            staged, is_valid, validation_message = stage_validated_workbook(file)
+            
+            if not is_valid:
+                flash(f'Validation Error: {validation_message}', 'error')
+                return redirect(url_for('hod.edit_upload', upload_id=upload_id))
+            
+            fy = upload.financial_year
+            dept = upload.department
+            month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+            old_file_paths = (upload.FilePath, upload.OriginalFilePath)
+            
+            # Update upload record
+            upload.FilePath = staged.commit()
+            upload.FileName = filename_for_extension(secure_filename(f"{dept.DeptName}_{month_names[upload.MonthID]}_{fy.FYName}_{file.filename}"), staged.extension)
+            upload.ContentHash = staged.sha256
+            upload.OriginalFilePath = staged.original_path
+            upload.FileCheck = 'Validated'
+            upload.UploadDate = datetime.now(IST)
+            # Mark as modified for HOD so Management can see changes
+            if user.role.RoleName == 'HOD':
+                upload.IsModified = True
+            db.session.commit()
+            
+            # Delete old files once nothing references them
+            try:
+                remove_stored_file(*old_file_paths)
+            except Exception as e:
+                flash(f'Warning: Error deleting old file: {str(e)}', 'warning')
+            
+            flash('✓ File updated successfully! Management will see this upload was modified.', 'success')
+            return redirect(url_for('hod.my_uploads'))
+    
+    flash('No file provided for update.', 'error')
+    return redirect(url_for('hod.edit_upload', upload_id=upload_id))
+
+@bp.route('/mis-upload')
+@login_required
+def mis_upload():
+    user = User.query.get(session['user_id'])
+    if not user or not user.IsActive:
+        session.clear()
+        flash('Your session has expired. Please log in again.', 'error')
+        return redirect(url_for('main.login'))
+    
+    # Admin and HOD can upload during window, Management cannot upload
+    if user.role.RoleName == 'Admin':
+        upload_allowed, upload_message = check_upload_window()
+        departments = get_departments()
+        uploads = MISUpload.query.order_by(MISUpload.UploadDate.desc()).all()
+        hod_blocked_message = None
+    elif user.role.RoleName == 'Management':
+        upload_allowed = False
+        upload_message = "Management role cannot upload MIS. Please use the Approval Queue to review and approve uploads."
+        departments = get_departments()
+        uploads = MISUpload.query.order_by(MISUpload.UploadDate.desc()).all()
+        hod_blocked_message = None
+    else:
+        upload_allowed, upload_message = check_upload_window()
+        # HOD can only see their department
+        departments = [dept for dept in get_departments() if dept.DeptID == user.DepartmentID]
+        uploads = MISUpload.query.filter_by(DepartmentID=user.DepartmentID).order_by(MISUpload.UploadDate.desc()).all()
+        
+        # Check if HOD already has an approved MIS for current month
+        current_month = date.today().month
+        active_fy = get_active_fy()
+        fy_id = active_fy.FYID if active_fy else None
+        
+        approved_upload = MISUpload.query.filter_by(
+            DepartmentID=user.DepartmentID,
+            MonthID=current_month,
+            FYID=fy_id,
+            Status='Approved'
+        ).first() if fy_id else None
+        
+        if approved_upload:
+            upload_allowed = False
+            hod_blocked_message = f"An approved MIS upload already exists for {['', 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December'][current_month]}. No new uploads are allowed for this period."
+        else:
+            hod_blocked_message = None
+    
+    financial_years = get_financial_years()
+    
+    return render_template('mis_upload.html',
+                                 current_user=user,
+                                 upload_allowed=upload_allowed,
+                                 upload_message=upload_message,
+                                 hod_blocked_message=hod_blocked_message,
+                                 current_date=date.today().strftime('%Y-%m-%d'),
+                                 departments=departments,
+                                 financial_years=financial_years,
+                                 upload_window_start=UPLOAD_WINDOW_START_DAY,
+                                 upload_window_end=UPLOAD_WINDOW_END_DAY,
+                                 chunk_size=CHUNKED_UPLOAD_CHUNK_SIZE,
+                                 uploads=uploads)
+
+@bp.route('/upload-mis', methods=['POST'])
+@login_required
+def upload_mis():
+    user = User.query.get(session['user_id'])
+    if not user or not user.IsActive:
+        session.clear()
+        flash('Your session has expired. Please log in again.', 'error')
+        return redirect(url_for('main.login'))
+    
+    if 'file' not in request.files:
+        flash('No file selected.', 'error')
+        return redirect(url_for('hod.mis_upload'))
+    
+    file = request.files['file']
+    
+    if not file or not file.filename:
+        flash('No file selected.', 'error')
+        return redirect(url_for('hod.mis_upload'))
+    
+    if not (file.filename.endswith('.xls') or file.filename.endswith('.xlsx')):
+        flash('Only .xls or .xlsx files are allowed.', 'error')
+        return redirect(url_for('hod.mis_upload'))
+    
+    department_id = request.form.get('department_id')
+    month_id = request.form.get('month_id')
+    fy_id = request.form.get('fy_id')
+    
+    error_message = check_mis_upload_request(user, department_id, month_id, fy_id)
+    if error_message:
+        flash(error_message, 'error')
+        return redirect(url_for('hod.mis_upload'))
+    
+    staged = content_store.stage(file)
+    success, message = create_mis_upload(user, department_id, month_id, fy_id, file.filename, staged)
+    if not success:
+        staged.discard()
+    flash(message, 'success' if success else 'error')
+    return redirect(url_for('hod.mis_upload'))
+
+def check_mis_upload_request(user, department_id, month_id, fy_id):
+    """Shared permission, upload window and duplicate checks for MIS uploads. Returns an error message or None."""
+    # Management cannot upload
+    if user.role.RoleName == 'Management':
+        return 'Management role cannot upload MIS files.'
+    
+    # HOD must follow upload window, but Admin can upload anytime
+    if user.role.RoleName != 'Admin':
+        upload_allowed, upload_message = check_upload_window()
+        if not upload_allowed:
+            return upload_message
+    
+    if not department_id or not month_id or not fy_id:
+        return 'All fields are required.'
+    
+    fy = get_financial_year(fy_id)
+    dept = get_department(department_id)
+    month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+    
+    # Check for duplicate uploads - same department, month, and FY (not cancelled)
+    existing_upload = MISUpload.query.filter_by(
+        DepartmentID=int(department_id),
+        MonthID=int(month_id),
+        FYID=int(fy_id),
+        IsCancelled=False
+    ).first()
+    
+    if existing_upload:
+        return f'MIS upload already exists for {dept.DeptName} - {month_names[int(month_id)]} {fy.FYName}. Please delete or modify the existing upload instead.'
+    
+    # HOD users can only upload for current month
+    if user.role.RoleName == 'HOD':
+        current_month = date.today().month
+        if int(month_id) != current_month:
+            return f'HOD users can only upload MIS data for the current month (Month {current_month}). Old month uploads are not allowed.'
+    
+    # HOD can only upload for their own department
+    if user.role.RoleName == 'HOD' and int(department_id) != user.DepartmentID:
+        return 'You can only upload for your own department.'
+    
+    return None
+
+@bp.route('/upload-mis/<int:upload_id>/status')
+@login_required
+def upload_validation_status(upload_id):
+    """Lightweight JSON view of an upload's validation state for the upload page to poll"""
+    user = User.query.get(session['user_id'])
+    upload = MISUpload.query.get_or_404(upload_id)
+    if user.role.RoleName == 'HOD' and upload.DepartmentID != user.DepartmentID:
+        abort(404)
+    
+    return jsonify({
+        'upload_id': upload.UploadID,
+        'upload_code': upload.UploadCode,
+        'file_check': upload.FileCheck,
+        'message': upload.ValidationMessage,
+        'data_rows': upload.DataRowCount,
+        'is_cancelled': upload.IsCancelled,
+        'status': upload.Status
+    })
+
+def chunked_upload_for_user(token):
+    """Look up a chunked upload session owned by the logged-in user"""
+    chunked = ChunkedUpload.query.get_or_404(token)
+    if chunked.UserID != session['user_id']:
+        abort(404)
+    return chunked
+
+@bp.route('/upload-mis/chunked', methods=['POST'])
+@login_required
+def init_chunked_upload():
+    """Start a resumable upload: returns a token the client PUTs chunks to"""
+    user = User.query.get(session['user_id'])
+    if not user or not user.IsActive:
+        return jsonify({'error': 'Your session has expired. Please log in again.'}), 401
+    
+    data = request.get_json(silent=True) or request.form
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object or form.'}), 400
+    filename = str(data.get('filename') or '')
+    department_id = data.get('department_id')
+    month_id = data.get('month_id')
+    fy_id = data.get('fy_id')
+    
+    if not (filename.endswith('.xls') or filename.endswith('.xlsx')):
+        return jsonify({'error': 'Only .xls or .xlsx files are allowed.'}), 400
+    
+    try:
+        total_size = int(data.get('total_size') or 0)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'total_size must be the file size in bytes.'}), 400
+    
+    if not all(str(value).isdigit() for value in (department_id, month_id, fy_id) if value):
+        return jsonify({'error': 'department_id, month_id and fy_id must be numeric IDs.'}), 400
+    
+    content_hash = str(data.get('sha256') or '').lower() or None
+    if content_hash and not re.fullmatch(r'[0-9a-f]{64}', content_hash):
+        return jsonify({'error': 'sha256 must be the hex SHA-256 of the whole file.'}), 400
+    
+    if total_size <= 0 or total_size > CHUNKED_UPLOAD_MAX_SIZE:
+        return jsonify({'error': f'File size must be between 1 byte and {CHUNKED_UPLOAD_MAX_SIZE // (1024 * 1024)} MB.'}), 400
+    
+    error_message = check_mis_upload_request(user, department_id, month_id, fy_id)
+    if error_message:
+        return jsonify({'error': error_message}), 400
+    
+    chunked = ChunkedUpload(  # type: ignore
+        Token=secrets.token_hex(16),
+        UserID=user.UserID,
+        DepartmentID=int(department_id),
+        MonthID=int(month_id),
+        FYID=int(fy_id),
+        FileName=filename,
+        TotalSize=total_size,
+        ReceivedSize=0,
+        ContentHash=content_hash
+    )
+    db.session.add(chunked)
+    db.session.commit()
+    
+    return jsonify({'token': chunked.Token, 'offset': 0, 'chunk_size': CHUNKED_UPLOAD_CHUNK_SIZE}), 201
+
+@bp.route('/upload-mis/chunked/<token>', methods=['GET'])
+@login_required
+def chunked_upload_status(token):
+    """Last confirmed offset, so an interrupted client knows where to resume"""
+    chunked = chunked_upload_for_user(token)
+    return jsonify({'token': chunked.Token, 'offset': chunked.ReceivedSize, 'total_size': chunked.TotalSize, 'chunk_size': CHUNKED_UPLOAD_CHUNK_SIZE})
+
+@bp.route('/upload-mis/chunked/<token>', methods=['PUT'])
+@login_required
+def upload_chunk(token):
+    """Append one chunk. Requires X-Chunk-Offset and X-Chunk-SHA256 headers."""
+    chunked = chunked_upload_for_user(token)
+    
+    offset = request.headers.get('X-Chunk-Offset', type=int)
+    checksum = request.headers.get('X-Chunk-SHA256', '')
+    if offset is None or not checksum:
+        return jsonify({'error': 'X-Chunk-Offset and X-Chunk-SHA256 headers are required.'}), 400
+    
+    # Chunks must arrive in order; tell the client where to resume from
+    if offset != chunked.ReceivedSize:
+        return jsonify({'error': 'Offset does not match the last confirmed offset.', 'offset': chunked.ReceivedSize}), 409
+    
+    max_bytes = min(CHUNKED_UPLOAD_CHUNK_SIZE, chunked.TotalSize - offset)
+    success, result = content_store.receive_chunk(request.stream, checksum, max_bytes)
+    if not success:
+        return jsonify({'error': result, 'offset': chunked.ReceivedSize}), 400
+    
+    # A retried chunk may have been confirmed while this one was streaming - re-check under the lock
+    with content_store.chunk_lock(token):
+        received = db.session.execute(
+            db.select(ChunkedUpload.ReceivedSize).where(ChunkedUpload.Token == token)
+        ).scalar()
+        if received is None:
+            content_store.discard_received(result)
+            content_store.discard_chunks(token)
+            abort(404)
+        if offset != received:
+            content_store.discard_received(result)
+            return jsonify({'error': 'Offset does not match the last confirmed offset.', 'offset': received}), 409
+        
+        size = content_store.append_chunk(token, offset, result)
+        advanced = db.session.execute(
+            db.update(ChunkedUpload)
+            .where(ChunkedUpload.Token == token, ChunkedUpload.ReceivedSize == offset)
+            .values(ReceivedSize=offset + size)
+        ).rowcount
+        db.session.commit()
+    
+    if not advanced:
+        db.session.refresh(chunked)
+        return jsonify({'error': 'Offset does not match the last confirmed offset.', 'offset': chunked.ReceivedSize}), 409
+    return jsonify({'offset': offset + size, 'total_size': chunked.TotalSize})
+
+def restart_chunked_upload(chunked, message):
+    """Drop an assembled file that does not match what the client declared so it is sent again from the start"""
+    content_store.discard_chunks(chunked.Token)
+    chunked.ReceivedSize = 0
+    db.session.commit()
+    return jsonify({'error': message, 'offset': 0}), 409
+
+@bp.route('/upload-mis/chunked/<token>/finalize', methods=['POST'])
+@login_required
+def finalize_chunked_upload(token):
+    """Hand the assembled file to the normal validation and MISUpload creation path"""
+    user = User.query.get(session['user_id'])
+    chunked_upload_for_user(token)
+    
+    # Serialized with chunk PUTs and with a retried finalize of the same upload
+    with content_store.chunk_lock(token):
+        chunked = db.session.get(ChunkedUpload, token, populate_existing=True)
+        if chunked is None:
+            content_store.discard_chunks(token)
+            abort(404)
+        
+        if chunked.ReceivedSize != chunked.TotalSize:
+            return jsonify({'error': 'Upload is incomplete.', 'offset': chunked.ReceivedSize}), 409
+        
+        path = content_store.chunk_path(token)
+        if os.path.getsize(path) != chunked.TotalSize:
+            return restart_chunked_upload(chunked, 'The assembled file does not match the declared size. Please upload it again.')
+        
+        # Re-check: the window may have closed or another upload landed while chunks were in flight
+        error_message = check_mis_upload_request(user, chunked.DepartmentID, chunked.MonthID, chunked.FYID)
+        if error_message:
+            content_store.discard_chunks(token)
+            db.session.delete(chunked)
+            db.session.commit()
+            flash(error_message, 'error')
+            return jsonify({'success': False, 'message': error_message, 'redirect': url_for('hod.mis_upload')}), 400
+        
+        extension = os.path.splitext(chunked.FileName)[1].lower()
+        staged = content_store.stage_path(path, extension)
+        if chunked.ContentHash and staged.sha256 != chunked.ContentHash:
+            staged.discard()
+            return restart_chunked_upload(chunked, 'The assembled file does not match its declared checksum. Please upload it again.')
+        
+        success, message = create_mis_upload(user, chunked.DepartmentID, chunked.MonthID, chunked.FYID, chunked.FileName, staged)
+        if not success:
+            # Validation backlog is full - keep the assembled file so the client only retries finalize
+            staged.restore(path)
+            response = jsonify({'error': message, 'offset': chunked.ReceivedSize})
+            response.headers['Retry-After'] = '30'
+            return response, 503
+        
+        db.session.delete(chunked)
+        db.session.commit()
+    
+    flash(message, 'success')
+    return jsonify({'success': True, 'message': message, 'redirect': url_for('hod.mis_upload')}), 200
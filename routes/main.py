@@ -0,0 +1,529 @@
+"""
+Pages every signed-in user shares: login, the dashboard and its panels,
+reports, search, the year view, turnaround SLA and upload viewing, plus
+the Prometheus /metrics endpoint.
+"""
+
+import os
+import ipaddress
+import secrets
+from datetime import datetime, date, timedelta
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify, abort
+from sqlalchemy.orm import joinedload
+from email_service import email_service
+import sla_analytics
+from metrics import render_latest
+import logging
+import calendar
+from config import (
+    UPLOAD_WINDOW_START_DAY, UPLOAD_WINDOW_END_DAY, SUPERVISOR_APPROVAL_START_DAY,
+    DASHBOARD_INSIGHTS_CACHE_SECONDS, DASHBOARD_PENDING_CACHE_SECONDS, DASHBOARD_BANNER_CACHE_SECONDS,
+    WORKBOOK_ANALYSIS_CACHE_SIZE, SLA_PERCENTILES, SEARCH_SUGGEST_LIMIT, METRICS_ALLOWED_IPS, METRICS_BEARER_TOKEN
+)
+from extensions import dashboard_panels, db
+from models import (
+    ConsolidatedMIS, ConsolidatedStatusRollup, IST, MISStatusRollup, MISUpload, User, consolidated_status_counts,
+    upload_status_counts
+)
+from auth import hash_password, login_required, verify_password
+from services import (
+    StreamedRows, UPLOAD_STAGE_FILLS, check_upload_window, get_active_fy, get_departments, get_financial_years,
+    search_uploads, send_stored_file, stream_page, turnaround_fy, turnaround_report, year_heatmap, year_heatmap_fy
+)
+
+bp = Blueprint('main', __name__)
+
+@bp.route('/')
+def index():
+    if 'user_id' in session:
+        return redirect(url_for('main.dashboard'))
+    return redirect(url_for('main.login'))
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        emp_id = request.form.get('emp_id')
+        password = request.form.get('password')
+        
+        user = User.query.filter_by(EmpID=emp_id).first()
+        
+        if not user:
+            flash('Invalid Employee ID or password.', 'error')
+            return render_template('login.html')
+        
+        # Check if account is locked
+        if user.AccountLockedUntil:
+            locked_until = user.AccountLockedUntil
+            # Make timezone-aware if naive
+            if locked_until.tzinfo is None:
+                locked_until = locked_until.replace(tzinfo=IST)
+            if locked_until > datetime.now(IST):
+                remaining = (locked_until - datetime.now(IST)).seconds // 60
+                flash(f'Account locked due to multiple failed login attempts. Try again in {remaining} minutes.', 'error')
+                return render_template('login.html')
+            else:
+                # Reset lock if time has passed
+                user.AccountLockedUntil = None
+                user.FailedLoginAttempts = 0
+                db.session.commit()
+        
+        # Check if account is active
+        if not user.IsActive:
+            flash('Your account is inactive. Please contact administrator.', 'error')
+            return render_template('login.html')
+        
+        # Check password expiry
+        if user.PasswordExpiryDate:
+            expiry_date = user.PasswordExpiryDate
+            # Make timezone-aware if naive
+            if expiry_date.tzinfo is None:
+                expiry_date = expiry_date.replace(tzinfo=IST)
+            if expiry_date < datetime.now(IST):
+                flash('Your password has expired. Please contact administrator to reset it.', 'error')
+                return render_template('login.html')
+        
+        # Verify password
+        if verify_password(password, user.PasswordHash):
+            # Reset failed attempts on successful login
+            user.FailedLoginAttempts = 0
+            user.LastFailedLogin = None
+            db.session.commit()
+            
+            session['user_id'] = user.UserID
+            flash('Login successful!', 'success')
+            return redirect(url_for('main.dashboard'))
+        else:
+            # Increment failed attempts
+            user.FailedLoginAttempts += 1
+            user.LastFailedLogin = datetime.now(IST)
+            
+            # Lock account after 5 failed attempts
+            if user.FailedLoginAttempts >= 5:
+                user.AccountLockedUntil = datetime.now(IST) + timedelta(minutes=30)
+                db.session.commit()
+                flash('Account locked due to 5 failed login attempts. Try again in 30 minutes.', 'error')
+            else:
+                db.session.commit()
+                remaining_attempts = 5 - user.FailedLoginAttempts
+                flash(f'Invalid password. {remaining_attempts} attempt(s) remaining before account lockout.', 'error')
+    
+    return render_template('login.html')
+
+@bp.route('/change-password', methods=['POST'])
+@login_required
+def change_password():
+    user = User.query.get(session['user_id'])
+    if not user or not user.IsActive:
+        session.clear()
+        flash('Your session has expired. Please log in again.', 'error')
+        return redirect(url_for('main.login'))
+    
+    current_password = request.form.get('current_password')
+    new_password = request.form.get('new_password')
+    confirm_password = request.form.get('confirm_password')
+    
+    # Validate current password
+    if not verify_password(current_password, user.PasswordHash):
+        flash('Current password is incorrect.', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    # Validate new password
+    if not new_password or len(new_password) < 6:
+        flash('New password must be at least 6 characters long.', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    # Validate password confirmation
+    if new_password != confirm_password:
+        flash('New password and confirm password do not match.', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    # Update password
+    user.PasswordHash = hash_password(new_password)
+    user.PasswordLastChanged = datetime.now(IST)
+    user.PasswordExpiryDate = datetime.now(IST) + timedelta(days=90)
+    db.session.commit()
+    
+    flash('Password changed successfully! Your new password will expire in 90 days.', 'success')
+    return redirect(url_for('main.dashboard'))
+
+@bp.route('/logout')
+def logout():
+    session.clear()
+    flash('Logged out successfully.', 'success')
+    return redirect(url_for('main.login'))
+
+def analyze_excel_data(file_path):
+    """Analyze Excel file and extract key metrics"""
+    try:
+        import openpyxl
+        workbook = openpyxl.load_workbook(file_path, data_only=True)
+        sheet = workbook.active
+        
+        # Get total rows and columns
+        total_rows = sheet.max_row - 1  # Exclude header
+        total_columns = sheet.max_column
+        
+        # Extract numeric data for analysis
+        numeric_data = []
+        for row in sheet.iter_rows(min_row=2, values_only=True):
+            for cell in row:
+                if isinstance(cell, (int, float)) and cell is not None:
+                    numeric_data.append(cell)
+        
+        # Calculate metrics
+        total_records = total_rows
+        total_numeric_values = len(numeric_data)
+        avg_value = sum(numeric_data) / len(numeric_data) if numeric_data else 0
+        max_value = max(numeric_data) if numeric_data else 0
+        min_value = min(numeric_data) if numeric_data else 0
+        
+        return {
+            'total_records': total_records,
+            'total_columns': total_columns,
+            'total_numeric_values': total_numeric_values,
+            'average_value': round(avg_value, 2),
+            'max_value': max_value,
+            'min_value': min_value,
+            'has_data': total_records > 0
+        }
+    except Exception as e:
+        logging.error(f"Error analyzing Excel file {file_path}: {str(e)}")
+        return None
+
+_workbook_analyses = {}
+
+def analyze_stored_workbook(file_path, content_hash):
+    """analyze_excel_data for a stored upload, remembered by content hash - a blob's content never changes"""
+    if not content_hash:
+        return analyze_excel_data(file_path)
+    if content_hash not in _workbook_analyses:
+        analysis = analyze_excel_data(file_path)
+        if analysis is None:
+            return None
+        if len(_workbook_analyses) >= WORKBOOK_ANALYSIS_CACHE_SIZE:
+            _workbook_analyses.pop(next(iter(_workbook_analyses)))
+        _workbook_analyses[content_hash] = analysis
+    return _workbook_analyses[content_hash]
+
+@bp.route('/dashboard')
+@login_required
+def dashboard():
+    user = User.query.get(session['user_id'])
+    if not user or not user.IsActive:
+        session.clear()
+        flash('Your session has expired. Please log in again.', 'error')
+        return redirect(url_for('main.login'))
+    
+    active_fy = get_active_fy()
+    
+    # Get recent uploads based on role
+    if user.role.RoleName == 'Admin':
+        recent_uploads = MISUpload.query.order_by(MISUpload.UploadDate.desc()).limit(5).all()
+    elif user.role.RoleName == 'Management':
+        recent_uploads = ConsolidatedMIS.query.order_by(ConsolidatedMIS.CreatedDate.desc()).limit(5).all()
+    elif user.role.RoleName == 'Supervisor':
+        recent_uploads = MISUpload.query.filter_by(SupervisorApproved=False, IsCancelled=False).order_by(MISUpload.UploadDate.desc()).limit(5).all()
+    elif user.role.RoleName == 'HOD':
+        recent_uploads = MISUpload.query.filter_by(DepartmentID=user.DepartmentID).order_by(MISUpload.UploadDate.desc()).limit(5).all()
+    else:
+        flash('Invalid role. Please contact administrator.', 'error')
+        session.clear()
+        return redirect(url_for('main.login'))
+    
+    # Upload-window banner, pending-approval widgets and data analytics are
+    # fetched by the page from the dashboard_panel_* endpoints below
+    stats = {
+        'total_users': User.query.count(),
+        'total_depts': len(get_departments()),
+        'active_fy': active_fy.FYName if active_fy else 'None',
+        'total_uploads': sum(count for _, count in upload_status_counts()),
+        'recent_uploads': recent_uploads,
+        'email_configured': email_service.is_configured()
+    }
+    
+    # Calculate last day of current month
+    today = date.today()
+    last_day_of_month = calendar.monthrange(today.year, today.month)[1]
+    
+    return render_template('dashboard.html', current_user=user, stats=stats, 
+                          upload_window_start=UPLOAD_WINDOW_START_DAY, 
+                          upload_window_end=UPLOAD_WINDOW_END_DAY,
+                          supervisor_approval_start_day=SUPERVISOR_APPROVAL_START_DAY,
+                          supervisor_approval_end_day=last_day_of_month)
+
+def build_data_insights():
+    """Totals and monthly breakdown across every approved workbook"""
+    data_insights = {
+        'total_records': 0,
+        'total_data_points': 0,
+        'departments_reporting': set(),
+        'monthly_breakdown': {}
+    }
+    
+    # Get all approved uploads for data analysis
+    approved_uploads = MISUpload.query.filter_by(Status='Approved', IsCancelled=False).all()
+    
+    for upload in approved_uploads:
+        if os.path.exists(upload.FilePath):
+            analysis = analyze_stored_workbook(upload.FilePath, upload.ContentHash)
+            if analysis:
+                data_insights['total_records'] += analysis['total_records']
+                data_insights['total_data_points'] += analysis['total_numeric_values']
+                data_insights['departments_reporting'].add(upload.department.DeptName)
+                
+                # Monthly breakdown
+                month_name = ['', 'Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'][upload.MonthID]
+                if month_name not in data_insights['monthly_breakdown']:
+                    data_insights['monthly_breakdown'][month_name] = 0
+                data_insights['monthly_breakdown'][month_name] += analysis['total_records']
+    
+    data_insights['departments_count'] = len(data_insights.pop('departments_reporting'))
+    data_insights['html'] = render_template('dashboard_panel_insights.html', insights=data_insights)
+    return data_insights
+
+@bp.route('/dashboard/panels/insights')
+@login_required
+def dashboard_panel_insights():
+    user = User.query.get(session['user_id'])
+    if user.role.RoleName not in ['Admin', 'Management']:
+        abort(403)
+    
+    # Any approval, rejection or cancellation changes this, and so does replacing an approved upload's
+    # file (edit_upload resets its UploadDate), so the panel is rebuilt straight away
+    approved_version = db.session.query(db.func.count(MISUpload.UploadID), db.func.sum(MISUpload.UploadID),
+                                        db.func.max(MISUpload.UploadDate)).filter_by(Status='Approved', IsCancelled=False).one()
+    return jsonify(dashboard_panels.get(('insights',), DASHBOARD_INSIGHTS_CACHE_SECONDS, build_data_insights,
+                                        version=tuple(approved_version)))
+
+@bp.route('/dashboard/panels/pending')
+@login_required
+def dashboard_panel_pending():
+    user = User.query.get(session['user_id'])
+    role = user.role.RoleName
+    
+    if role == 'Supervisor':
+        query = MISUpload.query.filter_by(SupervisorApproved=False, Status='In Review', IsCancelled=False).order_by(MISUpload.UploadDate.desc())
+        newest = query.with_entities(MISUpload.UploadID, MISUpload.UploadDate)
+        counts = upload_status_counts(MISStatusRollup.Status == 'In Review', MISStatusRollup.SupervisorApproved.is_(False))
+    elif role == 'Management':
+        query = ConsolidatedMIS.query.filter_by(Status='Pending Review').order_by(ConsolidatedMIS.CreatedDate.desc())
+        newest = query.with_entities(ConsolidatedMIS.ConsolidatedMISID, ConsolidatedMIS.CreatedDate)
+        counts = consolidated_status_counts(ConsolidatedStatusRollup.Status == 'Pending Review')
+    else:
+        return jsonify({'pending_count': 0, 'html': ''})
+    
+    pending_count = sum(count for _, count in counts)
+    
+    def build():
+        return {
+            'pending_count': pending_count,
+            'html': render_template('dashboard_panel_pending.html', role=role, pending_count=pending_count,
+                                    pending_items=query.limit(2).all())
+        }
+    # The two items listed change whenever one leaves the queue and another arrives, even if the count does not
+    version = (pending_count, tuple(tuple(row) for row in newest.limit(2).all()))
+    return jsonify(dashboard_panels.get(('pending', role), DASHBOARD_PENDING_CACHE_SECONDS, build, version=version))
+
+@bp.route('/dashboard/panels/upload-window')
+@login_required
+def dashboard_panel_upload_window():
+    user = User.query.get(session['user_id'])
+    role = user.role.RoleName
+    
+    def build():
+        upload_allowed, upload_message = check_upload_window()
+        return {
+            'upload_allowed': upload_allowed,
+            'upload_message': upload_message,
+            'html': render_template('dashboard_panel_upload_window.html', role=role,
+                                    upload_allowed=upload_allowed, upload_message=upload_message)
+        }
+    # The window moves with the date, so the day is part of the key
+    return jsonify(dashboard_panels.get(('upload_window', role), DASHBOARD_BANNER_CACHE_SECONDS, build, version=date.today()))
+
+@bp.route('/search/uploads')
+@login_required
+def search_upload_suggestions():
+    """Type-ahead suggestions for the report search boxes"""
+    user = User.query.get(session['user_id'])
+    terms = request.args.get('q', '').strip()
+    if not terms:
+        return jsonify([])
+    
+    query = MISUpload.query.filter_by(IsCancelled=False)
+    if user.role.RoleName == 'HOD':
+        query = query.filter_by(DepartmentID=user.DepartmentID)
+    uploads = search_uploads(query, terms).options(joinedload(MISUpload.uploader)).limit(SEARCH_SUGGEST_LIMIT).all()
+    
+    month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+    return jsonify([{
+        'code': upload.UploadCode,
+        'label': f"{upload.department.DeptName} - {month_names[upload.MonthID]} {upload.financial_year.FYName} - {upload.uploader.Username} ({upload.Status})",
+    } for upload in uploads])
+
+@bp.route('/reports')
+@login_required
+def reports():
+    user = User.query.get(session['user_id'])
+    if not user or not user.IsActive:
+        session.clear()
+        flash('Your session has expired. Please log in again.', 'error')
+        return redirect(url_for('main.login'))
+    
+    # Filter uploads based on role
+    if user.role.RoleName == 'Admin':
+        query = MISUpload.query
+    elif user.role.RoleName == 'Management':
+        query = MISUpload.query
+    elif user.role.RoleName == 'Supervisor':
+        # Supervisor sees all department records
+        query = MISUpload.query
+    else:
+        # HOD sees only their department records
+        query = MISUpload.query.filter_by(DepartmentID=user.DepartmentID)
+    
+    # Exclude cancelled uploads from all reports
+    query = query.filter_by(IsCancelled=False)
+    
+    # Apply filter parameters
+    department_id = request.args.get('department', '')
+    fy_id = request.args.get('fy', '')
+    status = request.args.get('status', '')
+    search_code = request.args.get('search_code', '').strip()
+    
+    # Ranked search over code, department, uploader and workbook text if provided
+    if search_code:
+        query = search_uploads(query, search_code)
+    else:
+        # Apply other filters only if search_code is not provided
+        if department_id:
+            query = query.filter_by(DepartmentID=int(department_id))
+        
+        if fy_id:
+            query = query.filter_by(FYID=int(fy_id))
+        
+        if status:
+            query = query.filter_by(Status=status)
+    
+    uploads = StreamedRows(query.options(joinedload(MISUpload.uploader)).order_by(MISUpload.UploadDate.desc()))
+    
+    departments = get_departments(active_only=True)
+    financial_years = get_financial_years()
+    
+    return stream_page('reports.html', 
+                         current_user=user,
+                         uploads=uploads,
+                         departments=departments,
+                         financial_years=financial_years,
+                         selected_department=department_id,
+                         selected_fy=fy_id,
+                         selected_status=status,
+                         search_code=search_code,
+                         user_role=user.role.RoleName)
+
+@bp.route('/view-upload/<int:upload_id>')
+@login_required
+def view_upload(upload_id):
+    user = User.query.get(session['user_id'])
+    if not user or not user.IsActive:
+        session.clear()
+        flash('Your session has expired. Please log in again.', 'error')
+        return redirect(url_for('main.login'))
+    
+    upload = MISUpload.query.get_or_404(upload_id)
+    
+    # Check permissions: Admin, Management, and HOD can view uploads
+    if user.role.RoleName == 'Management':
+        pass  # Management can view all uploads
+    elif user.role.RoleName == 'Admin':
+        pass  # Admin can view all uploads
+    elif user.role.RoleName == 'HOD' and upload.DepartmentID != user.DepartmentID:
+        flash('Access denied. You can only view uploads from your department.', 'error')
+        return redirect(url_for('main.reports'))
+    else:
+        flash('Access denied.', 'error')
+        return redirect(url_for('main.reports'))
+    
+    return render_template('view_upload.html', 
+                         current_user=user,
+                         upload=upload)
+
+@bp.route('/mis-year-heatmap')
+@login_required
+def mis_year_heatmap():
+    user = User.query.get(session['user_id'])
+    fy = year_heatmap_fy()
+    if not fy:
+        return redirect(url_for('main.dashboard'))
+    
+    tracking_endpoint = {'Admin': 'admin.admin_mis_tracking', 'Management': 'management.management_mis_tracking', 'Supervisor': 'supervisor.supervisor_mis_tracking'}[user.role.RoleName]
+    return render_template('mis_year_heatmap.html',
+                         current_user=user,
+                         heatmap=year_heatmap(fy),
+                         stages=list(UPLOAD_STAGE_FILLS),
+                         financial_years=get_financial_years(),
+                         selected_fy=fy,
+                         tracking_endpoint=tracking_endpoint)
+
+@bp.route('/turnaround-sla')
+@login_required
+def turnaround_sla():
+    user = User.query.get(session['user_id'])
+    fy = turnaround_fy()
+    if not fy:
+        return redirect(url_for('main.dashboard'))
+    
+    return render_template('turnaround_sla.html',
+                         current_user=user,
+                         report=turnaround_report(fy),
+                         stages=sla_analytics.STAGES,
+                         percentiles=SLA_PERCENTILES,
+                         months=sla_analytics.fy_months(fy.StartDate),
+                         departments=get_departments(by_name=True),
+                         upload_window_start=UPLOAD_WINDOW_START_DAY,
+                         upload_window_end=UPLOAD_WINDOW_END_DAY,
+                         financial_years=get_financial_years(),
+                         selected_fy=fy)
+
+@bp.route('/download-upload/<int:upload_id>')
+@login_required
+def download_upload(upload_id):
+    user = User.query.get(session['user_id'])
+    upload = MISUpload.query.get_or_404(upload_id)
+    
+    # Check permissions - Admin, Management, and HOD can download
+    if user.role.RoleName not in ['Admin', 'HOD', 'Management', 'Supervisor'] and upload.DepartmentID != user.DepartmentID:
+        flash('Access denied.', 'error')
+        return redirect(url_for('main.reports'))
+    
+    try:
+        filename = upload.FileName or upload.FilePath.split('/')[-1]
+        return send_stored_file(upload.FilePath, upload.ContentHash, filename)
+    except Exception as e:
+        flash(f'Error downloading file: {str(e)}', 'error')
+        return redirect(url_for('main.reports'))
+
+metrics_bearer_token = os.environ.get('METRICS_TOKEN') or METRICS_BEARER_TOKEN
+metrics_allowed_networks = [ipaddress.ip_network(address, strict=False) for address in METRICS_ALLOWED_IPS]
+
+def metrics_client_allowed():
+    """Scrapers must send the bearer token or connect directly from an allow-listed address"""
+    if metrics_bearer_token and secrets.compare_digest(
+            request.headers.get('Authorization', '').encode(), f'Bearer {metrics_bearer_token}'.encode()):
+        return True
+    # Behind a reverse proxy remote_addr is the proxy's own address, so forwarded requests need the token
+    if 'X-Forwarded-For' in request.headers or not request.remote_addr:
+        return False
+    try:
+        address = ipaddress.ip_address(request.remote_addr)
+    except ValueError:
+        return False
+    return any(address in network for network in metrics_allowed_networks)
+
+@bp.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint (allow-listed addresses or METRICS_TOKEN only)"""
+    if not metrics_client_allowed():
+        abort(403)
+    body, content_type = render_latest()
+    return body, 200, {'Content-Type': content_type}
@@ -0,0 +1,626 @@
+"""
+Management review of supervisor-approved uploads and consolidated MIS
+reports, and the Management tracking and history pages.
+"""
+
+from datetime import datetime, date
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash
+from sqlalchemy.orm import joinedload
+from email_service import email_service
+from config import UPLOAD_WINDOW_START_DAY, UPLOAD_WINDOW_END_DAY
+from extensions import db
+from models import (
+    ConsolidatedMIS, ConsolidatedStatusRollup, IST, MISStatusRollup, MISUpload, User, consolidated_status_counts,
+    latest_department_statuses, rollup_chart_data, upload_status_counts
+)
+from auth import management_required
+from services import (
+    StreamedRows, bulk_review_uploads, bulk_selection_error, create_notification, flash_bulk_review,
+    get_active_fy, get_departments, get_financial_year, get_financial_years, get_role, search_uploads, stream_page
+)
+
+bp = Blueprint('management', __name__)
+
+@bp.route('/management-history')
+@management_required
+def management_history():
+    user = User.query.get(session['user_id'])
+    if not user or not user.IsActive:
+        session.clear()
+        flash('Your session has expired. Please log in again.', 'error')
+        return redirect(url_for('main.login'))
+    
+    # Get filter parameters from query string
+    department_id = request.args.get('department_id', '')
+    fy_id = request.args.get('fy_id', '')
+    status = request.args.get('status', '')
+    search = request.args.get('q', '').strip()
+    
+    # All MIS uploads with their complete history, narrowed by any filters provided
+    query = MISUpload.query
+    
+    if department_id:
+        query = query.filter_by(DepartmentID=int(department_id))
+    
+    if fy_id:
+        query = query.filter_by(FYID=int(fy_id))
+    
+    if status:
+        query = query.filter_by(Status=status)
+    
+    # Last, so the best matches are taken from the filtered uploads
+    if search:
+        query = search_uploads(query, search)
+    
+    all_uploads = StreamedRows(query.options(joinedload(MISUpload.uploader)).order_by(MISUpload.UploadDate.desc()))
+    
+    departments = get_departments(active_only=True)
+    financial_years = get_financial_years()
+    
+    return stream_page('management_history.html', 
+                         current_user=user,
+                         uploads=all_uploads,
+                         departments=departments,
+                         financial_years=financial_years,
+                         selected_department=department_id,
+                         selected_fy=fy_id,
+                         selected_status=status,
+                         search=search)
+
+@bp.route('/approve-upload/<int:upload_id>', methods=['POST'])
+@management_required
+def approve_upload(upload_id):
+    user = User.query.get(session['user_id'])
+    
+    upload = MISUpload.query.get_or_404(upload_id)
+    
+    upload.Status = 'Approved'
+    db.session.commit()
+    
+    # Send email notification to uploader
+    if email_service.is_configured():
+        uploader = upload.uploader
+        month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+        month_name = month_names[upload.MonthID]
+        
+        subject = f"MIS Upload Approved - {upload.department.DeptName} - {month_name} {upload.financial_year.FYName}"
+        
+        html_content = f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <style>
+                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+                .header {{ background-color: #10b981; color: white; padding: 20px; border-radius: 5px 5px 0 0; }}
+                .content {{ background-color: #f9fafb; padding: 30px; border: 1px solid #e5e7eb; }}
+                .success-box {{ background-color: #d1fae5; border-left: 4px solid #10b981; padding: 15px; margin: 20px 0; }}
+                .footer {{ background-color: #f3f4f6; padding: 15px; text-align: center; border-radius: 0 0 5px 5px; font-size: 12px; color: #6b7280; }}
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <div class="header">
+                    <h2 style="margin: 0;">✓ MIS Upload Approved</h2>
+                </div>
+                <div class="content">
+                    <p>Dear {uploader.Username},</p>
+                    
+                    <div class="success-box">
+                        <strong>Great news!</strong> Your MIS upload has been approved by the administrator.
+                    </div>
+                    
+                    <h3>Upload Details:</h3>
+                    <ul>
+                        <li><strong>Department:</strong> {upload.department.DeptName}</li>
+                        <li><strong>Month:</strong> {month_name}</li>
+                        <li><strong>Financial Year:</strong> {upload.financial_year.FYName}</li>
+                        <li><strong>Upload Date:</strong> {upload.UploadDate.strftime('%d %b %Y %H:%M')}</li>
+                        <li><strong>Approved:</strong> {datetime.now(IST).strftime('%d %b %Y %H:%M:%S IST')}</li>
+                        <li><strong>Status:</strong> Approved</li>
+                    </ul>
+                    
+                    <p>Thank you for your timely submission!</p>
+                    
+                    <p>Best regards,<br>
+                    <strong>MIS System Team</strong></p>
+                </div>
+                <div class="footer">
+                    This is an automated notification from the MIS Upload System.
+                </div>
+            </div>
+        </body>
+        </html>
+        """
+        
+        text_content = f"""
+MIS Upload Approved
+
+Dear {uploader.Username},
+
+✓ Great news! Your MIS upload has been approved by the administrator.
+
+Upload Details:
+- Department: {upload.department.DeptName}
+- Month: {month_name}
+- Financial Year: {upload.financial_year.FYName}
+- Upload Date: {upload.UploadDate.strftime('%d %b %Y %H:%M')}
+- Approved: {datetime.now(IST).strftime('%d %b %Y %H:%M:%S IST')}
+- Status: Approved
+
+Thank you for your timely submission!
+
+Best regards,
+MIS System Team
+
+---
+This is an automated notification from the MIS Upload System.
+        """
+        
+        email_service.send_email(uploader.Email, subject, html_content, text_content)
+    
+    flash(f'Upload approved successfully! Notification sent to {upload.uploader.Username}.', 'success')
+    return redirect(url_for('supervisor.approval_queue'))
+
+@bp.route('/reject-upload/<int:upload_id>', methods=['POST'])
+@management_required
+def reject_upload(upload_id):
+    user = User.query.get(session['user_id'])
+    
+    upload = MISUpload.query.get_or_404(upload_id)
+    
+    upload.Status = 'Rejected'
+    db.session.commit()
+    
+    # Send email notification to uploader
+    if email_service.is_configured():
+        uploader = upload.uploader
+        month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+        month_name = month_names[upload.MonthID]
+        
+        subject = f"MIS Upload Rejected - {upload.department.DeptName} - {month_name} {upload.financial_year.FYName}"
+        
+        html_content = f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <style>
+                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+                .header {{ background-color: #ef4444; color: white; padding: 20px; border-radius: 5px 5px 0 0; }}
+                .content {{ background-color: #f9fafb; padding: 30px; border: 1px solid #e5e7eb; }}
+                .warning-box {{ background-color: #fee2e2; border-left: 4px solid #ef4444; padding: 15px; margin: 20px 0; }}
+                .footer {{ background-color: #f3f4f6; padding: 15px; text-align: center; border-radius: 0 0 5px 5px; font-size: 12px; color: #6b7280; }}
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <div class="header">
+                    <h2 style="margin: 0;">✗ MIS Upload Rejected</h2>
+                </div>
+                <div class="content">
+                    <p>Dear {uploader.Username},</p>
+                    
+                    <div class="warning-box">
+                        <strong>Action Required:</strong> Your MIS upload has been rejected by the administrator.
+                    </div>
+                    
+                    <h3>Upload Details:</h3>
+                    <ul>
+                        <li><strong>Department:</strong> {upload.department.DeptName}</li>
+                        <li><strong>Month:</strong> {month_name}</li>
+                        <li><strong>Financial Year:</strong> {upload.financial_year.FYName}</li>
+                        <li><strong>Upload Date:</strong> {upload.UploadDate.strftime('%d %b %Y %H:%M')}</li>
+                        <li><strong>Rejected:</strong> {datetime.now(IST).strftime('%d %b %Y %H:%M:%S IST')}</li>
+                        <li><strong>Status:</strong> Rejected</li>
+                    </ul>
+                    
+                    <p>Please review your submission and re-upload the corrected data during the upload window ({UPLOAD_WINDOW_START_DAY}st-{UPLOAD_WINDOW_END_DAY}th of each month).</p>
+                    
+                    <p>If you have any questions, please contact the administrator.</p>
+                    
+                    <p>Best regards,<br>
+                    <strong>MIS System Team</strong></p>
+                </div>
+                <div class="footer">
+                    This is an automated notification from the MIS Upload System.
+                </div>
+            </div>
+        </body>
+        </html>
+        """
+        
+        text_content = f"""
+MIS Upload Rejected
+
+Dear {uploader.Username},
+
+✗ Action Required: Your MIS upload has been rejected by the administrator.
+
+Upload Details:
+- Department: {upload.department.DeptName}
+- Month: {month_name}
+- Financial Year: {upload.financial_year.FYName}
+- Upload Date: {upload.UploadDate.strftime('%d %b %Y %H:%M')}
+- Rejected: {datetime.now(IST).strftime('%d %b %Y %H:%M:%S IST')}
+- Status: Rejected
+
+Please review your submission and re-upload the corrected data during the upload window ({UPLOAD_WINDOW_START_DAY}st-{UPLOAD_WINDOW_END_DAY}th of each month).
+
+If you have any questions, please contact the administrator.
+
+Best regards,
+MIS System Team
+
+---
+This is an automated notification from the MIS Upload System.
+        """
+        
+        email_service.send_email(uploader.Email, subject, html_content, text_content)
+    
+    flash(f'Upload rejected. Notification sent to {upload.uploader.Username}.', 'warning')
+    return redirect(url_for('supervisor.approval_queue'))
+
+@bp.route('/approve-uploads', methods=['POST'])
+@management_required
+def approve_uploads():
+    error = bulk_selection_error()
+    if error:
+        flash(error, 'error')
+        return redirect(url_for('management.management_history'))
+    
+    result = bulk_review_uploads(
+        (MISUpload.SupervisorApproved == True, MISUpload.Status == 'In Review', MISUpload.IsCancelled == False),
+        {MISUpload.Status: 'Approved'},
+        ('MIS Approved by Management', 'Your MIS upload {code} for {month} has been approved by Management.', 'management_approval'),
+        ('Approved', 'Management', '#10b981'))
+    flash_bulk_review(result, 'approved')
+    return redirect(url_for('management.management_history'))
+
+@bp.route('/reject-uploads', methods=['POST'])
+@management_required
+def reject_uploads():
+    error = bulk_selection_error()
+    if error:
+        flash(error, 'error')
+        return redirect(url_for('management.management_history'))
+    
+    result = bulk_review_uploads(
+        (MISUpload.SupervisorApproved == True, MISUpload.Status == 'In Review', MISUpload.IsCancelled == False),
+        {MISUpload.Status: 'Rejected'},
+        ('MIS Rejected by Management', 'Your MIS upload {code} for {month} has been rejected by Management. Please review and resubmit.', 'management_rejection'),
+        ('Rejected', 'Management', '#ef4444'))
+    flash_bulk_review(result, 'rejected')
+    return redirect(url_for('management.management_history'))
+
+@bp.route('/management-mis-tracking')
+@management_required
+def management_mis_tracking():
+    user = User.query.get(session['user_id'])
+    if not user or not user.IsActive:
+        session.clear()
+        flash('Your session has expired. Please log in again.', 'error')
+        return redirect(url_for('main.login'))
+    
+    # Get filter parameters
+    current_month = date.today().month
+    active_fy = get_active_fy()
+    
+    selected_month = request.args.get('month_id', str(current_month))
+    selected_fy = request.args.get('fy_id', str(active_fy.FYID) if active_fy else '1')
+    
+    # Get all active departments
+    all_departments = get_departments(active_only=True, by_name=True)
+    
+    # Build department status list
+    department_statuses = []
+    submitted_count = 0
+    pending_review_count = 0
+    not_submitted_count = 0
+    approved_count = 0
+    rejected_count = 0
+    
+    latest_statuses = latest_department_statuses(int(selected_fy), int(selected_month))
+    hod_role = get_role('HOD')
+    for dept in all_departments:
+        # Get HOD for this department
+        hod = User.query.filter_by(DepartmentID=dept.DeptID, RoleID=hod_role.RoleID, IsActive=True).first() if hod_role else None
+        
+        # Get MIS upload for this department, month, and FY (the rollup says whether there is one)
+        upload = MISUpload.query.filter_by(
+            DepartmentID=dept.DeptID,
+            MonthID=int(selected_month),
+            FYID=int(selected_fy),
+            IsCancelled=False
+        ).order_by(MISUpload.UploadDate.desc()).first() if dept.DeptID in latest_statuses else None
+        
+        # Count statuses from the rollup
+        if dept.DeptID in latest_statuses:
+            status, supervisor_approved = latest_statuses[dept.DeptID]
+            submitted_count += 1
+            if status == 'In Review':
+                pending_review_count += 1
+            elif status == 'Approved':
+                approved_count += 1
+            elif status == 'Rejected':
+                rejected_count += 1
+        else:
+            not_submitted_count += 1
+        
+        department_statuses.append({
+            'department_name': dept.DeptName,
+            'department_id': dept.DeptID,
+            'hod_name': hod.Username if hod else None,
+            'hod_emp_id': hod.EmpID if hod else None,
+            'upload': upload
+        })
+    
+    financial_years = get_financial_years()
+    selected_fy_obj = get_financial_year(selected_fy) if selected_fy else active_fy
+    
+    return render_template('management_mis_tracking.html',
+                         current_user=user,
+                         department_statuses=department_statuses,
+                         total_departments=len(all_departments),
+                         submitted_count=submitted_count,
+                         pending_review_count=pending_review_count,
+                         not_submitted_count=not_submitted_count,
+                         approved_count=approved_count,
+                         rejected_count=rejected_count,
+                         financial_years=financial_years,
+                         selected_month=selected_month,
+                         selected_fy=selected_fy,
+                         selected_fy_name=selected_fy_obj.FYName if selected_fy_obj else '')
+
+@bp.route('/consolidated-mis-dashboard')
+@management_required
+def consolidated_mis_dashboard():
+    user = User.query.get(session['user_id'])
+    if not user or not user.IsActive:
+        session.clear()
+        flash('Your session has expired. Please log in again.', 'error')
+        return redirect(url_for('main.login'))
+    
+    # Get filter parameters
+    fy_id = request.args.get('fy_id', '')
+    month_id = request.args.get('month_id', '')
+    status = request.args.get('status', '')
+    
+    # Base query - get ALL consolidated reports
+    query = ConsolidatedMIS.query
+    
+    # Apply filters only if specified
+    if fy_id:
+        query = query.filter_by(FYID=int(fy_id))
+    
+    if month_id:
+        query = query.filter_by(MonthID=int(month_id))
+    
+    if status:
+        query = query.filter_by(Status=status)
+    
+    # Get all consolidated reports sorted by most recent first
+    consolidated_reports = query.order_by(ConsolidatedMIS.CreatedDate.desc()).all()
+    
+    # Calculate statistics from the status rollup
+    totals = dict(consolidated_status_counts())
+    stats = {
+        'total_consolidated': sum(totals.values()),
+        'pending_count': totals.get('Pending Review', 0),
+        'approved_count': totals.get('Approved', 0),
+        'rejected_count': totals.get('Rejected', 0)
+    }
+    
+    # Chart and distribution counts follow the same filters as the table
+    filters = []
+    if fy_id:
+        filters.append(ConsolidatedStatusRollup.FYID == int(fy_id))
+    if month_id:
+        filters.append(ConsolidatedStatusRollup.MonthID == int(month_id))
+    if status:
+        filters.append(ConsolidatedStatusRollup.Status == status)
+    chart_data, month_counts, fy_counts = rollup_chart_data(
+        consolidated_status_counts(*filters, group_by=(ConsolidatedStatusRollup.FYID, ConsolidatedStatusRollup.MonthID)))
+    
+    financial_years = get_financial_years()
+    
+    return render_template('consolidated_mis_dashboard.html', 
+                         current_user=user,
+                         consolidated_reports=consolidated_reports,
+                         financial_years=financial_years,
+                         stats=stats,
+                         chart_data=chart_data,
+                         month_counts=month_counts,
+                         fy_counts=fy_counts,
+                         selected_fy=fy_id,
+                         selected_month=month_id,
+                         selected_status=status)
+
+@bp.route('/management-consolidated-reports')
+@management_required
+def management_consolidated_reports():
+    user = User.query.get(session['user_id'])
+    if not user or not user.IsActive:
+        session.clear()
+        flash('Your session has expired. Please log in again.', 'error')
+        return redirect(url_for('main.login'))
+    
+    # Get filter parameters
+    fy_id = request.args.get('fy_id', '')
+    month_id = request.args.get('month_id', '')
+    status = request.args.get('status', '')
+    
+    # Get individual MIS reports (HOD uploads) with filters
+    individual_query = MISUpload.query.filter_by(IsCancelled=False)
+    
+    if fy_id:
+        individual_query = individual_query.filter_by(FYID=int(fy_id))
+    
+    if month_id:
+        individual_query = individual_query.filter_by(MonthID=int(month_id))
+    
+    if status:
+        individual_query = individual_query.filter_by(Status=status)
+    
+    individual_reports = individual_query.order_by(MISUpload.UploadDate.desc()).all()
+    
+    # Calculate statistics from the status rollup
+    totals = dict(upload_status_counts(MISStatusRollup.Status != 'Cancelled'))
+    stats = {
+        'total_reports': sum(totals.values()),
+        'pending_count': totals.get('In Review', 0),
+        'approved_count': totals.get('Approved', 0),
+        'rejected_count': totals.get('Rejected', 0)
+    }
+    
+    # Chart and distribution counts follow the same filters as the table
+    filters = [MISStatusRollup.Status != 'Cancelled']
+    if fy_id:
+        filters.append(MISStatusRollup.FYID == int(fy_id))
+    if month_id:
+        filters.append(MISStatusRollup.MonthID == int(month_id))
+    if status:
+        filters.append(MISStatusRollup.Status == status)
+    chart_data, month_counts, fy_counts = rollup_chart_data(
+        upload_status_counts(*filters, group_by=(MISStatusRollup.FYID, MISStatusRollup.MonthID)))
+    
+    financial_years = get_financial_years()
+    
+    return render_template('management_consolidated_reports.html', 
+                         current_user=user,
+                         individual_reports=individual_reports,
+                         financial_years=financial_years,
+                         stats=stats,
+                         chart_data=chart_data,
+                         month_counts=month_counts,
+                         fy_counts=fy_counts,
+                         selected_fy=fy_id,
+                         selected_month=month_id,
+                         selected_status=status)
+
+@bp.route('/management-consolidated-history')
+@management_required
+def management_consolidated_history():
+    user = User.query.get(session['user_id'])
+    if not user or not user.IsActive:
+        session.clear()
+        flash('Your session has expired. Please log in again.', 'error')
+        return redirect(url_for('main.login'))
+    
+    # Get approved and rejected consolidated MIS by management
+    approved_consolidated = ConsolidatedMIS.query.filter_by(Status='Approved').order_by(ConsolidatedMIS.ApprovedDate.desc()).all()
+    rejected_consolidated = ConsolidatedMIS.query.filter_by(Status='Rejected').order_by(ConsolidatedMIS.CreatedDate.desc()).all()
+    
+    return render_template('management_consolidated_history.html', current_user=user, approved_consolidated=approved_consolidated, rejected_consolidated=rejected_consolidated)
+
+@bp.route('/management-consolidated-queue')
+@management_required
+def management_consolidated_queue():
+    user = User.query.get(session['user_id'])
+    if not user or not user.IsActive:
+        session.clear()
+        flash('Your session has expired. Please log in again.', 'error')
+        return redirect(url_for('main.login'))
+    
+    consolidated_uploads = ConsolidatedMIS.query.filter_by(Status='Pending Review').order_by(ConsolidatedMIS.CreatedDate.desc()).all()
+    return render_template('management_consolidated_queue.html', current_user=user, consolidated_uploads=consolidated_uploads)
+
+@bp.route('/view-consolidated-mis/<int:consolidated_id>')
+@management_required
+def view_consolidated_mis(consolidated_id):
+    user = User.query.get(session['user_id'])
+    if not user or not user.IsActive:
+        session.clear()
+        flash('Your session has expired. Please log in again.', 'error')
+        return redirect(url_for('main.login'))
+    
+    consolidated = ConsolidatedMIS.query.get_or_404(consolidated_id)
+    hod_uploads = MISUpload.query.filter(MISUpload.UploadID.in_([int(x) for x in consolidated.UploadedHODMISIDs.split(',')])).all() if consolidated.UploadedHODMISIDs else []
+    return render_template('view_consolidated_mis.html', current_user=user, consolidated=consolidated, hod_uploads=hod_uploads)
+
+@bp.route('/approve-consolidated-mis/<int:consolidated_id>', methods=['POST'])
+@management_required
+def approve_consolidated_mis(consolidated_id):
+    user = User.query.get(session['user_id'])
+    consolidated = ConsolidatedMIS.query.get_or_404(consolidated_id)
+    consolidated.Status = 'Approved'
+    consolidated.ApprovedDate = datetime.now(IST)
+    consolidated.ApprovedBy = user.UserID
+    
+    hod_ids = set()
+    for upload_id in consolidated.UploadedHODMISIDs.split(','):
+        upload = MISUpload.query.get(int(upload_id))
+        if upload:
+            upload.Status = 'Approved'
+            hod_ids.add(upload.UploadedBy)
+    
+    db.session.commit()
+    
+    month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+    month_name = month_names[consolidated.MonthID]
+    
+    # Create notification for supervisor
+    create_notification(consolidated.SupervisorID, 'Consolidated MIS Approved', f'Your consolidated MIS for {month_name} has been approved by Management.', 'management_approval', consolidated_id=consolidated_id)
+    
+    # Create notifications for all HODs in the consolidated upload
+    for hod_id in hod_ids:
+        create_notification(hod_id, 'MIS Approved by Management', f'Your MIS included in the consolidated MIS for {month_name} has been approved by Management.', 'management_approval')
+    
+    if email_service.is_configured():
+        supervisor = consolidated.supervisor
+        subject = f"Consolidated MIS Approved - {month_name}"
+        html_content = f"""<!DOCTYPE html><html><body style="font-family: Arial; background-color: #f9fafb;"><div style="max-width: 600px; margin: 0 auto; padding: 20px;"><div style="background-color: #10b981; color: white; padding: 20px; border-radius: 5px 5px 0 0;"><h2>✓ Consolidated MIS Approved</h2></div><div style="background-color: white; padding: 30px; border: 1px solid #e5e7eb;"><p>Dear {supervisor.Username},</p><p>Your consolidated MIS for {month_name} has been <strong>approved by Management</strong>.</p><p>Best regards,<br><strong>MIS System Team</strong></p></div></div></body></html>"""
+        email_service.send_email(supervisor.Email, subject, html_content)
+        
+        # Send emails to all HODs
+        for hod_id in hod_ids:
+            hod = User.query.get(hod_id)
+            if hod:
+                subject = f"MIS Approved by Management - {month_name}"
+                html_content = f"""<!DOCTYPE html><html><body style="font-family: Arial;"><div style="max-width: 600px; margin: 0 auto; padding: 20px;"><div style="background-color: #10b981; color: white; padding: 20px; border-radius: 5px 5px 0 0;"><h2>MIS Approved</h2></div><div style="background-color: white; padding: 30px;"><p>Dear {hod.Username},</p><p>Your MIS for {month_name} has been approved by Management.</p><p>Best regards,<br><strong>MIS System Team</strong></p></div></div></body></html>"""
+                email_service.send_email(hod.Email, subject, html_content)
+    
+    flash('Consolidated MIS approved! All HOD uploads marked as approved.', 'success')
+    return redirect(url_for('management.management_consolidated_queue'))
+
+@bp.route('/reject-consolidated-mis/<int:consolidated_id>', methods=['POST'])
+@management_required
+def reject_consolidated_mis(consolidated_id):
+    user = User.query.get(session['user_id'])
+    consolidated = ConsolidatedMIS.query.get_or_404(consolidated_id)
+    consolidated.Status = 'Rejected'
+    db.session.commit()
+    
+    month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+    month_name = month_names[consolidated.MonthID]
+    
+    # Get HOD IDs from consolidated uploads
+    hod_ids = set()
+    for upload_id in consolidated.UploadedHODMISIDs.split(','):
+        upload = MISUpload.query.get(int(upload_id))
+        if upload:
+            hod_ids.add(upload.UploadedBy)
+    
+    # Create notification for supervisor
+    create_notification(consolidated.SupervisorID, 'Consolidated MIS Rejected', f'Your consolidated MIS for {month_name} has been rejected by Management. Please review and resubmit.', 'management_rejection', consolidated_id=consolidated_id)
+    
+    # Create notifications for all HODs
+    for hod_id in hod_ids:
+        create_notification(hod_id, 'MIS Rejected by Management', f'Your MIS included in the consolidated MIS for {month_name} has been rejected by Management.', 'management_rejection')
+    
+    if email_service.is_configured():
+        supervisor = consolidated.supervisor
+        subject = f"Consolidated MIS Rejected - {month_name}"
+        html_content = f"""<!DOCTYPE html><html><body style="font-family: Arial;"><div style="max-width: 600px; margin: 0 auto; padding: 20px;"><div style="background-color: #ef4444; color: white; padding: 20px; border-radius: 5px 5px 0 0;"><h2>✗ Consolidated MIS Rejected</h2></div><div style="background-color: white; padding: 30px;"><p>Dear {supervisor.Username},</p><p>Your consolidated MIS for {month_name} has been rejected by Management. Please review and resubmit.</p><p>Best regards,<br><strong>MIS System Team</strong></p></div></div></body></html>"""
+        email_service.send_email(supervisor.Email, subject, html_content)
+        
+        # Send emails to all HODs
+        for hod_id in hod_ids:
+            hod = User.query.get(hod_id)
+            if hod:
+                subject = f"MIS Rejected by Management - {month_name}"
+                html_content = f"""<!DOCTYPE html><html><body style="font-family: Arial;"><div style="max-width: 600px; margin: 0 auto; padding: 20px;"><div style="background-color: #ef4444; color: white; padding: 20px; border-radius: 5px 5px 0 0;"><h2>MIS Rejected</h2></div><div style="background-color: white; padding: 30px;"><p>Dear {hod.Username},</p><p>Your MIS for {month_name} has been rejected by Management. Please review and resubmit.</p><p>Best regards,<br><strong>MIS System Team</strong></p></div></div></body></html>"""
+                email_service.send_email(hod.Email, subject, html_content)
+    
+    flash('Consolidated MIS rejected. Notifications sent to supervisor and HODs.', 'warning')
+    return redirect(url_for('management.management_consolidated_queue'))
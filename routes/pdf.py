@@ -0,0 +1,560 @@
+"""
+PDF renderings of an upload and of a consolidated MIS. ReportLab is
+imported inside the views, so only workers that render a PDF load it.
+"""
+
+import time
+from datetime import datetime
+from flask import Blueprint, redirect, url_for, session, flash
+from metrics import PDF_RENDER_SECONDS
+from models import ConsolidatedMIS, IST, MISUpload, User
+from auth import login_required
+
+bp = Blueprint('pdf', __name__)
+
+def strip_html_tags(text):
+    """Remove HTML tags from text"""
+    import re
+    if not text:
+        return ''
+    # Remove HTML tags
+    clean = re.sub('<.*?>', '', str(text))
+    return clean
+
+@bp.route('/download-consolidated-pdf/<int:consolidated_id>')
+@login_required
+def download_consolidated_pdf(consolidated_id):
+    user = User.query.get(session['user_id'])
+    
+    # Allow Admin, Management, and Supervisor to download PDF
+    if user.role.RoleName not in ['Admin', 'Management', 'Supervisor']:
+        flash('Access denied.', 'error')
+        return redirect(url_for('main.dashboard'))
+    
+    consolidated = ConsolidatedMIS.query.get_or_404(consolidated_id)
+    
+    render_started = time.perf_counter()
+    try:
+        import openpyxl
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4, landscape
+        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib.units import inch
+        from reportlab.lib.enums import TA_CENTER, TA_RIGHT
+        from io import BytesIO
+        from flask import send_file
+        
+        # Load the Excel file
+        workbook = openpyxl.load_workbook(consolidated.ConsolidatedFilePath)
+        sheet = workbook.active
+        
+        # Prepare data
+        month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+        month_name = month_names[consolidated.MonthID]
+        
+        # Get included HOD uploads
+        hod_uploads = MISUpload.query.filter(MISUpload.UploadID.in_([int(x) for x in consolidated.UploadedHODMISIDs.split(',')])).all() if consolidated.UploadedHODMISIDs else []
+        
+        # Get approver info
+        approver = User.query.get(consolidated.ApprovedBy) if consolidated.ApprovedBy else None
+        
+        # Extract headers
+        headers = []
+        for cell in sheet[1]:
+            if cell.value:
+                headers.append(str(cell.value))
+        
+        # Extract rows
+        rows = []
+        for row in sheet.iter_rows(min_row=2, values_only=True):
+            if any(cell is not None for cell in row):
+                rows.append([str(cell) if cell is not None else '' for cell in row])
+        
+        # Create PDF
+        buffer = BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=landscape(A4), rightMargin=30, leftMargin=30, topMargin=50, bottomMargin=30)
+        
+        elements = []
+        styles = getSampleStyleSheet()
+        
+        # Custom styles
+        title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=20,
+            textColor=colors.HexColor('#1f2937'),
+            spaceAfter=6,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold'
+        )
+        
+        subtitle_style = ParagraphStyle(
+            'CustomSubtitle',
+            parent=styles['Normal'],
+            fontSize=12,
+            textColor=colors.HexColor('#6b7280'),
+            spaceAfter=20,
+            alignment=TA_CENTER
+        )
+        
+        heading_style = ParagraphStyle(
+            'CustomHeading',
+            parent=styles['Heading2'],
+            fontSize=14,
+            textColor=colors.HexColor('#1f2937'),
+            spaceAfter=12,
+            spaceBefore=12,
+            fontName='Helvetica-Bold',
+            borderColor=colors.HexColor('#3b82f6'),
+            borderWidth=2,
+            borderPadding=8,
+            backColor=colors.HexColor('#eff6ff')
+        )
+        
+        info_style = ParagraphStyle(
+            'InfoStyle',
+            parent=styles['Normal'],
+            fontSize=10,
+            textColor=colors.HexColor('#374151'),
+            spaceAfter=6
+        )
+        
+        # Header
+        elements.append(Paragraph("CONSOLIDATED MIS REPORT", title_style))
+        elements.append(Paragraph(f"{month_name} {consolidated.financial_year.FYName}", subtitle_style))
+        elements.append(Spacer(1, 0.2*inch))
+        
+        # Report Information Section
+        elements.append(Paragraph("Report Information", heading_style))
+        elements.append(Spacer(1, 0.1*inch))
+        
+        info_data = [
+            ['Report ID:', f'#{consolidated.ConsolidatedMISID}', 'Month:', month_name],
+            ['Financial Year:', consolidated.financial_year.FYName, 'Status:', consolidated.Status],
+            ['Created Date:', consolidated.CreatedDate.strftime('%d %b %Y, %I:%M %p'), 'Total Departments:', str(len(hod_uploads))]
+        ]
+        
+        info_table = Table(info_data, colWidths=[1.5*inch, 2*inch, 1.5*inch, 2*inch])
+        info_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f9fafb')),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#374151')),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('PADDING', (0, 0), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e5e7eb')),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]))
+        elements.append(info_table)
+        elements.append(Spacer(1, 0.2*inch))
+        
+        # Supervisor Information Section
+        elements.append(Paragraph("Prepared By", heading_style))
+        elements.append(Spacer(1, 0.1*inch))
+        
+        supervisor_data = [
+            ['Name:', consolidated.supervisor.Username or consolidated.supervisor.EmpID, 'Employee ID:', consolidated.supervisor.EmpID],
+            ['Department:', consolidated.supervisor.department.DeptName, 'Email:', consolidated.supervisor.Email],
+            ['Role:', consolidated.supervisor.role.RoleName, 'Contact:', 'N/A']
+        ]
+        
+        supervisor_table = Table(supervisor_data, colWidths=[1.5*inch, 2*inch, 1.5*inch, 2*inch])
+        supervisor_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#dbeafe')),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#1e40af')),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('PADDING', (0, 0), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#93c5fd')),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]))
+        elements.append(supervisor_table)
+        elements.append(Spacer(1, 0.2*inch))
+        
+        # Approval Information (if approved)
+        if consolidated.Status == 'Approved' and approver:
+            elements.append(Paragraph("Approved By", heading_style))
+            elements.append(Spacer(1, 0.1*inch))
+            
+            approval_data = [
+                ['Approver:', approver.Username or approver.EmpID, 'Approved Date:', consolidated.ApprovedDate.strftime('%d %b %Y, %I:%M %p') if consolidated.ApprovedDate else 'N/A'],
+                ['Department:', approver.department.DeptName, 'Role:', approver.role.RoleName]
+            ]
+            
+            approval_table = Table(approval_data, colWidths=[1.5*inch, 2*inch, 1.5*inch, 2*inch])
+            approval_table.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#d1fae5')),
+                ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#065f46')),
+                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+                ('FONTSIZE', (0, 0), (-1, -1), 9),
+                ('PADDING', (0, 0), (-1, -1), 8),
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#6ee7b7')),
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ]))
+            elements.append(approval_table)
+            elements.append(Spacer(1, 0.2*inch))
+        
+        # Included Departments Section
+        elements.append(Paragraph(f"Included Department MIS Reports ({len(hod_uploads)})", heading_style))
+        elements.append(Spacer(1, 0.1*inch))
+        
+        dept_headers = [['No.', 'MIS Code', 'Department', 'Uploaded By', 'Upload Date', 'Status']]
+        dept_data = []
+        for idx, upload in enumerate(hod_uploads, 1):
+            dept_data.append([
+                str(idx),
+                upload.UploadCode,
+                upload.department.DeptName,
+                upload.uploader.Username or upload.uploader.EmpID,
+                upload.UploadDate.strftime('%d %b %Y'),
+                'Approved' if upload.SupervisorApproved else 'Pending'
+            ])
+        
+        dept_table = Table(dept_headers + dept_data, colWidths=[0.4*inch, 1.2*inch, 1.5*inch, 1.5*inch, 1.2*inch, 1*inch])
+        dept_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#8b5cf6')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 9),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+            ('TOPPADDING', (0, 0), (-1, 0), 10),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#faf5ff')),
+            ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#374151')),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#c4b5fd')),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 8),
+            ('PADDING', (0, 0), (-1, -1), 6),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]))
+        elements.append(dept_table)
+        elements.append(Spacer(1, 0.3*inch))
+        
+        # MIS Data Section
+        elements.append(PageBreak())
+        elements.append(Paragraph("Consolidated MIS Data", heading_style))
+        elements.append(Spacer(1, 0.15*inch))
+        
+        # Table data with all columns
+        if headers and rows:
+            # Calculate dynamic column widths based on content
+            available_width = 10.5 * inch  # landscape A4 width minus margins
+            col_count = len(headers)
+            col_width = available_width / col_count if col_count > 0 else 1*inch
+            
+            table_data = [headers] + rows
+            
+            # Create table with dynamic width
+            data_table = Table(table_data, colWidths=[col_width] * col_count, repeatRows=1)
+            data_table.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3b82f6')),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, 0), 8),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+                ('TOPPADDING', (0, 0), (-1, 0), 10),
+                ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f9fafb')),
+                ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#1f2937')),
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e5e7eb')),
+                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+                ('FONTSIZE', (0, 1), (-1, -1), 7),
+                ('PADDING', (0, 0), (-1, -1), 4),
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9fafb')]),
+            ]))
+            elements.append(data_table)
+        
+        # Footer
+        elements.append(Spacer(1, 0.3*inch))
+        footer_style = ParagraphStyle(
+            'Footer',
+            parent=styles['Normal'],
+            fontSize=8,
+            textColor=colors.HexColor('#6b7280'),
+            alignment=TA_CENTER
+        )
+        elements.append(Paragraph(f"Generated on {datetime.now(IST).strftime('%d %b %Y at %I:%M %p IST')} | Confidential Report", footer_style))
+        
+        # Build PDF
+        doc.build(elements)
+        buffer.seek(0)
+        PDF_RENDER_SECONDS.labels(report='consolidated').observe(time.perf_counter() - render_started)
+        
+        return send_file(buffer, mimetype='application/pdf', as_attachment=True, download_name=f'Consolidated_MIS_{month_name}_{consolidated.financial_year.FYName}.pdf')
+            
+    except Exception as e:
+        flash(f'Error generating PDF: {str(e)}', 'error')
+        return redirect(url_for('management.management_consolidated_reports'))
+
+@bp.route('/download-upload-pdf/<int:upload_id>')
+@login_required
+def download_upload_pdf(upload_id):
+    user = User.query.get(session['user_id'])
+    upload = MISUpload.query.get_or_404(upload_id)
+    
+    # Check permissions - Admin, Management, and HOD can download
+    if user.role.RoleName not in ['Admin', 'HOD', 'Management', 'Supervisor'] and upload.DepartmentID != user.DepartmentID:
+        flash('Access denied.', 'error')
+        return redirect(url_for('main.reports'))
+    
+    render_started = time.perf_counter()
+    try:
+        import openpyxl
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import A4, landscape
+        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib.units import inch
+        from reportlab.lib.enums import TA_CENTER, TA_RIGHT
+        from io import BytesIO
+        from flask import send_file
+        
+        # Load the Excel file
+        workbook = openpyxl.load_workbook(upload.FilePath)
+        sheet = workbook.active
+        
+        # Prepare data
+        month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+        month_name = month_names[upload.MonthID]
+        
+        # Get supervisor approval info
+        supervisor_approver = User.query.get(upload.SupervisorApprovedBy) if upload.SupervisorApprovedBy else None
+        
+        # Extract headers
+        headers = []
+        for cell in sheet[1]:
+            if cell.value:
+                headers.append(str(cell.value))
+        
+        # Extract rows
+        rows = []
+        for row in sheet.iter_rows(min_row=2, values_only=True):
+            if any(cell is not None for cell in row):
+                rows.append([str(cell) if cell is not None else '' for cell in row])
+        
+        # Create PDF
+        buffer = BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=landscape(A4), rightMargin=30, leftMargin=30, topMargin=50, bottomMargin=30)
+        
+        elements = []
+        styles = getSampleStyleSheet()
+        
+        # Custom styles
+        title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=20,
+            textColor=colors.HexColor('#1f2937'),
+            spaceAfter=6,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold'
+        )
+        
+        subtitle_style = ParagraphStyle(
+            'CustomSubtitle',
+            parent=styles['Normal'],
+            fontSize=12,
+            textColor=colors.HexColor('#6b7280'),
+            spaceAfter=20,
+            alignment=TA_CENTER
+        )
+        
+        heading_style = ParagraphStyle(
+            'CustomHeading',
+            parent=styles['Heading2'],
+            fontSize=14,
+            textColor=colors.HexColor('#1f2937'),
+            spaceAfter=12,
+            spaceBefore=12,
+            fontName='Helvetica-Bold',
+            borderColor=colors.HexColor('#3b82f6'),
+            borderWidth=2,
+            borderPadding=8,
+            backColor=colors.HexColor('#eff6ff')
+        )
+        
+        # Header
+        elements.append(Paragraph("DEPARTMENTAL MIS REPORT", title_style))
+        elements.append(Paragraph(f"{upload.department.DeptName} Department", subtitle_style))
+        elements.append(Spacer(1, 0.2*inch))
+        
+        # Report Information Section
+        elements.append(Paragraph("Report Information", heading_style))
+        elements.append(Spacer(1, 0.1*inch))
+        
+        info_data = [
+            ['MIS Code:', upload.UploadCode, 'Upload ID:', f'#{upload.UploadID}'],
+            ['Month:', month_name, 'Financial Year:', upload.financial_year.FYName],
+            ['Department:', upload.department.DeptName, 'Upload Date:', upload.UploadDate.strftime('%d %b %Y, %I:%M %p')],
+            ['File Check:', upload.FileCheck, 'Status:', upload.Status]
+        ]
+        
+        info_table = Table(info_data, colWidths=[1.5*inch, 2*inch, 1.5*inch, 2*inch])
+        info_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f9fafb')),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#374151')),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('PADDING', (0, 0), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e5e7eb')),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]))
+        elements.append(info_table)
+        elements.append(Spacer(1, 0.2*inch))
+        
+        # Uploader Information Section
+        elements.append(Paragraph("Uploaded By", heading_style))
+        elements.append(Spacer(1, 0.1*inch))
+        
+        uploader_data = [
+            ['Name:', upload.uploader.Username or upload.uploader.EmpID, 'Employee ID:', upload.uploader.EmpID],
+            ['Department:', upload.uploader.department.DeptName, 'Email:', upload.uploader.Email],
+            ['Role:', upload.uploader.role.RoleName, 'Upload Date:', upload.UploadDate.strftime('%d %b %Y, %I:%M %p')]
+        ]
+        
+        uploader_table = Table(uploader_data, colWidths=[1.5*inch, 2*inch, 1.5*inch, 2*inch])
+        uploader_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#dbeafe')),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#1e40af')),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('PADDING', (0, 0), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#93c5fd')),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]))
+        elements.append(uploader_table)
+        elements.append(Spacer(1, 0.2*inch))
+        
+        # Approval Information
+        if upload.SupervisorApproved and supervisor_approver:
+            elements.append(Paragraph("Supervisor Approval", heading_style))
+            elements.append(Spacer(1, 0.1*inch))
+            
+            approval_data = [
+                ['Approved By:', supervisor_approver.Username or supervisor_approver.EmpID, 'Approval Date:', upload.SupervisorApprovedDate.strftime('%d %b %Y, %I:%M %p') if upload.SupervisorApprovedDate else 'N/A'],
+                ['Supervisor Dept:', supervisor_approver.department.DeptName, 'Status:', 'Approved']
+            ]
+            
+            approval_table = Table(approval_data, colWidths=[1.5*inch, 2*inch, 1.5*inch, 2*inch])
+            approval_table.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#d1fae5')),
+                ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#065f46')),
+                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+                ('FONTSIZE', (0, 0), (-1, -1), 9),
+                ('PADDING', (0, 0), (-1, -1), 8),
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#6ee7b7')),
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ]))
+            elements.append(approval_table)
+            elements.append(Spacer(1, 0.2*inch))
+        
+        # Management Approval (if status is Approved)
+        if upload.Status == 'Approved':
+            elements.append(Paragraph("Management Approval", heading_style))
+            elements.append(Spacer(1, 0.1*inch))
+            
+            mgmt_data = [
+                ['Status:', 'Approved by Management', 'Final Status:', upload.Status]
+            ]
+            
+            mgmt_table = Table(mgmt_data, colWidths=[1.5*inch, 2*inch, 1.5*inch, 2*inch])
+            mgmt_table.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#d1fae5')),
+                ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#065f46')),
+                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+                ('FONTSIZE', (0, 0), (-1, -1), 9),
+                ('PADDING', (0, 0), (-1, -1), 8),
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#6ee7b7')),
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ]))
+            elements.append(mgmt_table)
+            elements.append(Spacer(1, 0.2*inch))
+        
+        # Additional Metadata
+        if upload.IsModified or upload.IsCancelled:
+            elements.append(Paragraph("Additional Information", heading_style))
+            elements.append(Spacer(1, 0.1*inch))
+            
+            metadata = []
+            if upload.IsModified:
+                metadata.append(['Modified:', 'Yes - This report has been modified after initial submission'])
+            if upload.IsCancelled:
+                metadata.append(['Cancelled:', 'Yes - This report was cancelled by the uploader'])
+            
+            metadata_table = Table(metadata, colWidths=[1.5*inch, 5.5*inch])
+            metadata_table.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#fef3c7')),
+                ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#78350f')),
+                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+                ('FONTSIZE', (0, 0), (-1, -1), 9),
+                ('PADDING', (0, 0), (-1, -1), 8),
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#fde68a')),
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ]))
+            elements.append(metadata_table)
+            elements.append(Spacer(1, 0.2*inch))
+        
+        # MIS Data Section
+        elements.append(PageBreak())
+        elements.append(Paragraph("Departmental MIS Data", heading_style))
+        elements.append(Spacer(1, 0.15*inch))
+        
+        # Table data with all columns
+        if headers and rows:
+            # Calculate dynamic column widths
+            available_width = 10.5 * inch
+            col_count = len(headers)
+            col_width = available_width / col_count if col_count > 0 else 1*inch
+            
+            table_data = [headers] + rows
+            
+            data_table = Table(table_data, colWidths=[col_width] * col_count, repeatRows=1)
+            data_table.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3b82f6')),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, 0), 8),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+                ('TOPPADDING', (0, 0), (-1, 0), 10),
+                ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f9fafb')),
+                ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#1f2937')),
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e5e7eb')),
+                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+                ('FONTSIZE', (0, 1), (-1, -1), 7),
+                ('PADDING', (0, 0), (-1, -1), 4),
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9fafb')]),
+            ]))
+            elements.append(data_table)
+        
+        # Footer
+        elements.append(Spacer(1, 0.3*inch))
+        footer_style = ParagraphStyle(
+            'Footer',
+            parent=styles['Normal'],
+            fontSize=8,
+            textColor=colors.HexColor('#6b7280'),
+            alignment=TA_CENTER
+        )
+        elements.append(Paragraph(f"Generated on {datetime.now(IST).strftime('%d %b %Y at %I:%M %p IST')} | MIS Code: {upload.UploadCode} | Confidential Report", footer_style))
+        
+        # Build PDF
+        doc.build(elements)
+        buffer.seek(0)
+        PDF_RENDER_SECONDS.labels(report='individual').observe(time.perf_counter() - render_started)
+        
+        return send_file(buffer, mimetype='application/pdf', as_attachment=True, download_name=f'MIS_{upload.UploadCode}_{upload.department.DeptName}_{month_name}_{upload.financial_year.FYName}.pdf')
+            
+    except Exception as e:
+        flash(f'Error generating PDF: {str(e)}', 'error')
+        return redirect(url_for('main.reports'))
@@ -0,0 +1,371 @@
+"""
+Supervisor review of HOD uploads and preparation of the consolidated MIS
+sent on to Management.
+"""
+
+from datetime import datetime, date
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash
+from werkzeug.utils import secure_filename
+from sqlalchemy.orm import joinedload
+from email_service import email_service
+from extensions import db
+from models import ConsolidatedMIS, IST, MISUpload, User, latest_department_statuses
+from auth import supervisor_required
+from services import (
+    StreamedRows, bulk_review_uploads, bulk_selection_error, create_notification, filename_for_extension,
+    flash_bulk_review, get_active_fy, get_departments, get_financial_year, get_financial_years, get_role,
+    stage_validated_workbook, stream_page
+)
+
+bp = Blueprint('supervisor', __name__)
+
+@bp.route('/approval-queue')
+@supervisor_required
+def approval_queue():
+    user = User.query.get(session['user_id'])
+    if not user or not user.IsActive:
+        session.clear()
+        flash('Your session has expired. Please log in again.', 'error')
+        return redirect(url_for('main.login'))
+    
+    # Supervisor role - get all uploads pending supervisor approval
+    # Excludes cancelled uploads (when HOD deletes, upload is removed from approval queue)
+    pending_uploads = MISUpload.query.filter_by(SupervisorApproved=False, Status='In Review', IsCancelled=False).order_by(MISUpload.UploadDate.desc()).all()
+    
+    return render_template('approval_queue.html', 
+                         current_user=user,
+                         pending_uploads=pending_uploads)
+
+@bp.route('/supervisor-uploads')
+@supervisor_required
+def supervisor_uploads():
+    user = User.query.get(session['user_id'])
+    if not user or not user.IsActive:
+        session.clear()
+        flash('Your session has expired. Please log in again.', 'error')
+        return redirect(url_for('main.login'))
+    
+    # Supervisor can now view all pending uploads regardless of date
+    pending_uploads = MISUpload.query.filter_by(SupervisorApproved=False, Status='In Review', IsCancelled=False).order_by(MISUpload.UploadDate.desc()).all()
+    
+    # Get supervisor approved and rejected uploads for history table
+    # Match the same filtering logic as supervisor_history route for consistency
+    approved_by_supervisor = MISUpload.query.filter_by(SupervisorApproved=True).filter(MISUpload.Status.in_(['In Review', 'Approved'])).order_by(MISUpload.SupervisorApprovedDate.desc()).all()
+    rejected_by_supervisor = MISUpload.query.filter_by(SupervisorApproved=False, Status='Rejected').order_by(MISUpload.UploadDate.desc()).all()
+    
+    return render_template('supervisor_uploads.html', current_user=user, pending_uploads=pending_uploads, approved_by_supervisor=approved_by_supervisor, rejected_by_supervisor=rejected_by_supervisor)
+
+@bp.route('/supervisor-history')
+@supervisor_required
+def supervisor_history():
+    user = User.query.get(session['user_id'])
+    if not user or not user.IsActive:
+        session.clear()
+        flash('Your session has expired. Please log in again.', 'error')
+        return redirect(url_for('main.login'))
+    
+    # Get approved and rejected uploads by supervisor
+    approved_uploads = StreamedRows(MISUpload.query.options(joinedload(MISUpload.uploader)).filter_by(SupervisorApproved=True).filter(MISUpload.Status.in_(['In Review', 'Approved'])).order_by(MISUpload.SupervisorApprovedDate.desc()))
+    rejected_uploads = StreamedRows(MISUpload.query.options(joinedload(MISUpload.uploader)).filter_by(SupervisorApproved=False, Status='Rejected').order_by(MISUpload.UploadDate.desc()))
+    
+    # Get consolidated MIS uploads from all supervisors (all departments)
+    approved_consolidated = ConsolidatedMIS.query.filter_by(Status='Approved').order_by(ConsolidatedMIS.ApprovedDate.desc()).all()
+    rejected_consolidated = ConsolidatedMIS.query.filter_by(Status='Rejected').order_by(ConsolidatedMIS.CreatedDate.desc()).all()
+    pending_consolidated = ConsolidatedMIS.query.filter_by(Status='Pending Review').order_by(ConsolidatedMIS.CreatedDate.desc()).all()
+    
+    return stream_page('supervisor_history.html', current_user=user, approved_uploads=approved_uploads, rejected_uploads=rejected_uploads, 
+                         approved_consolidated=approved_consolidated, rejected_consolidated=rejected_consolidated, pending_consolidated=pending_consolidated)
+
+@bp.route('/supervisor-mis-tracking')
+@supervisor_required
+def supervisor_mis_tracking():
+    user = User.query.get(session['user_id'])
+    if not user or not user.IsActive:
+        session.clear()
+        flash('Your session has expired. Please log in again.', 'error')
+        return redirect(url_for('main.login'))
+    
+    # Get filter parameters
+    current_month = date.today().month
+    active_fy = get_active_fy()
+    
+    selected_month = request.args.get('month_id', str(current_month))
+    selected_fy = request.args.get('fy_id', str(active_fy.FYID) if active_fy else '1')
+    
+    # Get all active departments
+    all_departments = get_departments(active_only=True, by_name=True)
+    
+    # Build department status list
+    department_statuses = []
+    submitted_count = 0
+    pending_review_count = 0
+    not_submitted_count = 0
+    
+    latest_statuses = latest_department_statuses(int(selected_fy), int(selected_month))
+    hod_role = get_role('HOD')
+    for dept in all_departments:
+        # Get HOD for this department
+        hod = User.query.filter_by(DepartmentID=dept.DeptID, RoleID=hod_role.RoleID, IsActive=True).first() if hod_role else None
+        
+        # Get MIS upload for this department, month, and FY (the rollup says whether there is one)
+        upload = MISUpload.query.filter_by(
+            DepartmentID=dept.DeptID,
+            MonthID=int(selected_month),
+            FYID=int(selected_fy),
+            IsCancelled=False
+        ).order_by(MISUpload.UploadDate.desc()).first() if dept.DeptID in latest_statuses else None
+        
+        # Count statuses from the rollup
+        if dept.DeptID in latest_statuses:
+            status, supervisor_approved = latest_statuses[dept.DeptID]
+            submitted_count += 1
+            if not supervisor_approved and status == 'In Review':
+                pending_review_count += 1
+        else:
+            not_submitted_count += 1
+        
+        department_statuses.append({
+            'department_name': dept.DeptName,
+            'department_id': dept.DeptID,
+            'hod_name': hod.Username if hod else None,
+            'hod_emp_id': hod.EmpID if hod else None,
+            'upload': upload
+        })
+    
+    financial_years = get_financial_years()
+    selected_fy_obj = get_financial_year(selected_fy) if selected_fy else active_fy
+    
+    return render_template('supervisor_mis_tracking.html',
+                         current_user=user,
+                         department_statuses=department_statuses,
+                         total_departments=len(all_departments),
+                         submitted_count=submitted_count,
+                         pending_review_count=pending_review_count,
+                         not_submitted_count=not_submitted_count,
+                         financial_years=financial_years,
+                         selected_month=selected_month,
+                         selected_fy=selected_fy,
+                         selected_fy_name=selected_fy_obj.FYName if selected_fy_obj else '')
+
+@bp.route('/view-supervisor-consolidated-mis/<int:consolidated_id>')
+@supervisor_required
+def view_supervisor_consolidated_mis(consolidated_id):
+    user = User.query.get(session['user_id'])
+    if not user or not user.IsActive:
+        session.clear()
+        flash('Your session has expired. Please log in again.', 'error')
+        return redirect(url_for('main.login'))
+    
+    consolidated = ConsolidatedMIS.query.get_or_404(consolidated_id)
+    
+    # Ensure supervisor can only view their own consolidated MIS
+    if consolidated.SupervisorID != user.UserID:
+        flash('Access denied.', 'error')
+        return redirect(url_for('supervisor.supervisor_history'))
+    
+    hod_uploads = MISUpload.query.filter(MISUpload.UploadID.in_([int(x) for x in consolidated.UploadedHODMISIDs.split(',')])).all() if consolidated.UploadedHODMISIDs else []
+    
+    # Get approver info
+    approver = User.query.get(consolidated.ApprovedBy) if consolidated.ApprovedBy else None
+    
+    return render_template('view_supervisor_consolidated_mis.html', current_user=user, consolidated=consolidated, hod_uploads=hod_uploads, approver=approver)
+
+@bp.route('/view-hod-upload/<int:upload_id>')
+@supervisor_required
+def view_hod_upload(upload_id):
+    user = User.query.get(session['user_id'])
+    if not user or not user.IsActive:
+        session.clear()
+        flash('Your session has expired. Please log in again.', 'error')
+        return redirect(url_for('main.login'))
+    
+    upload = MISUpload.query.get_or_404(upload_id)
+    return render_template('view_hod_upload.html', current_user=user, upload=upload)
+
+@bp.route('/approve-hod-upload/<int:upload_id>', methods=['POST'])
+@supervisor_required
+def approve_hod_upload(upload_id):
+    user = User.query.get(session['user_id'])
+    
+    # Supervisor can now approve uploads regardless of date
+    upload = MISUpload.query.get_or_404(upload_id)
+    if upload.FileCheck != 'Validated':
+        flash(f'{upload.UploadCode} cannot be approved until its file has been validated (File Check: {upload.FileCheck}).', 'error')
+        return redirect(url_for('supervisor.supervisor_uploads'))
+    
+    upload.SupervisorApproved = True
+    upload.SupervisorApprovedBy = user.UserID
+    upload.SupervisorApprovedDate = datetime.now(IST)
+    db.session.commit()
+    
+    # Create in-app notification for HOD
+    month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+    month_name = month_names[upload.MonthID]
+    create_notification(upload.UploadedBy, 'MIS Approved by Supervisor', f'Your MIS upload {upload.UploadCode} for {month_name} has been approved by the Supervisor and is pending Management review.', 'approval', upload_id=upload_id)
+    
+    if email_service.is_configured():
+        uploader = upload.uploader
+        subject = f"MIS Upload Approved by Supervisor - {upload.department.DeptName} - {month_name}"
+        html_content = f"""<!DOCTYPE html><html><head><style>body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }} .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }} .header {{ background-color: #3b82f6; color: white; padding: 20px; border-radius: 5px 5px 0 0; }} .content {{ background-color: #f9fafb; padding: 30px; border: 1px solid #e5e7eb; }} .success-box {{ background-color: #dbeafe; border-left: 4px solid #3b82f6; padding: 15px; margin: 20px 0; }}</style></head><body><div class="container"><div class="header"><h2>MIS Upload Approved - Supervisor Review</h2></div><div class="content"><p>Dear {uploader.Username},</p><div class="success-box"><strong>Your MIS upload has been approved by the Supervisor!</strong><br>It is now pending Management's final review.</div><p><strong>Details:</strong> {upload.department.DeptName} | {month_name} {upload.financial_year.FYName} | Code: {upload.UploadCode}</p><p>You will be notified once Management completes their review.</p><p>Best regards,<br><strong>MIS System Team</strong></p></div></body></html>"""
+        email_service.send_email(uploader.Email, subject, html_content)
+    
+    flash('HOD MIS approved successfully!', 'success')
+    return redirect(url_for('supervisor.supervisor_uploads'))
+
+@bp.route('/reject-hod-upload/<int:upload_id>', methods=['POST'])
+@supervisor_required
+def reject_hod_upload(upload_id):
+    user = User.query.get(session['user_id'])
+    upload = MISUpload.query.get_or_404(upload_id)
+    upload.Status = 'Rejected'
+    db.session.commit()
+    
+    # Create in-app notification for HOD
+    month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+    month_name = month_names[upload.MonthID]
+    create_notification(upload.UploadedBy, 'MIS Rejected by Supervisor', f'Your MIS upload {upload.UploadCode} for {month_name} has been rejected by the Supervisor. Please review and resubmit.', 'rejection', upload_id=upload_id)
+    
+    if email_service.is_configured():
+        uploader = upload.uploader
+        subject = f"MIS Upload Rejected - {upload.department.DeptName} - {month_name}"
+        html_content = f"""<!DOCTYPE html><html><body style="font-family: Arial;"><div style="max-width: 600px; margin: 0 auto; padding: 20px;"><div style="background-color: #ef4444; color: white; padding: 20px; border-radius: 5px 5px 0 0;"><h2>MIS Upload Rejected</h2></div><div style="background-color: white; padding: 30px;"><p>Dear {uploader.Username},</p><p>Your MIS upload for {upload.department.DeptName} ({month_name}) has been rejected by the Supervisor.</p><p>Please review and resubmit your MIS upload.</p><p>Best regards,<br><strong>MIS System Team</strong></p></div></div></body></html>"""
+        email_service.send_email(uploader.Email, subject, html_content)
+    
+    flash('HOD MIS rejected. Notification sent to uploader.', 'warning')
+    return redirect(url_for('supervisor.supervisor_uploads'))
+
+def supervisor_bulk_redirect():
+    """Back to whichever Supervisor queue the bulk form was submitted from"""
+    page = request.form.get('next')
+    return redirect(url_for(page if page in ('supervisor.approval_queue', 'supervisor.supervisor_uploads') else 'supervisor.supervisor_uploads'))
+
+@bp.route('/approve-hod-uploads', methods=['POST'])
+@supervisor_required
+def approve_hod_uploads():
+    user = User.query.get(session['user_id'])
+    error = bulk_selection_error()
+    if error:
+        flash(error, 'error')
+        return supervisor_bulk_redirect()
+    
+    result = bulk_review_uploads(
+        (MISUpload.SupervisorApproved == False, MISUpload.Status == 'In Review',
+         MISUpload.IsCancelled == False, MISUpload.FileCheck == 'Validated'),
+        {MISUpload.SupervisorApproved: True, MISUpload.SupervisorApprovedBy: user.UserID,
+         MISUpload.SupervisorApprovedDate: datetime.now(IST)},
+        ('MIS Approved by Supervisor', 'Your MIS upload {code} for {month} has been approved by the Supervisor and is pending Management review.', 'approval'),
+        ('Approved', 'Supervisor', '#3b82f6'))
+    flash_bulk_review(result, 'approved')
+    return supervisor_bulk_redirect()
+
+@bp.route('/reject-hod-uploads', methods=['POST'])
+@supervisor_required
+def reject_hod_uploads():
+    error = bulk_selection_error()
+    if error:
+        flash(error, 'error')
+        return supervisor_bulk_redirect()
+    
+    result = bulk_review_uploads(
+        (MISUpload.SupervisorApproved == False, MISUpload.Status == 'In Review', MISUpload.IsCancelled == False),
+        {MISUpload.Status: 'Rejected'},
+        ('MIS Rejected by Supervisor', 'Your MIS upload {code} for {month} has been rejected by the Supervisor. Please review and resubmit.', 'rejection'),
+        ('Rejected', 'Supervisor', '#ef4444'))
+    flash_bulk_review(result, 'rejected')
+    return supervisor_bulk_redirect()
+
+@bp.route('/prepare-consolidated-mis')
+@supervisor_required
+def prepare_consolidated_mis():
+    user = User.query.get(session['user_id'])
+    if not user or not user.IsActive:
+        session.clear()
+        flash('Your session has expired. Please log in again.', 'error')
+        return redirect(url_for('main.login'))
+    
+    # Supervisor can now prepare consolidated MIS anytime (no date restriction)
+    # Show all supervisor-approved uploads (including those uploaded by Admin)
+    all_approved_uploads = MISUpload.query.filter_by(SupervisorApproved=True, IsCancelled=False).filter(MISUpload.Status.in_(['In Review', 'Approved'])).order_by(MISUpload.UploadDate.desc()).all()
+    
+    # Get all consolidated MIS records to check which uploads are already included
+    all_consolidated = ConsolidatedMIS.query.all()
+    already_included_upload_ids = set()
+    
+    for consolidated in all_consolidated:
+        if consolidated.UploadedHODMISIDs:
+            upload_ids = [int(x) for x in consolidated.UploadedHODMISIDs.split(',')]
+            already_included_upload_ids.update(upload_ids)
+    
+    # Filter out uploads that are already included in any consolidated MIS
+    approved_uploads = [upload for upload in all_approved_uploads if upload.UploadID not in already_included_upload_ids]
+    
+    # Get all uploads with management approval/rejection status
+    in_review_uploads = MISUpload.query.filter_by(Status='In Review', IsCancelled=False).order_by(MISUpload.UploadDate.desc()).all()
+    approved_by_management = MISUpload.query.filter_by(Status='Approved', IsCancelled=False).order_by(MISUpload.UploadDate.desc()).all()
+    rejected_by_management = MISUpload.query.filter_by(Status='Rejected', IsCancelled=False).order_by(MISUpload.UploadDate.desc()).all()
+    
+    return render_template('prepare_consolidated_mis.html', current_user=user, approved_uploads=approved_uploads, in_review_uploads=in_review_uploads, approved_by_management=approved_by_management, rejected_by_management=rejected_by_management)
+
+@bp.route('/upload-consolidated-mis', methods=['POST'])
+@supervisor_required
+def upload_consolidated_mis():
+    user = User.query.get(session['user_id'])
+    
+    # Supervisor can now upload consolidated MIS anytime (no date restriction)
+    if 'consolidated_file' not in request.files:
+        flash('No file selected.', 'error')
+        return redirect(url_for('supervisor.prepare_consolidated_mis'))
+    
+    file = request.files['consolidated_file']
+    if not file or not file.filename:
+        flash('No file selected.', 'error')
+        return redirect(url_for('supervisor.prepare_consolidated_mis'))
+    
+    if not (file.filename.endswith('.xls') or file.filename.endswith('.xlsx')):
+        flash('Only .xls or .xlsx files are allowed.', 'error')
+        return redirect(url_for('supervisor.prepare_consolidated_mis'))
+    
+    selected_uploads = request.form.getlist('selected_uploads')
+    if not selected_uploads:
+        flash('Please select at least one HOD MIS upload.', 'error')
+        return redirect(url_for('supervisor.prepare_consolidated_mis'))
+    
+    active_fy = get_active_fy()
+    current_month = date.today().month
+    
+    # Check for duplicate consolidated MIS for the same period
+    existing_consolidated = ConsolidatedMIS.query.filter_by(
+        FYID=active_fy.FYID if active_fy else 1,
+        MonthID=current_month
+    ).first()
+    
+    if existing_consolidated:
+        month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+        flash(f'Consolidated MIS already exists for {month_names[current_month]} {active_fy.FYName if active_fy else ""}. Cannot create duplicate consolidated MIS for the same period.', 'error')
+        return redirect(url_for('supervisor.prepare_consolidated_mis'))
+    
+    filename = secure_filename(f"ConsolidatedMIS_{current_month:02d}_{active_fy.FYName if active_fy else 'General'}_{file.filename}")
+    
+    staged, is_valid, validation_message = stage_validated_workbook(file)
+    if not is_valid:
+        flash(f'Validation Error: {validation_message}', 'error')
+        return redirect(url_for('supervisor.prepare_consolidated_mis'))
+    
+    consolidated = ConsolidatedMIS(SupervisorID=user.UserID, FYID=active_fy.FYID if active_fy else 1, MonthID=current_month, UploadedHODMISIDs=','.join(selected_uploads), ConsolidatedFilePath=staged.commit(), FileName=filename_for_extension(filename, staged.extension), ContentHash=staged.sha256, OriginalFilePath=staged.original_path, Status='Pending Review')
+    db.session.add(consolidated)
+    db.session.commit()
+    
+    # Send email notifications to all Management users
+    month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+    month_name = month_names[current_month]
+    if email_service.is_configured():
+        management_role = get_role('Management')
+        if management_role:
+            management_users = User.query.filter_by(RoleID=management_role.RoleID, IsActive=True).all()
+            for mgmt_user in management_users:
+                subject = f"New Consolidated MIS for Review - {month_name}"
+                html_content = f"""<!DOCTYPE html><html><body style="font-family: Arial;"><div style="max-width: 600px; margin: 0 auto; padding: 20px;"><div style="background-color: #f97316; color: white; padding: 20px; border-radius: 5px 5px 0 0;"><h2>New Consolidated MIS Submitted</h2></div><div style="background-color: white; padding: 30px;"><p>Dear {mgmt_user.Username},</p><p>A new consolidated MIS for {month_name} has been submitted by {user.Username} from {user.department.DeptName} department.</p><p>Please review and approve/reject as appropriate.</p><p>Best regards,<br><strong>MIS System Team</strong></p></div></div></body></html>"""
+                email_service.send_email(mgmt_user.Email, subject, html_content)
+    
+    flash('Consolidated MIS uploaded successfully! Management will now review it.', 'success')
+    return redirect(url_for('supervisor.prepare_consolidated_mis'))
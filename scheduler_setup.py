@@ -25,41 +25,8 @@ def setup_scheduler(app, db):
     Returns:
         scheduler: BackgroundScheduler instance
     """
-    from app import User, Role
-    from email_service import email_service
-    
-    def send_monthly_notifications():
-        """Send MIS upload window notifications on the 1st of each month"""
-        try:
-            with app.app_context():
-                hod_role = Role.query.filter_by(RoleName='HOD').first()
-                
-                if not hod_role:
-                    logger.error("HOD role not found in database")
-                    return
-                
-                hod_users = User.query.filter_by(RoleID=hod_role.RoleID, IsActive=True).all()
-                
-                if not hod_users:
-                    logger.warning("No active HOD users found to notify")
-                    return
-                
-                if not email_service.is_configured():
-                    logger.error("Email service not configured. Cannot send notifications.")
-                    return
-                
-                success_count, total_count, messages = email_service.send_upload_window_notification(hod_users)
-                
-                logger.info(f"Monthly notification sent: {success_count}/{total_count} successful")
-                
-                for msg in messages:
-                    if 'error' in msg.lower() or 'failed' in msg.lower():
-                        logger.error(f"Notification error: {msg}")
-                    else:
-                        logger.info(f"Notification: {msg}")
-        
-        except Exception as e:
-            logger.error(f"Error in monthly notification job: {str(e)}")
+    # Emails only HODs whose department has not uploaded yet, once per month
+    from app import send_monthly_notifications
     
     scheduler = BackgroundScheduler()
     
@@ -67,6 +34,7 @@ def setup_scheduler(app, db):
     scheduler.add_job(
         send_monthly_notifications,
         trigger=CronTrigger(day=1, hour=8, minute=0),
+        args=[app],
         id='monthly_mis_notification',
         name='Send monthly MIS upload window notifications',
         replace_existing=True
@@ -82,9 +50,9 @@ def setup_scheduler(app, db):
 def test_notification_manually(app):
     """
     Test the notification system manually
-    Usage: python -c "from scheduler_setup import test_notification_manually; from app import app; test_notification_manually(app)"
+    Usage: python -c "from scheduler_setup import test_notification_manually; from app import create_app; test_notification_manually(create_app())"
     """
-    from app import User, Role
+    from models import User, Role
     from email_service import email_service
     
     with app.app_context():
@@ -114,7 +82,8 @@ INTEGRATION INSTRUCTIONS:
    
    # Inside if __name__ == '__main__':
    if __name__ == '__main__':
-       init_db()
+       app = create_app()
+       init_db(app)
        scheduler = setup_scheduler(app, db)
        try:
            app.run(host='0.0.0.0', port=5000, debug=True)
@@ -131,7 +100,7 @@ INTEGRATION INSTRUCTIONS:
    - SMTP_FROM_NAME (optional)
 
 4. Test manually:
-   python -c "from scheduler_setup import test_notification_manually; from app import app; test_notification_manually(app)"
+   python -c "from scheduler_setup import test_notification_manually; from app import create_app; test_notification_manually(create_app())"
 
 ALTERNATIVE: Use external cron services
 If you prefer not to use in-app scheduling, you can use external services:
@@ -0,0 +1,258 @@
+"""
+Full-text index over MIS uploads for the report search boxes.
+
+One row per upload holds its MIS code, department name, uploader name and
+the text cells of its workbook. On SQLite it is an FTS5 table with prefix
+indexes, ranked with bm25(); on PostgreSQL a plain table with a weighted
+tsvector column behind a GIN index, ranked with ts_rank(). Other databases
+(or a SQLite build without FTS5) get no index: search() returns None and
+callers fall back to matching the MIS code.
+
+Every word typed is a prefix and all of them must match, so "fin apr"
+finds the Finance uploads whose workbooks mention April, and the boxes can
+search as the user types.
+
+The metadata columns are written in the same transaction as the upload row
+(see the session hooks in services.py); workbook text is extracted afterwards on
+a background thread, since it means opening the workbook.
+"""
+
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import bindparam, column, func, literal_column, select, table, text
+
+from config import SEARCH_TEXT_MAX_CHARS, SEARCH_MAX_TERMS
+
+logger = logging.getLogger(__name__)
+
+# Letters and digits only; both engines split words on underscores and punctuation
+TERM = re.compile(r'[^\W_]+')
+
+# Code and department/uploader name hits outrank a cell somewhere in the workbook
+BM25_WEIGHTS = '10.0, 4.0, 4.0, 1.0'
+
+# Name columns as they are read from the application tables
+METADATA_SQL = """
+    SELECT u."UploadID", COALESCE(u."UploadCode", ''), COALESCE(d."DeptName", ''), COALESCE(us."Username", '')
+    FROM mis_uploads u
+    LEFT JOIN departments d ON d."DeptID" = u."DepartmentID"
+    LEFT JOIN users us ON us."UserID" = u."UploadedBy"
+"""
+
+
+def extract_workbook_text(file_path, max_chars=SEARCH_TEXT_MAX_CHARS):
+    """
+    Distinct text cells of a workbook (headers, labels, remarks), up to max_chars
+
+    Numbers and dates are left out; they are not what anyone types into a search box.
+    """
+    import openpyxl
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        seen = set()
+        parts = []
+        size = 0
+        for sheet in workbook.worksheets:
+            parts.append(sheet.title)
+            for row in sheet.iter_rows(values_only=True):
+                for value in row:
+                    if not isinstance(value, str):
+                        continue
+                    value = value.strip()
+                    if not value or value in seen:
+                        continue
+                    seen.add(value)
+                    parts.append(value)
+                    size += len(value) + 1
+                    if size >= max_chars:
+                        return ' '.join(parts)[:max_chars]
+        return ' '.join(parts)[:max_chars]
+    finally:
+        workbook.close()
+
+
+class SearchIndex:
+    def __init__(self):
+        self._ready = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def ensure(self, connection):
+        """
+        Create the index table if this database supports one, and refill its
+        metadata if it is new or has drifted from mis_uploads (e.g. a database
+        restored without it)
+
+        Returns:
+            bool: True if the index was refilled and its workbook text needs extracting
+        """
+        self._ready.pop(connection.engine.url, None)
+        if not self._create(connection) and not self.ready(connection):
+            return False
+        indexed = connection.execute(text("SELECT COUNT(*) FROM upload_search")).scalar()
+        uploads = connection.execute(text("SELECT COUNT(*) FROM mis_uploads")).scalar()
+        if indexed == uploads and connection.execute(text(
+                f"SELECT COUNT(*) FROM upload_search s LEFT JOIN mis_uploads u ON u.\"UploadID\" = s.{self._key(connection)} "
+                f"WHERE u.\"UploadID\" IS NULL")).scalar() == 0:
+            return False
+        self.rebuild(connection)
+        return True
+
+    def _create(self, connection):
+        """Create the index table; True if it was created just now"""
+        dialect = connection.dialect.name
+        try:
+            if dialect == 'sqlite':
+                if connection.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'upload_search'")).first():
+                    return False
+                connection.execute(text(
+                    "CREATE VIRTUAL TABLE upload_search USING fts5("
+                    "code, department, uploader, content, "
+                    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')"))
+                self._ready[connection.engine.url] = True
+                return True
+            if dialect == 'postgresql':
+                if connection.execute(text("SELECT to_regclass('upload_search')")).scalar():
+                    return False
+                connection.execute(text("""
+                    CREATE TABLE upload_search (
+                        upload_id INTEGER PRIMARY KEY,
+                        code TEXT NOT NULL DEFAULT '',
+                        department TEXT NOT NULL DEFAULT '',
+                        uploader TEXT NOT NULL DEFAULT '',
+                        content TEXT NOT NULL DEFAULT '',
+                        document tsvector GENERATED ALWAYS AS (
+                            setweight(to_tsvector('simple', code), 'A') ||
+                            setweight(to_tsvector('simple', department || ' ' || uploader), 'B') ||
+                            setweight(to_tsvector('simple', content), 'D')
+                        ) STORED
+                    )"""))
+                connection.execute(text("CREATE INDEX ix_upload_search_document ON upload_search USING GIN (document)"))
+                self._ready[connection.engine.url] = True
+                return True
+        except Exception as e:
+            logger.warning(f"Upload search index not available ({e}); searches match MIS codes only")
+        return False
+
+    def ready(self, connection):
+        """Whether this database has the index table (checked once per process)"""
+        key = connection.engine.url
+        if key not in self._ready:
+            dialect = connection.dialect.name
+            if dialect == 'sqlite':
+                found = connection.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'upload_search'")).first() is not None
+            elif dialect == 'postgresql':
+                found = connection.execute(text("SELECT to_regclass('upload_search')")).scalar() is not None
+            else:
+                found = False
+            with self._lock:
+                self._ready[key] = found
+        return self._ready[key]
+
+    def _key(self, connection):
+        return 'rowid' if connection.dialect.name == 'sqlite' else 'upload_id'
+
+    def refresh(self, connection, upload_ids):
+        """Rewrite code, department and uploader for these uploads, keeping any workbook text"""
+        if not upload_ids or not self.ready(connection):
+            return
+        key = self._key(connection)
+        rows = connection.execute(text(METADATA_SQL + ' WHERE u."UploadID" IN :ids')
+                                  .bindparams(bindparam('ids', expanding=True)), {'ids': list(upload_ids)}).all()
+        for upload_id, code, department, uploader in rows:
+            params = {'id': upload_id, 'code': code, 'department': department, 'uploader': uploader}
+            updated = connection.execute(text(
+                f"UPDATE upload_search SET code = :code, department = :department, uploader = :uploader WHERE {key} = :id"), params)
+            if updated.rowcount == 0:
+                connection.execute(text(
+                    f"INSERT INTO upload_search ({key}, code, department, uploader, content) "
+                    f"VALUES (:id, :code, :department, :uploader, '')"), params)
+
+    def remove(self, connection, upload_ids):
+        if not upload_ids or not self.ready(connection):
+            return
+        connection.execute(text(f"DELETE FROM upload_search WHERE {self._key(connection)} IN :ids")
+                           .bindparams(bindparam('ids', expanding=True)), {'ids': list(upload_ids)})
+
+    def set_content(self, connection, upload_id, content):
+        if not self.ready(connection):
+            return
+        connection.execute(text(f"UPDATE upload_search SET content = :content WHERE {self._key(connection)} = :id"),
+                           {'id': upload_id, 'content': content})
+
+    def shared_content(self, connection, upload_id, content_hash):
+        """Workbook text already extracted for another upload with identical content, or None"""
+        if not content_hash or not self.ready(connection):
+            return None
+        key = self._key(connection)
+        return connection.execute(text(
+            f"""SELECT s.content FROM upload_search s JOIN mis_uploads u ON u."UploadID" = s.{key}
+                WHERE u."ContentHash" = :hash AND u."UploadID" != :id AND s.content != '' LIMIT 1"""),
+            {'hash': content_hash, 'id': upload_id}).scalar()
+
+    def rebuild(self, connection):
+        """Refill the metadata columns for every upload (workbook text is extracted separately)"""
+        if not self.ready(connection):
+            return 0
+        key = self._key(connection)
+        connection.execute(text("DELETE FROM upload_search"))
+        result = connection.execute(text(
+            f"INSERT INTO upload_search ({key}, code, department, uploader, content) "
+            f"SELECT ids.*, '' FROM ({METADATA_SQL}) ids"))
+        return result.rowcount
+
+    def search(self, connection, query, limit, within=None):
+        """
+        Upload IDs matching every word of query as a prefix, best match first
+
+        Args:
+            within: optional SELECT of the UploadIDs the caller may return (its
+                    department, FY, cancelled... filters); the limit is applied
+                    after it, so a filtered search still gets its best matches
+
+        Returns:
+            list of UploadIDs, or None if there is no index to search
+        """
+        if not self.ready(connection):
+            return None
+        terms = [term.lower() for term in TERM.findall(query)][:SEARCH_MAX_TERMS]
+        if not terms:
+            return []
+        index = table('upload_search', column(self._key(connection)))
+        key = filter_key = index.c[self._key(connection)]
+        if connection.dialect.name == 'sqlite':
+            match = ' '.join(f'"{term}"*' for term in terms)
+            statement = (select(key).select_from(index)
+                         .where(text('upload_search MATCH :match').bindparams(match=match))
+                         .order_by(text(f'bm25(upload_search, {BM25_WEIGHTS})')))
+            # Unary + keeps the IN out of FTS5, which would otherwise re-run the MATCH once per allowed rowid
+            filter_key = literal_column('+rowid')
+        else:
+            tsquery = func.to_tsquery('simple', ' & '.join(f'{term}:*' for term in terms))
+            document = literal_column('document')
+            statement = (select(key).select_from(index)
+                         .where(document.op('@@')(tsquery))
+                         .order_by(func.ts_rank(document, tsquery).desc()))
+        if within is not None:
+            statement = statement.where(filter_key.in_(within))
+        return list(connection.execute(statement.limit(limit)).scalars())
+
+    def submit(self, job, *args):
+        """Run job(*args) on the single indexing thread"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='mis-search-index')
+        return self._executor.submit(self._run, job, *args)
+
+    def _run(self, job, *args):
+        try:
+            job(*args)
+        except Exception:
+            logger.exception(f"Search index job {getattr(job, '__name__', job)}{args} failed")
+
+
+# Global search index instance
+search_index = SearchIndex()
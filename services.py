@@ -0,0 +1,865 @@
+"""
+Helpers shared by the blueprints: cached reference data, notifications,
+bulk review, workbook validation and storage, streamed pages, file
+downloads, search, the year heatmap and turnaround reports, and the upload
+validation jobs.
+
+Background jobs (validation, search indexing) run outside any request, so
+callers pass them the app and they push their own app context.
+"""
+
+import os
+import time
+from datetime import datetime, date, timedelta
+from flask import stream_template, stream_with_context, get_flashed_messages, request, session, flash, g, current_app
+from werkzeug.utils import secure_filename
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
+from email_service import email_service
+from xls_converter import convert_xls_to_xlsx
+import sla_analytics
+from search_index import search_index, extract_workbook_text
+from metrics import REQUEST_LATENCY, REQUESTS_IN_FLIGHT, WORKBOOK_PARSE_SECONDS
+import logging
+from config import (
+    UPLOAD_WINDOW_START_DAY, UPLOAD_WINDOW_END_DAY, CHUNKED_UPLOAD_EXPIRY_HOURS, BLOB_DELETE_GRACE_SECONDS,
+    DOWNLOAD_CACHE_MAX_AGE, DOWNLOAD_CACHE_PRIVATE, DOWNLOAD_OFFLOAD_MODE, DOWNLOAD_OFFLOAD_LOCATION,
+    STREAM_BATCH_SIZE, STREAM_CHUNK_SIZE, BULK_REVIEW_MAX_UPLOADS, YEAR_HEATMAP_CACHE_SECONDS, SLA_CACHE_SECONDS,
+    SEARCH_RESULT_LIMIT, VALIDATION_STALE_MINUTES
+)
+from extensions import content_store, db, reference_cache, sla_reports, sql_profiler, validation_pipeline, year_heatmaps
+from models import (
+    ChunkedUpload, Company, ConsolidatedMIS, Department, FinancialYear, IST, MISCodeSequence, MISUpload,
+    Notification, Role, Template, User, latest_upload_statuses, refresh_status_rollups, status_rollup_version
+)
+
+def record_request_latency(endpoint, method, started):
+    REQUESTS_IN_FLIGHT.dec()
+    REQUEST_LATENCY.labels(endpoint=endpoint or '(unmatched)', method=method).observe(time.perf_counter() - started)
+
+# Upload search index upkeep: code, department and uploader are written in the
+# same transaction as the change; workbook text is extracted after the commit
+@event.listens_for(Session, 'after_flush')
+def update_search_index(session, flush_context):
+    refreshed, removed, renamed_departments, renamed_users = set(), set(), set(), set()
+    text_pending = session.info.setdefault('search_text_pending', set())
+    for obj in session.new:
+        if isinstance(obj, MISUpload):
+            refreshed.add(obj.UploadID)
+            text_pending.add(obj.UploadID)
+    for obj in session.dirty:
+        state = db.inspect(obj)
+        if isinstance(obj, MISUpload):
+            if any(state.attrs[name].history.has_changes() for name in ('UploadCode', 'DepartmentID', 'UploadedBy')):
+                refreshed.add(obj.UploadID)
+            if state.attrs.FilePath.history.has_changes():
+                text_pending.add(obj.UploadID)
+        elif isinstance(obj, Department) and state.attrs.DeptName.history.has_changes():
+            renamed_departments.add(obj.DeptID)
+        elif isinstance(obj, User) and state.attrs.Username.history.has_changes():
+            renamed_users.add(obj.UserID)
+    for obj in session.deleted:
+        if isinstance(obj, MISUpload):
+            removed.add(obj.UploadID)
+    
+    connection = session.connection()
+    if renamed_departments or renamed_users:
+        refreshed.update(connection.execute(db.select(MISUpload.UploadID).where(db.or_(
+            MISUpload.DepartmentID.in_(renamed_departments), MISUpload.UploadedBy.in_(renamed_users)))).scalars())
+    search_index.remove(connection, removed)
+    search_index.refresh(connection, refreshed - removed)
+    text_pending.difference_update(removed)
+
+@event.listens_for(Session, 'after_commit')
+def queue_search_text(session):
+    for upload_id in session.info.pop('search_text_pending', ()):
+        search_index.submit(index_workbook_text, current_app._get_current_object(), upload_id)
+
+@event.listens_for(Session, 'after_rollback')
+def discard_search_text(session):
+    session.info.pop('search_text_pending', None)
+
+def index_workbook_text(app, upload_id):
+    """Background job: put an upload's workbook text into the search index"""
+    with app.app_context():
+        upload = db.session.get(MISUpload, upload_id)
+        # Legacy .xls is indexed once validation has converted it (FilePath changes then)
+        if not upload or upload.FilePath.endswith('.xls') or not os.path.exists(upload.FilePath):
+            return
+        connection = db.session.connection()
+        content = search_index.shared_content(connection, upload_id, upload.ContentHash)
+        if content is None:
+            content = extract_workbook_text(upload.FilePath)
+        search_index.set_content(connection, upload_id, content)
+        db.session.commit()
+
+def seed_mis_code_sequence(department_id):
+    """Highest sequence number already used by a department's MIS codes"""
+    highest = 0
+    for (code,) in db.session.query(MISUpload.UploadCode).filter_by(DepartmentID=department_id):
+        if code and code[-6:].isdigit():
+            highest = max(highest, int(code[-6:]))
+    return max(highest, MISUpload.query.filter_by(DepartmentID=department_id).count())
+
+def next_mis_code_sequence(department_id):
+    """Atomically increment and return the department's MIS code sequence.
+
+    The UPDATE holds the row (SQLite: database) write lock until the caller
+    commits, so concurrent uploads are serialized on the counter and the
+    code is only consumed if the MISUpload insert commits with it.
+    """
+    value = db.session.execute(
+        db.update(MISCodeSequence)
+        .where(MISCodeSequence.DepartmentID == department_id)
+        .values(LastValue=MISCodeSequence.LastValue + 1)
+        .returning(MISCodeSequence.LastValue)
+    ).scalar()
+    if value is not None:
+        return value
+    
+    # First upload for this department since the sequence table was added
+    value = seed_mis_code_sequence(department_id) + 1
+    try:
+        with db.session.begin_nested():
+            db.session.add(MISCodeSequence(DepartmentID=department_id, LastValue=value))  # type: ignore
+    except IntegrityError:
+        # Another worker seeded the row first - take the next value from it
+        return next_mis_code_sequence(department_id)
+    return value
+
+def generate_mis_code(department_id):
+    """Generate unique MIS code in format: MIS+DPT+[code]
+    
+    Must be called in the same transaction that inserts the MISUpload.
+    """
+    dept = get_department(department_id)
+    if not dept:
+        return None
+    
+    dept_code = dept.DeptName[:3].upper()
+    sequential_code = str(next_mis_code_sequence(department_id)).zfill(6)
+    
+    return f"MIS{dept_code}{sequential_code}"
+
+def load_reference_data():
+    """Read the lookup tables once into detached instances for the reference cache"""
+    with Session(db.engine) as loader_session:
+        data = {
+            'roles': loader_session.query(Role).order_by(Role.RoleID).all(),
+            'departments': loader_session.query(Department).order_by(Department.DeptID).all(),
+            'financial_years': loader_session.query(FinancialYear).order_by(FinancialYear.FYID).all(),
+            'companies': loader_session.query(Company).order_by(Company.CompanyID).all()
+        }
+        loader_session.expunge_all()
+    return data
+
+def cached_reference_rows(table):
+    """Cached rows of a lookup table (detached - use attach_reference_rows before handing them out)"""
+    return reference_cache.get(load_reference_data)[table]
+
+def attach_reference_rows(rows):
+    """Merge cached rows into the current session without emitting SQL"""
+    return [db.session.merge(row, load=False) for row in rows]
+
+def get_roles():
+    return attach_reference_rows(cached_reference_rows('roles'))
+
+def get_role(role_name):
+    matches = [role for role in cached_reference_rows('roles') if role.RoleName == role_name]
+    return attach_reference_rows(matches)[0] if matches else None
+
+def get_departments(active_only=False, by_name=False):
+    departments = cached_reference_rows('departments')
+    if active_only:
+        departments = [dept for dept in departments if dept.ActiveFlag]
+    if by_name:
+        departments = sorted(departments, key=lambda dept: dept.DeptName)
+    return attach_reference_rows(departments)
+
+def get_department(dept_id):
+    if not dept_id:
+        return None
+    matches = [dept for dept in cached_reference_rows('departments') if dept.DeptID == int(dept_id)]
+    return attach_reference_rows(matches)[0] if matches else None
+
+def get_financial_years():
+    return attach_reference_rows(cached_reference_rows('financial_years'))
+
+def get_financial_year(fy_id):
+    if not fy_id:
+        return None
+    matches = [fy for fy in cached_reference_rows('financial_years') if fy.FYID == int(fy_id)]
+    return attach_reference_rows(matches)[0] if matches else None
+
+def get_active_fy():
+    matches = [fy for fy in cached_reference_rows('financial_years') if fy.ActiveFlag]
+    return attach_reference_rows(matches)[0] if matches else None
+
+def get_companies():
+    return attach_reference_rows(cached_reference_rows('companies'))
+
+def invalidate_reference_data():
+    """Call after committing any change to roles, departments, financial years or companies"""
+    reference_cache.invalidate()
+
+def create_notification(user_id, title, message, notif_type, upload_id=None, consolidated_id=None):
+    """Create in-app notification for a user"""
+    notification = Notification(
+        UserID=user_id,
+        Title=title,
+        Message=message,
+        NotificationType=notif_type,
+        RelatedUploadID=upload_id,
+        RelatedConsolidatedID=consolidated_id
+    )
+    db.session.add(notification)
+    db.session.commit()
+
+def bulk_review_uploads(criteria, changes, notification, digest):
+    """
+    Apply one review decision to every upload ticked in the form, in a single transaction
+
+    The selected uploads that still meet criteria are locked, changed with one
+    UPDATE and notified in one flush; uploads that no longer qualify (already
+    reviewed, cancelled, not validated) are skipped. Emails are built while
+    the rows are loaded and queued only after the commit, one per uploader.
+
+    Args:
+        criteria: Filters an upload must meet to be changed, e.g. MISUpload.Status == 'In Review'
+        changes: Column values written by the UPDATE
+        notification: (title, message, type); message is formatted with code= and month=
+        digest: (decision, reviewer, header colour) for the per-uploader email
+
+    Returns:
+        tuple: (reviewed upload count, skipped count), or None if the selection
+        changed underneath the request and nothing was written
+    """
+    upload_ids = sorted({int(value) for value in request.form.getlist('upload_ids') if value.isdigit()})
+    uploads = (MISUpload.query.options(selectinload(MISUpload.uploader))
+               .filter(MISUpload.UploadID.in_(upload_ids), *criteria)
+               .order_by(MISUpload.UploadCode).with_for_update().all())
+    if not uploads:
+        return 0, len(upload_ids)
+    
+    month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+    title, message, notif_type = notification
+    notifications = [Notification(UserID=upload.UploadedBy, Title=title,
+                                  Message=message.format(code=upload.UploadCode, month=month_names[upload.MonthID]),
+                                  NotificationType=notif_type, RelatedUploadID=upload.UploadID)
+                     for upload in uploads]
+    emails = review_digest_emails(uploads, *digest) if email_service.is_configured() else []
+    
+    reviewed = (MISUpload.query.filter(MISUpload.UploadID.in_([upload.UploadID for upload in uploads]), *criteria)
+                .update(changes, synchronize_session=False))
+    if reviewed != len(uploads):
+        db.session.rollback()
+        return None
+    # A bulk UPDATE skips the flush hooks, so the rollup is recounted here
+    refresh_status_rollups(db.session(), {(upload.FYID, upload.MonthID, upload.DepartmentID) for upload in uploads})
+    db.session.add_all(notifications)
+    db.session.commit()
+    
+    for email in emails:
+        email_service.queue_email(*email)
+    return reviewed, len(upload_ids) - reviewed
+
+def review_digest_emails(uploads, decision, reviewer, colour):
+    """(to, subject, html, text) for one email per uploader listing their uploads in a bulk decision"""
+    month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+    by_uploader = {}
+    for upload in uploads:
+        by_uploader.setdefault(upload.UploadedBy, []).append(upload)
+    
+    emails = []
+    for batch in by_uploader.values():
+        uploader = batch[0].uploader
+        if not uploader.Email:
+            continue
+        details = [f"{upload.UploadCode} - {upload.department.DeptName} | {month_names[upload.MonthID]} {upload.financial_year.FYName}" for upload in batch]
+        noun = 'MIS Upload' if len(batch) == 1 else f'{len(batch)} MIS Uploads'
+        subject = f"{noun} {decision} by {reviewer}"
+        items = ''.join(f"<li>{detail}</li>" for detail in details)
+        html_content = f"""<!DOCTYPE html><html><body style="font-family: Arial;"><div style="max-width: 600px; margin: 0 auto; padding: 20px;"><div style="background-color: {colour}; color: white; padding: 20px; border-radius: 5px 5px 0 0;"><h2>{noun} {decision}</h2></div><div style="background-color: white; padding: 30px;"><p>Dear {uploader.Username},</p><p>The following MIS uploads have been {decision.lower()} by the {reviewer}:</p><ul>{items}</ul><p>Best regards,<br><strong>MIS System Team</strong></p></div></div></body></html>"""
+        lines = '\n'.join(f"- {detail}" for detail in details)
+        text_content = f"Dear {uploader.Username},\n\nThe following MIS uploads have been {decision.lower()} by the {reviewer}:\n{lines}\n\nBest regards,\nMIS System Team"
+        emails.append((uploader.Email, subject, html_content, text_content))
+    return emails
+
+def flash_bulk_review(result, verb):
+    """Flash the outcome of bulk_review_uploads()"""
+    if result is None:
+        flash('Some of the selected uploads changed while you were reviewing them. Nothing was saved - please try again.', 'error')
+        return
+    reviewed, skipped = result
+    if reviewed:
+        flash(f'{reviewed} upload(s) {verb}. Uploaders have been notified.', 'success' if verb == 'approved' else 'warning')
+    if skipped:
+        flash(f'{skipped} selected upload(s) were skipped because they are not (or no longer) eligible for this review.', 'error' if not reviewed else 'warning')
+
+def bulk_selection_error():
+    """Message explaining why the form's upload selection cannot be processed, or None"""
+    selected = request.form.getlist('upload_ids')
+    if not selected:
+        return 'Select at least one upload.'
+    if len(selected) > BULK_REVIEW_MAX_UPLOADS:
+        return f'Select at most {BULK_REVIEW_MAX_UPLOADS} uploads at a time.'
+    return None
+
+def check_upload_window():
+    today = date.today()
+    if UPLOAD_WINDOW_START_DAY <= today.day <= UPLOAD_WINDOW_END_DAY:
+        days_remaining = UPLOAD_WINDOW_END_DAY - today.day
+        if days_remaining == 0:
+            return True, f"Upload window is open ({UPLOAD_WINDOW_START_DAY}st-{UPLOAD_WINDOW_END_DAY}th of the month). Last day to upload!"
+        elif days_remaining == 1:
+            return True, f"Upload window is open ({UPLOAD_WINDOW_START_DAY}st-{UPLOAD_WINDOW_END_DAY}th of the month). 1 day remaining."
+        else:
+            return True, f"Upload window is open ({UPLOAD_WINDOW_START_DAY}st-{UPLOAD_WINDOW_END_DAY}th of the month). {days_remaining} days remaining."
+    elif today.day > UPLOAD_WINDOW_END_DAY:
+        return False, f"Upload window is closed. The upload window opens on the {UPLOAD_WINDOW_START_DAY}st of next month."
+    else:
+        return False, f"Upload window opens on the {UPLOAD_WINDOW_START_DAY}st of the month."
+
+def validate_excel_file(file_path):
+    """Validate Excel file structure and content"""
+    is_valid, message, data_rows = inspect_excel_file(file_path)
+    return is_valid, message
+
+def inspect_excel_file(file_path):
+    """
+    Validate Excel file structure and content, and count its data rows
+    
+    Returns:
+        tuple: (is_valid: bool, message: str, data_rows: int or None)
+    """
+    started = time.perf_counter()
+    result = _inspect_excel_file(file_path)
+    WORKBOOK_PARSE_SECONDS.labels(result='valid' if result[0] else 'invalid').observe(time.perf_counter() - started)
+    return result
+
+def _inspect_excel_file(file_path):
+    try:
+        import openpyxl
+        workbook = openpyxl.load_workbook(file_path)
+        
+        if len(workbook.sheetnames) == 0:
+            return False, "Excel file has no sheets.", None
+        
+        sheet = workbook.active
+        if sheet.max_row < 2:
+            return False, "Excel file appears to be empty (no data rows).", None
+        
+        if sheet.max_column < 1:
+            return False, "Excel file has no columns.", None
+        
+        return True, "File validation successful.", sheet.max_row - 1
+    except Exception as e:
+        return False, f"File validation error: {str(e)}", None
+
+def workbook_known_valid(content_hash):
+    """Check whether identical workbook content has already passed validation"""
+    if MISUpload.query.filter_by(ContentHash=content_hash, FileCheck='Validated').first():
+        return True
+    return ConsolidatedMIS.query.filter_by(ContentHash=content_hash).first() is not None
+
+def stage_validated_workbook(file):
+    """
+    Stream an uploaded workbook into the content store and validate it.
+    Legacy .xls content is converted to .xlsx first (see normalize_legacy_workbook),
+    and identical content that was validated before is not parsed again.
+
+    Returns:
+        tuple: (staged: StagedUpload, is_valid: bool, message: str)
+    """
+    staged, error_message = normalize_legacy_workbook(content_store.stage(file))
+    if error_message:
+        staged.discard()
+        return staged, False, error_message
+    is_valid, validation_message = validate_staged_workbook(staged)
+    return staged, is_valid, validation_message
+
+def validate_staged_workbook(staged):
+    """Validate a staged workbook, skipping the parse if identical content already passed"""
+    if staged.exists and workbook_known_valid(staged.sha256):
+        return True, "File validation successful (identical file already validated)."
+    
+    is_valid, validation_message = validate_excel_file(staged.path)
+    if not is_valid:
+        staged.discard()
+    return is_valid, validation_message
+
+def normalized_copy_of(original_path):
+    """Find the .xlsx an identical legacy .xls blob was already converted to, if it is still stored"""
+    upload = MISUpload.query.filter_by(OriginalFilePath=original_path).first()
+    if upload and os.path.exists(upload.FilePath):
+        return upload.FilePath
+    consolidated = ConsolidatedMIS.query.filter_by(OriginalFilePath=original_path).first()
+    if consolidated and os.path.exists(consolidated.ConsolidatedFilePath):
+        return consolidated.ConsolidatedFilePath
+    return None
+
+def normalize_legacy_workbook(staged):
+    """
+    Convert a staged legacy BIFF .xls workbook to .xlsx so openpyxl-based readers can open it
+    
+    Conversion happens once per distinct file: a re-upload of the same .xls reuses
+    the .xlsx made the first time. The returned StagedUpload holds the .xlsx and
+    carries the .xls in .original, so committing it keeps both.
+    
+    Returns:
+        tuple: (staged: StagedUpload, error_message: str or None)
+    """
+    if staged.extension != '.xls':
+        return staged, None
+    
+    existing_copy = normalized_copy_of(staged.blob_path) if staged.exists else None
+    if existing_copy:
+        normalized = content_store.staged_from_blob(existing_copy)
+    else:
+        converted_path = content_store.incoming_path('.xlsx')
+        success, message = convert_xls_to_xlsx(staged.path, converted_path)
+        if not success:
+            os.remove(converted_path)
+            return staged, message
+        normalized = content_store.stage_path(converted_path, '.xlsx')
+    
+    normalized.original = staged
+    return normalized, None
+
+def filename_for_extension(filename, extension):
+    """Swap a display filename's extension for the stored file's, e.g. after .xls conversion"""
+    name, current_extension = os.path.splitext(filename)
+    if not extension or current_extension.lower() == extension:
+        return filename
+    return f"{name}{extension}"
+
+# Hand stored files to the reverse proxy instead of streaming them from the worker
+download_offload_mode = os.environ.get('DOWNLOAD_OFFLOAD') or DOWNLOAD_OFFLOAD_MODE
+
+def send_stored_file(file_path, content_hash, download_name):
+    """
+    Send a stored workbook with validators so repeat and resumed downloads are cheap
+
+    The strong ETag is the file's SHA-256, so it is the same on every worker and
+    changes exactly when the content does. send_file answers If-None-Match /
+    If-Modified-Since with a 304 and Range requests with a 206. Rows stored
+    before content hashing fall back to Werkzeug's mtime/size ETag.
+
+    With download offload on, the response carries no body - just the
+    internal-redirect header - and the proxy streams the file (and handles
+    ranges); the worker is free as soon as the permission check is done.
+    """
+    from flask import send_file
+    upload_root = os.path.abspath(current_app.config['UPLOAD_FOLDER'])
+    absolute_path = os.path.abspath(file_path)
+    if download_offload_mode and absolute_path.startswith(upload_root + os.sep):
+        response = offload_response(absolute_path, upload_root, content_hash, download_name)
+    else:
+        # Stored paths are relative to the working directory, where content_store writes them
+        response = send_file(absolute_path, as_attachment=True, download_name=download_name,
+                             conditional=True, etag=content_hash or True)
+    response.cache_control.public = not DOWNLOAD_CACHE_PRIVATE
+    response.cache_control.private = DOWNLOAD_CACHE_PRIVATE or None
+    response.cache_control.max_age = DOWNLOAD_CACHE_MAX_AGE
+    if DOWNLOAD_CACHE_MAX_AGE == 0:
+        response.cache_control.must_revalidate = True
+    response.cache_control.no_cache = None
+    # Access depends on who is logged in
+    response.vary.add('Cookie')
+    return response
+
+def offload_response(absolute_path, upload_root, content_hash, download_name):
+    """Empty response telling nginx (X-Accel-Redirect) or Apache (X-Sendfile) which file to serve"""
+    import mimetypes
+    from urllib.parse import quote
+    stat = os.stat(absolute_path)  # FileNotFoundError here, like send_file, for a missing blob
+    response = current_app.response_class(status=200, mimetype=mimetypes.guess_type(download_name)[0] or 'application/octet-stream')
+    ascii_name = download_name.encode('ascii', 'ignore').decode('ascii')
+    if ascii_name == download_name:
+        response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+    else:
+        response.headers.set('Content-Disposition', 'attachment', filename=ascii_name, **{'filename*': f"UTF-8''{quote(download_name)}"})
+    if download_offload_mode == 'x-sendfile':
+        response.headers['X-Sendfile'] = absolute_path
+    else:
+        relative_path = os.path.relpath(absolute_path, upload_root).replace(os.sep, '/')
+        response.headers['X-Accel-Redirect'] = DOWNLOAD_OFFLOAD_LOCATION.rstrip('/') + '/' + quote(relative_path)
+    response.last_modified = stat.st_mtime
+    response.set_etag(content_hash or f"{stat.st_mtime}-{stat.st_size}")
+    # Answer an unchanged repeat download here; the proxy never has to open the file
+    response.make_conditional(request)
+    if response.status_code == 304:
+        response.headers.pop('X-Accel-Redirect', None)
+        response.headers.pop('X-Sendfile', None)
+    return response
+
+class StreamedRows:
+    """
+    Query results for a streamed page. Rows come from a server-side cursor in
+    batches while the template loops over them, so memory stays flat however
+    many there are; len() and truth tests run a COUNT instead of loading them.
+    """
+    def __init__(self, query, batch_size=STREAM_BATCH_SIZE):
+        self.query = query
+        self.batch_size = batch_size
+        self._count = None
+
+    def __len__(self):
+        if self._count is None:
+            self._count = self.query.order_by(None).count()
+        return self._count
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        return iter(self.query.yield_per(self.batch_size))
+
+def stream_page(template_name, **context):
+    """
+    Render a template while it is being sent, so the page chrome and first rows
+    arrive before the last row is fetched. Output is gathered into
+    STREAM_CHUNK_SIZE writes rather than one per template fragment.
+    """
+    # Headers (and the session cookie) go out before the template runs - take the flashes now
+    get_flashed_messages(with_categories=True)
+    # The request's database session is closed when the view returns, before the template
+    # runs; take it out of the registry so rows the view loaded stay usable while streaming
+    streaming_session = db.session()
+    db.session.registry.clear()
+    # Teardown runs when the view returns too, so the template's queries and time would
+    # escape the route's SQL profile and latency; carry both until the body is closed
+    profile = sql_profiler.detach_request()
+    endpoint, method, started = request.endpoint, request.method, g.pop('request_started', None)
+
+    @stream_with_context
+    def chunks():
+        db.session.registry.set(streaming_session)
+        sql_profiler.attach_request(profile)
+        try:
+            pending, size = [], 0
+            for part in stream_template(template_name, **context):
+                pending.append(part)
+                size += len(part)
+                if size >= STREAM_CHUNK_SIZE:
+                    yield ''.join(pending)
+                    pending, size = [], 0
+            if pending:
+                yield ''.join(pending)
+        finally:
+            sql_profiler.detach_request()
+
+    def finish():
+        if profile is not None:
+            sql_profiler.finish_request(profile)
+        if started is not None:
+            record_request_latency(endpoint, method, started)
+
+    response = current_app.response_class(chunks(), mimetype='text/html')
+    response.call_on_close(finish)
+    return response
+
+def stored_file_in_use(file_path):
+    """Content-addressed files can be shared - check for any live row still pointing at one"""
+    if MISUpload.query.filter_by(IsCancelled=False).filter(db.or_(MISUpload.FilePath == file_path, MISUpload.OriginalFilePath == file_path)).first():
+        return True
+    if ConsolidatedMIS.query.filter(db.or_(ConsolidatedMIS.ConsolidatedFilePath == file_path, ConsolidatedMIS.OriginalFilePath == file_path)).first():
+        return True
+    return Template.query.filter_by(FilePath=file_path).first() is not None
+
+def referenced_stored_files():
+    """Every stored file path a live upload, consolidated MIS or template points at"""
+    queries = [
+        db.select(MISUpload.FilePath).where(MISUpload.IsCancelled == False),
+        db.select(MISUpload.OriginalFilePath).where(MISUpload.IsCancelled == False),
+        db.select(ConsolidatedMIS.ConsolidatedFilePath),
+        db.select(ConsolidatedMIS.OriginalFilePath),
+        db.select(Template.FilePath),
+    ]
+    return {path for query in queries for path in db.session.execute(query).scalars() if path}
+
+def remove_stored_file(*file_paths):
+    """Delete stored files once no live upload, consolidated MIS or template references them
+    
+    The reference check and the delete run under the blob store lock; files a
+    concurrent upload may have just reused are left for sweep_stored_files().
+    """
+    for file_path in file_paths:
+        if file_path:
+            content_store.delete_blob(file_path, stored_file_in_use, BLOB_DELETE_GRACE_SECONDS)
+
+def sweep_stored_files():
+    """Delete stored blobs no row references any more; returns how many were removed"""
+    return content_store.sweep_blobs(referenced_stored_files(), BLOB_DELETE_GRACE_SECONDS)
+
+def search_uploads(query, terms):
+    """
+    Narrow an MISUpload query to uploads matching terms, best match first
+
+    Every word is a prefix of a word in the MIS code, department, uploader or
+    workbook text (see search_index.py). Without an index the MIS code is
+    matched by prefix instead. Apply every other filter to query first: the
+    SEARCH_RESULT_LIMIT best matches are picked from the uploads it selects.
+    """
+    within = query.with_entities(MISUpload.UploadID).order_by(None).statement
+    upload_ids = search_index.search(db.session.connection(), terms, SEARCH_RESULT_LIMIT, within=within)
+    if upload_ids is None:
+        return query.filter(MISUpload.UploadCode.ilike(terms.replace('%', '').replace('_', '') + '%'))
+    if not upload_ids:
+        return query.filter(db.false())
+    rank = db.case({upload_id: position for position, upload_id in enumerate(upload_ids)}, value=MISUpload.UploadID)
+    return query.filter(MISUpload.UploadID.in_(upload_ids)).order_by(rank)
+
+# Year view cell stages and the Excel fill used for each
+UPLOAD_STAGE_FILLS = {
+    'Approved': 'BBF7D0',
+    'Awaiting Management': 'BFDBFE',
+    'Awaiting Supervisor': 'FED7AA',
+    'Rejected': 'FECACA',
+    'Not Submitted': 'E5E7EB',
+    'Not Due': 'F9FAFB',
+}
+
+def upload_stage(status, supervisor_approved):
+    """Where an upload stands in the HOD -> Supervisor -> Management review"""
+    if status == 'In Review':
+        return 'Awaiting Management' if supervisor_approved else 'Awaiting Supervisor'
+    return status
+
+def year_heatmap(fy):
+    """
+    Latest upload stage of every active department in every month of an FY
+
+    Built from one rollup query and cached per FY until an upload or
+    consolidated report in it is counted again, or the departments change.
+
+    Returns:
+        dict: months (MonthIDs in FY order), rows ({department_id,
+        department_name, cells}; one {stage, uploads} cell per month) and
+        submitted (departments with a live upload, per month)
+    """
+    departments = get_departments(active_only=True, by_name=True)
+    
+    def build():
+        months = [(fy.StartDate.month + offset - 1) % 12 + 1 for offset in range(12)]
+        # A month is due once it has started
+        today = date.today()
+        due = [date(fy.StartDate.year + (fy.StartDate.month + offset - 1) // 12, month, 1) <= today for offset, month in enumerate(months)]
+        latest = latest_upload_statuses(fy.FYID)
+        rows = []
+        for dept in departments:
+            cells = []
+            for month, month_due in zip(months, due):
+                if (dept.DeptID, month) in latest:
+                    status, supervisor_approved, uploads = latest[(dept.DeptID, month)]
+                    cells.append({'stage': upload_stage(status, supervisor_approved), 'uploads': uploads})
+                else:
+                    cells.append({'stage': 'Not Submitted' if month_due else 'Not Due', 'uploads': 0})
+            rows.append({'department_id': dept.DeptID, 'department_name': dept.DeptName, 'cells': cells})
+        submitted = [sum(1 for row in rows if row['cells'][index]['uploads']) for index in range(12)]
+        return {'months': months, 'rows': rows, 'submitted': submitted}
+    
+    version = (status_rollup_version(fy.FYID), date.today(), tuple((dept.DeptID, dept.DeptName) for dept in departments))
+    return year_heatmaps.get(fy.FYID, YEAR_HEATMAP_CACHE_SECONDS, build, version=version)
+
+def year_heatmap_fy():
+    """The FY chosen on the year view (the active one by default), or None if the user may not see it"""
+    user = User.query.get(session['user_id'])
+    if user.role.RoleName not in ['Admin', 'Management', 'Supervisor']:
+        flash('Access denied.', 'error')
+        return None
+    fy_id = request.args.get('fy_id', type=int)
+    fy = get_financial_year(fy_id) if fy_id else get_active_fy()
+    if not fy:
+        flash('Financial year not found.', 'error')
+    return fy
+
+def turnaround_report(fy):
+    """sla_analytics.sla_report() for an FY, cached until an upload or consolidated report in it is counted again"""
+    def build():
+        return sla_analytics.sla_report(db.session.connection(), fy.FYID, fy.StartDate)
+    return sla_reports.get(fy.FYID, SLA_CACHE_SECONDS, build, version=status_rollup_version(fy.FYID))
+
+def turnaround_fy():
+    """The FY chosen on the turnaround pages (the active one by default), or None if the user may not see it"""
+    user = User.query.get(session['user_id'])
+    if user.role.RoleName not in ['Admin', 'Management']:
+        flash('Access denied.', 'error')
+        return None
+    fy_id = request.args.get('fy_id', type=int)
+    fy = get_financial_year(fy_id) if fy_id else get_active_fy()
+    if not fy:
+        flash('Financial year not found.', 'error')
+    return fy
+
+def create_mis_upload(user, department_id, month_id, fy_id, original_filename, staged):
+    """
+    Record a staged workbook as a new MISUpload and queue it for validation
+    
+    Identical content that already passed validation is accepted as Validated
+    straight away; anything else is stored with FileCheck='Validating' and
+    parsed by the background validation pipeline. If the validation backlog
+    is full nothing is recorded and staged is left for the caller to discard
+    or keep for a retry.
+    
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    fy = get_financial_year(fy_id)
+    dept = get_department(department_id)
+    month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+    
+    # Allow multiple uploads for the same month - Management will review all of them
+    # No automatic archiving - all uploads with same month stay "In Review" for Management decision
+    
+    # File bytes go to the content store; the [Dept]_[Month]_[FY] name is kept for display and download
+    filename = secure_filename(f"{dept.DeptName}_{month_names[int(month_id)]}_{fy.FYName}_{original_filename}")
+    
+    known_valid = staged.exists and workbook_known_valid(staged.sha256)
+    
+    # Admission control - refuse new parses once this node's validation backlog is full
+    if not known_valid and not validation_pipeline.admit():
+        return False, 'The server is busy validating other uploads. Please try again in a few minutes.'
+    
+    # All uploads (including Admin) go to Supervisor for approval first
+    upload_status = 'In Review'
+    
+    try:
+        # Generate unique MIS code
+        mis_code = generate_mis_code(int(department_id))
+        
+        upload = MISUpload(  # type: ignore
+            UploadCode=mis_code,
+            DepartmentID=department_id,
+            MonthID=month_id,
+            FYID=fy_id,
+            UploadedBy=user.UserID,
+            FilePath=staged.commit(),
+            FileName=filename_for_extension(filename, staged.extension),
+            ContentHash=staged.sha256,
+            FileCheck='Validated' if known_valid else 'Validating',
+            ValidationQueuedDate=None if known_valid else datetime.now(IST),
+            ValidationMessage='File validation successful (identical file already validated).' if known_valid else None,
+            Status=upload_status
+        )
+        db.session.add(upload)
+        db.session.commit()
+    except Exception:
+        if not known_valid:
+            validation_pipeline.release()
+        raise
+    
+    if known_valid:
+        return True, f'✓ File Validation Success: {upload.ValidationMessage} File uploaded successfully and is now pending Supervisor review.'
+    
+    validation_pipeline.submit(run_upload_validation, current_app._get_current_object(), upload.UploadID)
+    return True, f'File uploaded successfully as {mis_code}. Validation is in progress - the File Check status below will update when it finishes.'
+
+def run_upload_validation(app, upload_id):
+    """
+    Background job: normalize and parse an uploaded workbook, then record the result on the upload
+    
+    The file can be replaced through edit_upload while it is being parsed, so
+    the result is only written if the upload is still 'Validating' the same
+    file; otherwise it is dropped.
+    """
+    with app.app_context():
+        upload = MISUpload.query.get(upload_id)
+        if not upload or upload.FileCheck != 'Validating':
+            return
+        parsed_path = upload.FilePath
+        
+        normalized_path = None
+        conversion_error = None
+        if parsed_path.endswith('.xls'):
+            # Legacy workbook - convert once here so every later reader gets .xlsx; the .xls is kept
+            normalized, conversion_error = normalize_legacy_workbook(content_store.staged_from_blob(parsed_path))
+            if not conversion_error:
+                normalized_path = normalized.commit()
+        
+        if conversion_error:
+            is_valid, validation_message, data_rows = False, conversion_error, None
+        else:
+            is_valid, validation_message, data_rows = inspect_excel_file(normalized_path or parsed_path)
+        
+        # Claim the row (row lock, or the SQLite write lock) before writing, and only if it still holds the parsed file
+        claimed = db.session.execute(
+            db.update(MISUpload)
+            .where(MISUpload.UploadID == upload_id, MISUpload.FileCheck == 'Validating', MISUpload.FilePath == parsed_path)
+            .values(FileCheck='Validating')
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not claimed:
+            db.session.rollback()
+            logging.info(f"Upload {upload_id} changed while it was validated; result dropped")
+            if normalized_path:
+                remove_stored_file(normalized_path)
+            return
+        db.session.refresh(upload)
+        
+        if normalized_path:
+            upload.OriginalFilePath = parsed_path
+            upload.FilePath = normalized_path
+            upload.ContentHash = normalized.sha256
+            upload.FileName = filename_for_extension(upload.FileName, normalized.extension)
+        upload.ValidationMessage = validation_message[:500]
+        upload.DataRowCount = data_rows
+        if is_valid:
+            upload.FileCheck = 'Validated'
+            db.session.commit()
+            return
+        
+        # A failed upload is cancelled so it leaves the review queues and frees the period for a re-upload
+        upload.FileCheck = 'Failed'
+        upload.IsCancelled = True
+        db.session.commit()
+        remove_stored_file(upload.FilePath, upload.OriginalFilePath)
+        
+        create_notification(upload.UploadedBy, 'MIS Upload Failed Validation', f'Your MIS upload {upload.UploadCode} failed validation: {validation_message} Please correct the file and upload again.', 'rejection', upload_id=upload.UploadID)
+
+def requeue_stale_validations(stale_minutes=VALIDATION_STALE_MINUTES):
+    """
+    Re-queue uploads still 'Validating' long after they were queued
+    
+    Covers uploads whose worker was recycled or crashed before it parsed them.
+    Each row is claimed by bumping ValidationQueuedDate with a conditional
+    UPDATE, so only one process re-queues it; a job that was merely slow and
+    finishes as well is harmless, as only the first result is written.
+    
+    Returns:
+        int: Uploads re-queued
+    """
+    now = datetime.now(IST)
+    stale = db.and_(MISUpload.FileCheck == 'Validating',
+                    db.or_(MISUpload.ValidationQueuedDate.is_(None),
+                           MISUpload.ValidationQueuedDate <= now - timedelta(minutes=stale_minutes)))
+    requeued = 0
+    # Own session - this also runs before a request's view and must not commit its work
+    with Session(db.engine) as claim_session:
+        upload_ids = claim_session.execute(db.select(MISUpload.UploadID).where(stale)).scalars().all()
+        for upload_id in upload_ids:
+            if not validation_pipeline.admit():
+                logging.warning(f"Validation backlog full; {len(upload_ids) - requeued} stale uploads wait for the next check")
+                break
+            claimed = claim_session.execute(
+                db.update(MISUpload).where(MISUpload.UploadID == upload_id, stale)
+                .values(ValidationQueuedDate=now).execution_options(synchronize_session=False)
+            ).rowcount
+            claim_session.commit()
+            if not claimed:
+                validation_pipeline.release()
+                continue
+            validation_pipeline.submit(run_upload_validation, current_app._get_current_object(), upload_id)
+            requeued += 1
+    return requeued
+
+def purge_expired_chunked_uploads():
+    """Drop unfinished chunked uploads older than CHUNKED_UPLOAD_EXPIRY_HOURS"""
+    cutoff = datetime.now(IST) - timedelta(hours=CHUNKED_UPLOAD_EXPIRY_HOURS)
+    expired = ChunkedUpload.query.filter(ChunkedUpload.CreatedDate < cutoff).all()
+    for chunked in expired:
+        content_store.discard_chunks(chunked.Token)
+        db.session.delete(chunked)
+    db.session.commit()
+    return len(expired)
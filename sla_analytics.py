@@ -0,0 +1,153 @@
+"""
+Turnaround of the three MIS review stages, per department and per month.
+
+    submission   first upload of a department's MIS for a month, measured from
+                 the day its upload window opens (UPLOAD_WINDOW_START_DAY)
+    supervisor   upload -> Supervisor approval (SupervisorApprovedDate)
+    management   consolidated MIS prepared -> approved by Management; a
+                 consolidated report covers every department, so this stage
+                 has no per-department figures
+
+Each stage is read for one FY with a single query that walks the
+(FYID, date) indexes on mis_uploads and consolidated_mis. Durations are in
+days; every group is sorted once and all requested percentiles are read off
+that one sorted list (linear interpolation, as in a spreadsheet PERCENTILE).
+"""
+
+from datetime import datetime
+
+from sqlalchemy import DateTime, Integer, text
+
+from config import UPLOAD_WINDOW_START_DAY, UPLOAD_WINDOW_END_DAY, SLA_PERCENTILES
+
+STAGES = {
+    'submission': 'HOD Submission',
+    'supervisor': 'Supervisor Review',
+    'management': 'Management Approval',
+}
+
+# First submission per department and month; uploads that failed validation never entered review
+SUBMISSION_SQL = text("""
+    SELECT "DepartmentID", "MonthID", MIN("UploadDate") AS "UploadDate"
+    FROM mis_uploads
+    WHERE "FYID" = :fy_id AND "UploadDate" IS NOT NULL AND COALESCE("FileCheck", '') != 'Failed'
+    GROUP BY "DepartmentID", "MonthID"
+""").columns(DepartmentID=Integer, MonthID=Integer, UploadDate=DateTime)
+
+SUPERVISOR_SQL = text("""
+    SELECT "DepartmentID", "MonthID", "UploadDate", "SupervisorApprovedDate"
+    FROM mis_uploads
+    WHERE "FYID" = :fy_id AND "UploadDate" IS NOT NULL AND "SupervisorApprovedDate" IS NOT NULL
+""").columns(DepartmentID=Integer, MonthID=Integer, UploadDate=DateTime, SupervisorApprovedDate=DateTime)
+
+MANAGEMENT_SQL = text("""
+    SELECT "MonthID", "CreatedDate", "ApprovedDate"
+    FROM consolidated_mis
+    WHERE "FYID" = :fy_id AND "CreatedDate" IS NOT NULL AND "ApprovedDate" IS NOT NULL
+""").columns(MonthID=Integer, CreatedDate=DateTime, ApprovedDate=DateTime)
+
+
+def days_between(start, end):
+    # Stored times are IST wall-clock; drop any offset so naive and aware values compare
+    return (end.replace(tzinfo=None) - start.replace(tzinfo=None)).total_seconds() / 86400
+
+
+def window_opens(fy_start, month_id):
+    """When the upload window for month_id of the FY starting on fy_start opens"""
+    year = fy_start.year + (1 if month_id < fy_start.month else 0)
+    return datetime(year, month_id, UPLOAD_WINDOW_START_DAY)
+
+
+def percentiles(ordered, points):
+    """Percentiles of an already sorted, non-empty list"""
+    last = len(ordered) - 1
+    values = {}
+    for point in points:
+        rank = last * point / 100
+        low = int(rank)
+        high = min(low + 1, last)
+        values[point] = ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+    return values
+
+
+def summarize(durations, on_time_days=None):
+    """count, pN for each configured percentile, max and (if on_time_days is given) on_time_pct"""
+    ordered = sorted(durations)
+    summary = {'count': len(ordered)}
+    summary.update({f'p{point}': value for point, value in percentiles(ordered, SLA_PERCENTILES).items()})
+    summary['max'] = ordered[-1]
+    if on_time_days is not None:
+        summary['on_time_pct'] = 100 * sum(1 for value in ordered if value <= on_time_days) / len(ordered)
+    return summary
+
+
+def summarize_stage(samples, on_time_days=None):
+    """
+    Args:
+        samples: (DepartmentID or None, MonthID, days) tuples
+    Returns:
+        dict: overall summary (None if there are no samples), by_department and by_month summaries
+    """
+    by_department, by_month = {}, {}
+    for department_id, month_id, days in samples:
+        if department_id is not None:
+            by_department.setdefault(department_id, []).append(days)
+        by_month.setdefault(month_id, []).append(days)
+    return {
+        'overall': summarize([days for _, _, days in samples], on_time_days) if samples else None,
+        'by_department': {key: summarize(values, on_time_days) for key, values in by_department.items()},
+        'by_month': {key: summarize(values, on_time_days) for key, values in by_month.items()},
+    }
+
+
+def sla_report(connection, fy_id, fy_start):
+    """
+    Turnaround percentiles of every stage for one FY
+
+    Args:
+        connection: SQLAlchemy connection
+        fy_id: FinancialYear.FYID
+        fy_start: FinancialYear.StartDate (maps each MonthID to its calendar year)
+
+    Returns:
+        dict: {stage: {'overall', 'by_department', 'by_month'}} for the keys of STAGES
+    """
+    submissions = [(department_id, month_id, days_between(window_opens(fy_start, month_id), uploaded))
+                   for department_id, month_id, uploaded in connection.execute(SUBMISSION_SQL, {'fy_id': fy_id})]
+    reviews = [(department_id, month_id, days_between(uploaded, approved))
+               for department_id, month_id, uploaded, approved in connection.execute(SUPERVISOR_SQL, {'fy_id': fy_id})]
+    approvals = [(None, month_id, days_between(created, approved))
+                 for month_id, created, approved in connection.execute(MANAGEMENT_SQL, {'fy_id': fy_id})]
+    # A submission is on time until the end of the window's last day
+    window_days = UPLOAD_WINDOW_END_DAY - UPLOAD_WINDOW_START_DAY + 1
+    return {
+        'submission': summarize_stage(submissions, on_time_days=window_days),
+        'supervisor': summarize_stage(reviews),
+        'management': summarize_stage(approvals),
+    }
+
+
+def fy_months(fy_start):
+    """MonthIDs of an FY in order, starting with the month of fy_start"""
+    return [(fy_start.month + offset - 1) % 12 + 1 for offset in range(12)]
+
+
+def csv_rows(report, fy_start, department_names):
+    """Flat rows for the CSV export: stage, scope, group, count, percentiles, max, on-time %"""
+    month_names = ['', 'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
+    yield ['Stage', 'Scope', 'Group', 'Count'] + [f'P{point} (days)' for point in SLA_PERCENTILES] + ['Max (days)', 'On Time %']
+    for stage, label in STAGES.items():
+        summaries = report[stage]
+        groups = []
+        if summaries['overall']:
+            groups.append(('Overall', 'All', summaries['overall']))
+        groups += [('Department', department_names.get(department_id, f'#{department_id}'), summary)
+                   for department_id, summary in sorted(summaries['by_department'].items(),
+                                                        key=lambda item: department_names.get(item[0], ''))]
+        groups += [('Month', month_names[month_id], summaries['by_month'][month_id])
+                   for month_id in fy_months(fy_start) if month_id in summaries['by_month']]
+        for scope, group, summary in groups:
+            on_time = summary.get('on_time_pct')
+            yield ([label, scope, group, summary['count']]
+                   + [round(summary[f'p{point}'], 2) for point in SLA_PERCENTILES]
+                   + [round(summary['max'], 2), '' if on_time is None else round(on_time, 1)])
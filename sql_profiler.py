@@ -0,0 +1,193 @@
+"""
+Per-request SQL instrumentation.
+
+When enabled, SQLAlchemy cursor hooks time every statement and attribute it
+to the route serving the current request. Each request's query count and
+total database time go into an in-memory ring buffer and per-route totals;
+statements are grouped by their normalized SQL (literals replaced by ?) so
+the same query with different parameters is counted together. Statements
+slower than the threshold are also written to a rotating log file, and a
+statement repeated many times within one request is flagged as an N+1
+suspect.
+
+When disabled, no hooks are installed and nothing here runs. Figures are per
+process; with several gunicorn workers each keeps its own.
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from sqlalchemy import event
+
+BACKGROUND_ROUTE = '(background)'
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(statement):
+    """Collapse whitespace and replace literals so equivalent statements group together"""
+    statement = _STRING_LITERAL.sub('?', statement)
+    statement = _NUMBER_LITERAL.sub('?', statement)
+    statement = _IN_LIST.sub('(?...)', statement)
+    return _WHITESPACE.sub(' ', statement).strip()
+
+
+class _RequestState:
+    __slots__ = ('route', 'started', 'query_count', 'db_time', 'statements')
+
+    def __init__(self, route):
+        self.route = route
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.statements = {}
+
+
+class SQLProfiler:
+    def __init__(self, slow_query_ms=100, buffer_size=500, repeat_threshold=5, log_file=None,
+                 log_max_bytes=5 * 1024 * 1024, log_backup_count=3):
+        self.slow_query_ms = slow_query_ms
+        self.repeat_threshold = repeat_threshold
+        self.enabled = False
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.requests = deque(maxlen=buffer_size)
+        self.slow_queries = deque(maxlen=buffer_size)
+        self.repeated = deque(maxlen=buffer_size)
+        self.routes = {}
+        self.statements = {}
+        self.started_at = datetime.now()
+
+        self.log_file = log_file
+        self.log_max_bytes = log_max_bytes
+        self.log_backup_count = log_backup_count
+        self.slow_log = logging.getLogger(f"{__name__}.slow")
+        self.slow_log.propagate = False
+
+    def install(self, engine):
+        """Attach the cursor hooks to an engine; only called when profiling is enabled"""
+        if self.log_file and not self.slow_log.handlers:
+            # delay: the file is only created once a slow query is written to it
+            handler = RotatingFileHandler(self.log_file, maxBytes=self.log_max_bytes,
+                                          backupCount=self.log_backup_count, delay=True)
+            handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            self.slow_log.addHandler(handler)
+            self.slow_log.setLevel(logging.INFO)
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        self.enabled = True
+
+    def start_request(self, route):
+        self._local.state = _RequestState(route or '(unmatched)')
+
+    def detach_request(self):
+        """Take the current request's figures off this thread, e.g. to carry them into a streamed body"""
+        state = getattr(self._local, 'state', None)
+        self._local.state = None
+        return state
+
+    def attach_request(self, state):
+        """Count this thread's statements towards figures from detach_request()"""
+        self._local.state = state
+
+    def finish_request(self, state=None):
+        """Close a request's figures (the current one by default) and add them to the ring buffer and route totals"""
+        if state is None:
+            state = self.detach_request()
+        if state is None:
+            return
+        duration = time.perf_counter() - state.started
+
+        with self._lock:
+            self.requests.append({
+                'route': state.route,
+                'time': datetime.now(),
+                'query_count': state.query_count,
+                'db_ms': state.db_time * 1000,
+                'duration_ms': duration * 1000
+            })
+            totals = self.routes.setdefault(state.route, {
+                'route': state.route, 'requests': 0, 'queries': 0, 'db_ms': 0.0,
+                'duration_ms': 0.0, 'max_queries': 0, 'max_db_ms': 0.0
+            })
+            totals['requests'] += 1
+            totals['queries'] += state.query_count
+            totals['db_ms'] += state.db_time * 1000
+            totals['duration_ms'] += duration * 1000
+            totals['max_queries'] = max(totals['max_queries'], state.query_count)
+            totals['max_db_ms'] = max(totals['max_db_ms'], state.db_time * 1000)
+
+            for sql, count in state.statements.items():
+                if count >= self.repeat_threshold:
+                    self.repeated.append({'route': state.route, 'time': datetime.now(), 'sql': sql, 'count': count})
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # Kept on the execution context so a failed statement leaves nothing behind
+        context._sql_profiler_start = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._sql_profiler_start
+        sql = normalize_sql(statement)
+        state = getattr(self._local, 'state', None)
+        route = state.route if state is not None else BACKGROUND_ROUTE
+        if state is not None:
+            state.query_count += 1
+            state.db_time += elapsed
+            state.statements[sql] = state.statements.get(sql, 0) + 1
+
+        elapsed_ms = elapsed * 1000
+        with self._lock:
+            totals = self.statements.setdefault(sql, {'sql': sql, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'routes': set()})
+            totals['count'] += 1
+            totals['total_ms'] += elapsed_ms
+            totals['max_ms'] = max(totals['max_ms'], elapsed_ms)
+            totals['routes'].add(route)
+            if elapsed_ms >= self.slow_query_ms:
+                self.slow_queries.append({'route': route, 'time': datetime.now(), 'sql': sql, 'ms': elapsed_ms})
+
+        if elapsed_ms >= self.slow_query_ms:
+            self.slow_log.info(f"{elapsed_ms:.1f}ms route={route} sql={sql}")
+
+    def worst_routes(self, limit=20):
+        with self._lock:
+            routes = [dict(totals, avg_queries=totals['queries'] / totals['requests'],
+                           avg_db_ms=totals['db_ms'] / totals['requests'])
+                      for totals in self.routes.values()]
+        return sorted(routes, key=lambda totals: totals['db_ms'], reverse=True)[:limit]
+
+    def worst_statements(self, limit=20):
+        with self._lock:
+            statements = [dict(totals, routes=sorted(totals['routes']), avg_ms=totals['total_ms'] / totals['count'])
+                          for totals in self.statements.values()]
+        return sorted(statements, key=lambda totals: totals['total_ms'], reverse=True)[:limit]
+
+    def n_plus_one_suspects(self, limit=20):
+        """Statements repeated repeat_threshold+ times in a single request, worst per route first"""
+        worst = {}
+        with self._lock:
+            for entry in self.repeated:
+                key = (entry['route'], entry['sql'])
+                if key not in worst or entry['count'] > worst[key]['count']:
+                    worst[key] = entry
+        return sorted(worst.values(), key=lambda entry: entry['count'], reverse=True)[:limit]
+
+    def recent_slow_queries(self, limit=50):
+        with self._lock:
+            return list(self.slow_queries)[-limit:][::-1]
+
+    def reset(self):
+        with self._lock:
+            self.requests.clear()
+            self.slow_queries.clear()
+            self.repeated.clear()
+            self.routes.clear()
+            self.statements.clear()
+            self.started_at = datetime.now()
@@ -0,0 +1,10 @@
+// Used by build_assets.py; paths are relative to the repository root.
+// Class names must appear whole in the templates to survive purging -
+// build them with {% if %} branches, never by string concatenation.
+module.exports = {
+  content: ['./templates/**/*.html'],
+  theme: {
+    extend: {},
+  },
+  plugins: [],
+};
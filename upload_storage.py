@@ -0,0 +1,364 @@
+"""
+Content-addressed storage for uploaded workbooks.
+
+Uploads are streamed to a temp file in <root>/.incoming while their SHA-256 is
+computed, then atomically renamed into <root>/blobs/<aa>/<sha256><ext>. A file
+only ever appears at its final path complete, and identical re-uploads reuse
+the existing blob instead of writing a second copy.
+
+Blob extensions come from the file's leading bytes when they identify a
+workbook format, so a .xlsx renamed to .xls (or the reverse) is stored under
+the extension that matches its content.
+
+Blobs are shared by every row with the same content, so reusing a blob and
+deleting one take the same store-wide lock. A reused blob has its mtime
+refreshed, and delete_blob() leaves recently touched blobs alone, so an
+upload that reused a blob but has not committed its row yet never loses it;
+sweep_blobs() collects whatever that leaves behind.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows - the lock then only covers the calling thread's own steps
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+# Leading bytes of the workbook container formats
+WORKBOOK_SIGNATURES = {
+    b'PK\x03\x04': '.xlsx',                          # OOXML (zip)
+    b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1': '.xls',     # Legacy BIFF (OLE2 compound file)
+}
+
+
+def sniff_extension(header, default):
+    """Return the workbook extension matching these leading bytes, or default"""
+    for signature, extension in WORKBOOK_SIGNATURES.items():
+        if header.startswith(signature):
+            return extension
+    return default
+
+
+class StagedUpload:
+    """An upload written to the incoming area, not yet committed to the blob store"""
+
+    def __init__(self, store, temp_path, sha256, extension, size):
+        self.store = store
+        self.temp_path = temp_path
+        self.sha256 = sha256
+        self.extension = extension
+        self.size = size
+        self.blob_path = store.blob_path(sha256, extension)
+        # Upload this one was converted from; committed and discarded along with it
+        self.original = None
+
+    @property
+    def original_path(self):
+        """Final blob path of the original upload, or None if nothing was converted"""
+        return self.original.blob_path if self.original is not None else None
+
+    @property
+    def exists(self):
+        """True if identical content is already in the blob store"""
+        return os.path.exists(self.blob_path)
+
+    @property
+    def path(self):
+        """Readable path for validation - the existing blob if there is one"""
+        return self.blob_path if self.exists else self.temp_path
+
+    def commit(self):
+        """Move the staged file into the blob store and return its final path"""
+        if self.original is not None:
+            self.original.commit()
+        with self.store.blob_lock():
+            if self.exists:
+                # Marks the blob as reused so a concurrent delete_blob() keeps it
+                os.utime(self.blob_path)
+                self.discard()
+            elif self.temp_path is not None:
+                os.makedirs(os.path.dirname(self.blob_path), exist_ok=True)
+                os.replace(self.temp_path, self.blob_path)
+                self.temp_path = None
+        return self.blob_path
+
+    def restore(self, path):
+        """Move an uncommitted staged file back to path, undoing ContentStore.stage_path()"""
+        os.replace(self.temp_path, path)
+        self.temp_path = None
+
+    def discard(self):
+        """Remove the staged temp file; safe to call after commit"""
+        if self.original is not None:
+            self.original.discard()
+        if self.temp_path is None:
+            return
+        try:
+            os.remove(self.temp_path)
+        except FileNotFoundError:
+            pass
+        self.temp_path = None
+
+
+class ContentStore:
+    def __init__(self, root):
+        self.root = root
+        self.blob_dir = os.path.join(root, 'blobs')
+        self.incoming_dir = os.path.join(root, '.incoming')
+        self.chunk_dir = os.path.join(root, '.chunks')
+
+    def blob_path(self, sha256, extension):
+        return os.path.join(self.blob_dir, sha256[:2], f"{sha256}{extension}")
+
+    @contextmanager
+    def blob_lock(self):
+        """Exclusive lock, across workers, held while a blob is reused or deleted"""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, '.blob.lock'), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Closing the file releases the lock
+            yield
+
+    def delete_blob(self, path, in_use, min_age_seconds=3600):
+        """
+        Delete a blob nothing references any more
+
+        Args:
+            path: Blob path
+            in_use: path -> bool, true while any row still points at the blob;
+                    checked under the lock, after the age check
+            min_age_seconds: Blobs written or reused more recently are kept for
+                             sweep_blobs(), as their new row may not be committed yet
+
+        Returns:
+            bool: True if the blob was deleted
+        """
+        with self.blob_lock():
+            try:
+                if time.time() - os.path.getmtime(path) < min_age_seconds or in_use(path):
+                    return False
+                os.remove(path)
+            except FileNotFoundError:
+                return False
+        return True
+
+    def sweep_blobs(self, referenced, min_age_seconds=3600):
+        """
+        Delete every blob not in referenced that has not been touched for min_age_seconds
+
+        Args:
+            referenced: set of blob paths live rows point at, read before the sweep
+                        (a row added since then reused its blob, which refreshed its mtime)
+
+        Returns:
+            int: blobs deleted
+        """
+        if not os.path.isdir(self.blob_dir):
+            return 0
+        referenced = {os.path.normpath(path) for path in referenced}
+        removed = 0
+        for directory, _, names in os.walk(self.blob_dir):
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    if self.delete_blob(path, lambda blob: os.path.normpath(blob) in referenced, min_age_seconds):
+                        removed += 1
+                except OSError as e:
+                    logger.warning(f"Could not sweep blob {path}: {str(e)}")
+        return removed
+
+    def stage(self, file_storage, extension=None):
+        """
+        Stream an uploaded file into the incoming area while hashing it
+
+        Args:
+            file_storage: werkzeug FileStorage (or any object with a readable .stream)
+            extension: Blob extension; defaults to the uploaded filename's extension
+
+        Returns:
+            StagedUpload: call commit() to keep it or discard() to drop it
+        """
+        if extension is None:
+            extension = os.path.splitext(file_storage.filename or '')[1].lower()
+        return self.stage_stream(file_storage.stream, extension)
+
+    def stage_stream(self, stream, extension):
+        """Stream into the incoming area; extension is a fallback when the content is not a known workbook"""
+        os.makedirs(self.incoming_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        header = b''
+        fd, temp_path = tempfile.mkstemp(dir=self.incoming_dir)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if not header:
+                        header = chunk[:8]
+                    digest.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+                out.flush()
+                os.fsync(out.fileno())
+            extension = sniff_extension(header, extension)
+            # Readers such as openpyxl dispatch on the suffix, so the temp file carries the real one
+            os.replace(temp_path, temp_path + extension)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return StagedUpload(self, temp_path + extension, digest.hexdigest(), extension, size)
+
+    def stage_path(self, path, extension):
+        """
+        Stage a file already assembled on the same filesystem without copying it
+
+        The file is renamed into the incoming area under the blob extension so
+        readers that dispatch on the file suffix (openpyxl) can validate it.
+        """
+        with open(path, 'rb') as stream:
+            extension = sniff_extension(stream.read(8), extension)
+        temp_path = self.incoming_path(extension)
+        os.replace(path, temp_path)
+        digest = hashlib.sha256()
+        with open(temp_path, 'rb') as stream:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+        return StagedUpload(self, temp_path, digest.hexdigest(), extension, os.path.getsize(temp_path))
+
+    def staged_from_blob(self, blob_path):
+        """Wrap a file already in the blob store so it can be handled like a fresh upload"""
+        sha256, extension = os.path.splitext(os.path.basename(blob_path))
+        return StagedUpload(self, None, sha256, extension, os.path.getsize(blob_path))
+
+    def incoming_path(self, extension):
+        """Reserve an empty temp file in the incoming area, e.g. for a converted copy"""
+        os.makedirs(self.incoming_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.incoming_dir, suffix=extension)
+        os.close(fd)
+        return temp_path
+
+    def chunk_path(self, token):
+        return os.path.join(self.chunk_dir, f"{token}.part")
+
+    @contextmanager
+    def chunk_lock(self, token):
+        """Exclusive lock, across workers, held while a resumable upload's file is appended to or finalized"""
+        os.makedirs(self.chunk_dir, exist_ok=True)
+        with open(self.chunk_path(token), 'ab') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Closing the file releases the lock
+            yield
+
+    def receive_chunk(self, stream, expected_sha256, max_bytes):
+        """
+        Stream one chunk of a resumable upload into the incoming area and verify it
+
+        The chunk is kept apart from the assembled file until it is complete and
+        its checksum matches, so a slow or abandoned request never touches bytes
+        that were already confirmed.
+
+        Args:
+            stream: Readable request body
+            expected_sha256: Hex SHA-256 the client computed for this chunk
+            max_bytes: Most bytes this chunk may contain
+
+        Returns:
+            tuple: (success: bool, path of the verified chunk or error message)
+        """
+        path = self.incoming_path('.chunk')
+        digest = hashlib.sha256()
+        written = 0
+        try:
+            with open(path, 'wb') as out:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    written += len(chunk)
+                    if written > max_bytes:
+                        os.remove(path)
+                        return False, "Chunk exceeds the declared file size."
+                    digest.update(chunk)
+                    out.write(chunk)
+        except BaseException:
+            os.remove(path)
+            raise
+        if digest.hexdigest() != expected_sha256.lower():
+            os.remove(path)
+            return False, "Chunk checksum mismatch. Please resend this chunk."
+        return True, path
+
+    def append_chunk(self, token, offset, chunk_path):
+        """
+        Append a verified chunk to a resumable upload at its confirmed offset
+
+        The caller must hold chunk_lock(token) and have checked offset against
+        the confirmed size. Anything past the offset (left by an append whose
+        confirmation never committed) is truncated first. The chunk file is
+        removed either way.
+
+        Returns:
+            int: Bytes appended
+        """
+        path = self.chunk_path(token)
+        try:
+            with open(path, 'r+b') as out, open(chunk_path, 'rb') as chunk_file:
+                out.truncate(offset)
+                out.seek(offset)
+                written = 0
+                while True:
+                    chunk = chunk_file.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    out.write(chunk)
+                    written += len(chunk)
+                out.flush()
+                os.fsync(out.fileno())
+        finally:
+            self.discard_received(chunk_path)
+        return written
+
+    def discard_received(self, chunk_path):
+        """Remove a chunk from receive_chunk() that will not be appended"""
+        try:
+            os.remove(chunk_path)
+        except FileNotFoundError:
+            pass
+
+    def discard_chunks(self, token):
+        try:
+            os.remove(self.chunk_path(token))
+        except FileNotFoundError:
+            pass
+
+    def purge_incoming(self, max_age_seconds=3600):
+        """Delete temp files abandoned by interrupted requests"""
+        if not os.path.isdir(self.incoming_dir):
+            return 0
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        for name in os.listdir(self.incoming_dir):
+            path = os.path.join(self.incoming_dir, name)
+            try:
+                if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError as e:
+                logger.warning(f"Could not purge incoming file {path}: {str(e)}")
+        return removed
@@ -0,0 +1,138 @@
+"""
+Background validation for uploaded workbooks.
+
+Parsing a workbook with openpyxl is the slowest part of an upload, so uploads
+are accepted straight away and parsed here on a small worker pool. The caps
+apply to the whole node rather than each worker process: a parse holds one
+of VALIDATION_WORKERS slots, and an admitted upload (queued or parsing) holds
+one of VALIDATION_MAX_PENDING slots, so new uploads are turned away when the
+node's backlog is full rather than letting it grow without limit.
+
+Slots are lock files in a directory shared by the node's workers, held with
+flock for as long as they are in use, so a worker that dies gives its slots
+back with it.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Windows - slots are then only counted within each process
+    fcntl = None
+
+from config import VALIDATION_WORKERS, VALIDATION_MAX_PENDING
+
+logger = logging.getLogger(__name__)
+
+
+class NodeSlots:
+    """A fixed number of slots shared by every process that uses the same directory"""
+
+    def __init__(self, directory, name, count):
+        self.directory = directory
+        self.name = name
+        self.count = count
+        self._local = threading.BoundedSemaphore(count)
+
+    def try_acquire(self):
+        """Take a free slot without blocking; returns a handle for release(), or None if all are taken"""
+        if fcntl is None:
+            return self._local if self._local.acquire(blocking=False) else None
+        os.makedirs(self.directory, exist_ok=True)
+        for index in range(self.count):
+            handle = open(os.path.join(self.directory, f"{self.name}-{index}.lock"), 'a')
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return handle
+            except BlockingIOError:
+                handle.close()
+        return None
+
+    def acquire(self, poll_seconds=0.5):
+        """Wait for a free slot"""
+        while True:
+            handle = self.try_acquire()
+            if handle is not None:
+                return handle
+            time.sleep(poll_seconds)
+
+    def release(self, handle):
+        if handle is self._local:
+            self._local.release()
+        else:
+            # Closing the file releases the lock
+            handle.close()
+
+
+class ValidationPipeline:
+    def __init__(self, slot_dir, max_workers=VALIDATION_WORKERS, max_pending=VALIDATION_MAX_PENDING):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._parse_slots = NodeSlots(slot_dir, 'parse', max_workers)
+        self._pending_slots = NodeSlots(slot_dir, 'pending', max_pending)
+        # Pending slots taken by admit() and not yet handed to a job; any one will do
+        self._admitted = []
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    @property
+    def pending(self):
+        """Jobs admitted in this process and not yet finished (queued or parsing)"""
+        return self._pending
+
+    def admit(self):
+        """
+        Reserve a node-wide slot for one validation job without blocking
+
+        Returns:
+            bool: True if the caller may submit(); False if the backlog is full
+        """
+        handle = self._pending_slots.try_acquire()
+        if handle is None:
+            return False
+        with self._lock:
+            self._admitted.append(handle)
+            self._pending += 1
+        return True
+
+    def release(self):
+        """Give back a slot reserved with admit() that will not be submitted"""
+        with self._lock:
+            handle = self._admitted.pop()
+            self._pending -= 1
+        self._pending_slots.release(handle)
+
+    def submit(self, job, *args):
+        """Run job(*args) on the worker pool; the caller must hold a slot from admit()"""
+        with self._lock:
+            handle = self._admitted.pop()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='mis-validation')
+        return self._executor.submit(self._run, handle, job, *args)
+
+    def _run(self, handle, job, *args):
+        try:
+            # Other workers on this node may be parsing - wait for one of the node's parse slots
+            parse_slot = self._parse_slots.acquire()
+            try:
+                job(*args)
+            finally:
+                self._parse_slots.release(parse_slot)
+        except Exception:
+            logger.exception(f"Validation job {getattr(job, '__name__', job)}{args} failed")
+        finally:
+            with self._lock:
+                self._pending -= 1
+            self._pending_slots.release(handle)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
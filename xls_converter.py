@@ -0,0 +1,63 @@
+"""
+One-time conversion of legacy BIFF .xls workbooks to .xlsx.
+
+Everything downstream (validation, analysis, PDF reports) reads workbooks with
+openpyxl, which only understands the OOXML format. Legacy uploads are
+converted once when they are ingested so later readers never need a second
+code path, and the original file is kept alongside the converted copy.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def convert_xls_to_xlsx(src_path, dest_path):
+    """
+    Copy every sheet's cell values from a legacy .xls workbook into a new .xlsx
+
+    Args:
+        src_path: Path of the BIFF .xls file
+        dest_path: Path the .xlsx is written to
+
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    try:
+        import xlrd
+    except ImportError:
+        return False, "Legacy .xls files are not supported on this server. Please save the file as .xlsx and upload again."
+
+    import openpyxl
+
+    try:
+        book = xlrd.open_workbook(src_path, on_demand=True)
+        workbook = openpyxl.Workbook(write_only=True)
+        for sheet_index in range(book.nsheets):
+            sheet = book.sheet_by_index(sheet_index)
+            target = workbook.create_sheet(title=sheet.name[:31])
+            for row_index in range(sheet.nrows):
+                target.append([_cell_value(cell, book.datemode) for cell in sheet.row(row_index)])
+            book.unload_sheet(sheet_index)
+        workbook.save(dest_path)
+        book.release_resources()
+    except Exception as e:
+        logger.warning(f"Could not convert {src_path} to .xlsx: {str(e)}")
+        return False, f"Could not read legacy .xls file: {str(e)}"
+
+    return True, "Legacy .xls file converted to .xlsx."
+
+
+def _cell_value(cell, datemode):
+    import xlrd
+
+    if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+        return None
+    if cell.ctype == xlrd.XL_CELL_DATE:
+        return xlrd.xldate.xldate_as_datetime(cell.value, datemode)
+    if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+        return bool(cell.value)
+    if cell.ctype == xlrd.XL_CELL_NUMBER and cell.value.is_integer():
+        # BIFF stores every number as a float
+        return int(cell.value)
+    return cell.value
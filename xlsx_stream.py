@@ -0,0 +1,119 @@
+"""
+Single-sheet .xlsx workbooks written while they are sent.
+
+openpyxl builds the whole workbook in memory (or, in write-only mode, in a
+temporary file) before anything can be sent. An export that is just a grid
+of values needs none of that: the package is five fixed XML parts plus the
+sheet, and the sheet is written row by row into stream_zip(). Strings are
+stored inline, so there is no shared-string table to collect first.
+
+Cells can carry a named fill from a small palette, which is enough for
+status grids and heatmaps.
+"""
+
+import re
+from xml.sax.saxutils import escape
+
+from zip_stream import stream_zip
+
+MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Control characters are not allowed in XML 1.0
+INVALID_XML_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+CONTENT_TYPES = b'''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types"><Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/><Default Extension="xml" ContentType="application/xml"/><Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/><Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/><Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/></Types>'''
+
+ROOT_RELS = b'''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships"><Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/></Relationships>'''
+
+WORKBOOK_RELS = b'''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships"><Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/><Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/></Relationships>'''
+
+WORKBOOK = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets></workbook>'''
+
+
+def column_letter(index):
+    """Spreadsheet column name for a 0-based index (0 -> A, 26 -> AA)"""
+    name = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        name = chr(65 + remainder) + name
+    return name
+
+
+def styles_xml(fills):
+    """Style sheet with a bold header style (1) and one style per fill colour (2, 3, ...)"""
+    fill_xml = ''.join(f'<fill><patternFill patternType="solid"><fgColor rgb="FF{colour}"/></patternFill></fill>' for colour in fills)
+    xf_xml = ''.join(f'<xf fontId="0" fillId="{index + 2}" borderId="0" applyFill="1"/>' for index in range(len(fills)))
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        f'<fills count="{len(fills) + 2}"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill>{fill_xml}</fills>'
+        '<borders count="1"><border/></borders>'
+        '<cellStyleXfs count="1"><xf fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        f'<cellXfs count="{len(fills) + 2}"><xf fontId="0" fillId="0" borderId="0"/><xf fontId="1" fillId="0" borderId="0" applyFont="1"/>{xf_xml}</cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ).encode()
+
+
+def cell_xml(ref, value, style):
+    style_attr = f' s="{style}"' if style else ''
+    if value is None or value == '':
+        return f'<c r="{ref}"{style_attr}/>' if style else ''
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        text = escape(INVALID_XML_CHARS.sub('', str(value)))
+        return f'<c r="{ref}" t="inlineStr"{style_attr}><is><t xml:space="preserve">{text}</t></is></c>'
+    return f'<c r="{ref}"{style_attr}><v>{value}</v></c>'
+
+
+def sheet_xml(rows, styles, widths, header):
+    yield ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+           '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">').encode()
+    if header:
+        yield b'<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/></sheetView></sheetViews>'
+    if widths:
+        yield ('<cols>' + ''.join(f'<col min="{index + 1}" max="{index + 1}" width="{width}" customWidth="1"/>'
+                                  for index, width in enumerate(widths)) + '</cols>').encode()
+    yield b'<sheetData>'
+    for row_number, row in enumerate(rows, start=1):
+        cells = []
+        for column, cell in enumerate(row):
+            value, fill = cell if isinstance(cell, tuple) else (cell, None)
+            style = 1 if header and row_number == 1 else styles.get(fill, 0)
+            cells.append(cell_xml(f'{column_letter(column)}{row_number}', value, style))
+        yield f'<row r="{row_number}">{"".join(cells)}</row>'.encode()
+    yield b'</sheetData></worksheet>'
+
+
+def stream_xlsx(sheet_name, rows, fills=None, widths=None, header=True):
+    """
+    Yield an .xlsx workbook with one sheet, piece by piece
+
+    Args:
+        sheet_name: Worksheet tab name (Excel allows 31 characters)
+        rows: Iterable of rows; each cell is a value (str, int, float or None)
+            or a (value, fill name) tuple
+        fills: {fill name: 'RRGGBB'} colours cells may refer to
+        widths: Column widths in characters, first column first
+        header: Whether the first row is a bold, frozen header
+
+    Yields:
+        bytes: The next part of the workbook
+    """
+    fills = fills or {}
+    styles = {name: index + 2 for index, name in enumerate(fills)}
+    name = escape(INVALID_XML_CHARS.sub('', sheet_name)[:31] or 'Sheet1', {'"': '&quot;'})
+    members = [
+        ('[Content_Types].xml', CONTENT_TYPES),
+        ('_rels/.rels', ROOT_RELS),
+        ('xl/workbook.xml', WORKBOOK.format(name=name).encode()),
+        ('xl/_rels/workbook.xml.rels', WORKBOOK_RELS),
+        ('xl/styles.xml', styles_xml(list(fills.values()))),
+        ('xl/worksheets/sheet1.xml', sheet_xml(rows, styles, widths, header)),
+    ]
+    return stream_zip(members)
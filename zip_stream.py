@@ -0,0 +1,90 @@
+"""
+ZIP archives written while they are sent.
+
+zipfile can write to a stream it cannot seek: each member's CRC and sizes
+then follow its data in a data descriptor instead of being patched into the
+local header afterwards. stream_zip() points zipfile at a small sink and
+yields whatever has been written after every chunk of input, so neither the
+archive nor a whole member is ever held in memory or staged on disk.
+
+Members that are already compressed (xlsx, pdf, ...) are stored as they are;
+deflating them again costs CPU and saves next to nothing.
+"""
+
+import os
+import time
+import zipfile
+
+from config import ZIP_STREAM_CHUNK_SIZE, ZIP_STORED_EXTENSIONS
+
+
+class ZipSink:
+    """Write-only file object for zipfile; drain() hands over what was written since the last call"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(members, chunk_size=ZIP_STREAM_CHUNK_SIZE):
+    """
+    Yield a ZIP archive of members piece by piece
+
+    Args:
+        members: Iterable of (arcname, source); source is a file path read in
+            chunk_size pieces, bytes for small generated members, or an
+            iterable of bytes for a generated member written as it is produced
+        chunk_size: Bytes read from each file per write
+
+    Yields:
+        bytes: The next part of the archive (never empty)
+    """
+    sink = ZipSink()
+    with zipfile.ZipFile(sink, 'w') as archive:
+        for arcname, source in members:
+            if isinstance(source, bytes):
+                info = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED
+                archive.writestr(info, source)
+            elif not isinstance(source, (str, os.PathLike)):
+                info = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED
+                with archive.open(info, 'w') as dest:
+                    for chunk in source:
+                        dest.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+            else:
+                stat = os.stat(source)
+                # ZIP timestamps start in 1980
+                info = zipfile.ZipInfo(arcname, date_time=max(time.localtime(stat.st_mtime)[:6], (1980, 1, 1, 0, 0, 0)))
+                stored = os.path.splitext(arcname)[1].lower() in ZIP_STORED_EXTENSIONS
+                info.compress_type = zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED
+                # Known up front, so zipfile can decide on ZIP64 before writing the header
+                info.file_size = stat.st_size
+                with open(source, 'rb') as src, archive.open(info, 'w') as dest:
+                    while True:
+                        chunk = src.read(chunk_size)
+                        if not chunk:
+                            break
+                        dest.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+            data = sink.drain()
+            if data:
+                yield data
+    # Central directory
+    yield sink.drain()